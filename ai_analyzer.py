@@ -1,131 +1,500 @@
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
+import os
 import random
+import re
+import threading
+import time
+import metrics
+from analysis_cache import AnalysisCache
+from keyword_engine import KeywordMatcher
+from resilience import CircuitOpenError, ResilientCaller
+from stream_parser import StreamingJsonFields
+from text_sanitizer import Sanitizer
+
+# Summaries written by mock_analyze_entry start like this
+MOCK_SUMMARY = re.compile(r"^A \d+-word entry reflecting on experiences from the ")
+
+# System instructions and JSON response schemas need a 1.5 or later model
+DEFAULT_MODEL = 'gemini-1.5-flash'
+# Input tokens (instructions plus entry) allowed in one request
+DEFAULT_TOKEN_BUDGET = 2000
+# Cap on the analysis the model writes back
+MAX_RESPONSE_TOKENS = 400
+# Local classifier confidence above which Gemini is not asked for the tone
+TONE_CONFIDENCE = 0.9
+
+# Instructions for the requests that shorten one chunk of a long entry
+CONDENSE_INSTRUCTION = """You shorten part of a diary entry so it can be analyzed as a whole.
+Keep the events, people and feelings, and the writer's own words for their feelings.
+Write in the first person, as plain text, within the number of words asked for."""
+# A condensed entry aims for about this many tokens: the length of a long
+# day's entry, enough for the analysis, while replies (slow to generate) stay short
+CONDENSED_TOKENS = 600
+# Fewest tokens a chunk is condensed to, however many chunks there are
+MIN_CONDENSED_TOKENS = 64
+# Condensing stops after this many passes; anything still over is cut
+MAX_CONDENSE_ROUNDS = 3
+
+# Paragraphs, then sentences, then words: split_text tries each in turn
+_SPLITTERS = ((re.compile(r'\n\s*\n'), '\n\n'), (re.compile(r'(?<=[.!?])\s+'), ' '),
+              (re.compile(r'\s+'), ' '))
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def split_text(text, max_tokens, level=0):
+    """Split text into chunks of at most max_tokens (estimated).
+
+    Breaks at paragraph boundaries where it can, then between sentences,
+    then between words; a single word longer than the limit is cut.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    if level == len(_SPLITTERS):
+        size = (max_tokens - 1) * 4
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    pattern, separator = _SPLITTERS[level]
+    chunks, current = [], ''
+    for part in pattern.split(text):
+        if not part.strip():
+            continue
+        for piece in split_text(part, max_tokens, level + 1):
+            joined = f"{current}{separator}{piece}" if current else piece
+            if estimate_tokens(joined) <= max_tokens:
+                current = joined
+            else:
+                if current:
+                    chunks.append(current)
+                current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# Where a stored tone came from: Gemini, the local tone classifier or
+# offline keyword matching
+TONE_SOURCES = ('gemini', 'local', 'keywords')
+
+
+class Analysis(tuple):
+    """(summary, tone, comment) from analyze_entry, unpacked like a tuple.
+
+    tone_source is one of TONE_SOURCES, or None when it is not known (e.g.
+    an analysis restored from an archive that did not record it).
+    """
+
+    def __new__(cls, summary, tone, comment, tone_source='gemini'):
+        analysis = super().__new__(cls, (summary, tone, comment))
+        analysis.tone_source = tone_source
+        return analysis
+
+    def __reduce__(self):
+        # Offline analysis returns these from a process pool
+        return Analysis, (*self, self.tone_source)
+
 
 class AIAnalyzer:
-    def __init__(self, api_key):
+    def __init__(self, api_key, model_name=DEFAULT_MODEL, cache_path='analysis_cache.db',
+                 replacements=None, model=None, request_timeout=30.0, resilience=None,
+                 token_budget=DEFAULT_TOKEN_BUDGET, condense_concurrency=4,
+                 classifier_path=None, tone_confidence=TONE_CONFIDENCE):
+        """token_budget: estimated input tokens allowed per request; longer
+        entries are condensed chunk by chunk before they are analyzed.
+        model: any object with generate_content (e.g. fake_model.FakeModel),
+        used for every request instead of Gemini.
+        classifier_path: model file of a local tone classifier; when it is at
+        least tone_confidence sure of a tone, Gemini is only asked for the
+        summary and comment."""
         print(f"Initializing AIAnalyzer with API key: {api_key[:5]}...")  # Only print first 5 chars for security
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.system_prompt = """You are an AI diary analyst and the writer's best friend and the writer's name is Writer, and you have to give an friednly response as if you are talking to him. For the given diary entry, please provide:
-1. An objective analysis focusing on the writer's daily experiences and emotional journey (2-3 sentences)
-2. The primary emotional state expressed (options: appreciative, joyful, content, reflective, concerned, downhearted)
-3. A constructive observation about the writer's experiences (1 sentence)
-Format the response as JSON with keys: 'analysis', 'emotion', 'observation'"""
-        self.use_mock = False
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = model
+        self._condense_model = model
+        self._model_lock = threading.Lock()
+        # Sent once per request as the model's system instruction; the response
+        # format is enforced by response_schema instead of being described here
+        self.system_instruction = """You are the diary writer's best friend. Call the writer Writer and talk to them in a warm, friendly way. For the diary entry you are given, write:
+analysis: an objective look at the writer's day and emotional journey (2-3 sentences)
+emotion: the main emotional state expressed
+observation: a constructive observation about the writer's experiences (1 sentence)"""
+        self.token_budget = token_budget
+        self.condense_concurrency = condense_concurrency
+        self.classifier_path = classifier_path
+        self.tone_confidence = tone_confidence
+        self._classifier = None
+        # Transient failures are retried; repeated ones pause model calls for a
+        # while, during which entries get offline analysis
+        self.request_timeout = request_timeout
+        self.resilience = resilience or ResilientCaller()
         self.safety_settings = {
             "HARM_CATEGORY_HARASSMENT": "BLOCK_NONE",
             "HARM_CATEGORY_HATE_SPEECH": "BLOCK_NONE",
             "HARM_CATEGORY_SEXUALLY_EXPLICIT": "BLOCK_NONE",
             "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE"
         }
-
-    def preprocess_entry(self, content):
-        """Sanitize input to avoid triggering content filters"""
-        # Replace potentially triggering words with neutral alternatives
-        replacements = {
-            "love": "appreciate",
-            "heart": "mind",
-            "romance": "connection",
-            "romantic": "meaningful",
-            "relationship": "friendship"
+        # Map sanitized emotions back to original intentions
+        self.emotion_mapping = {
+            'appreciative': 'romantic',
+            'joyful': 'fun',
+            'content': 'excited',
+            'reflective': 'neutral',
+            'concerned': 'tough',
+            'downhearted': 'sad'
         }
-        
-        processed_content = content
-        for old, new in replacements.items():
-            processed_content = processed_content.replace(old, new)
-        return processed_content
-
-    def analyze_entry(self, content):
-        if not self.use_mock:
-            try:
-                processed_content = self.preprocess_entry(content)
-                print(f"Sending request to AI model with content: {processed_content[:50]}...")
-                response = self.model.generate_content(
-                    f"{self.system_prompt}\n\nDiary entry: {processed_content}",
-                    safety_settings=self.safety_settings
-                )
-            
-                print(f"Received response from AI model: {response.text[:100]}...")
-            
-                # Remove any leading/trailing backticks and "json" text
-                cleaned_response = response.text.strip('`').strip()
-                if cleaned_response.startswith('json'):
-                    cleaned_response = cleaned_response[4:].strip()
-            
-                try:
-                    result = json.loads(cleaned_response)
-                    # Map sanitized emotions back to original intentions
-                    emotion_mapping = {
-                        'appreciative': 'romantic',
-                        'joyful': 'fun',
-                        'content': 'excited',
-                        'reflective': 'neutral',
-                        'concerned': 'tough',
-                        'downhearted': 'sad'
-                    }
-                    result['emotion'] = emotion_mapping.get(result['emotion'], result['emotion'])
-                    return result['analysis'], result['emotion'], result['observation']
-                except json.JSONDecodeError as json_error:
-                    print(f"Failed to parse JSON response. Error: {json_error}")
-                    print(f"Cleaned response: {cleaned_response}")
-                    return self.extract_structured_response(cleaned_response)
-            except Exception as e:
-                print(f"Error in AI analysis: {e}")
-                print("Switching to mock implementation.")
-                self.use_mock = True
-    
-        return self.mock_analyze_entry(content)
-
-    def extract_structured_response(self, text):
-        """Extract structured information from non-JSON responses"""
-        lines = text.split('\n')
-        analysis = lines[0] if len(lines) > 0 else "Entry analyzed."
-        emotion = 'neutral'
-        observation = lines[-1] if len(lines) > 1 else "Keep writing!"
-        
-        # Detect emotion from analysis text
-        emotion_keywords = {
+        # Replace potentially triggering words with neutral alternatives
+        self.sanitizer = Sanitizer(replacements)
+        # Keyword matchers for offline analysis, compiled once per analyzer
+        self.emotion_matcher = KeywordMatcher({
+            'romantic': ['appreciate', 'care', 'connection', 'close', 'together'],
+            'fun': ['happy', 'joy', 'laugh', 'exciting', 'wonderful'],
+            'excited': ['thrilled', 'eager', 'anticipate', 'looking forward'],
+            'neutral': ['normal', 'regular', 'usual', 'typical'],
+            'tough': ['difficult', 'challenging', 'hard', 'struggle'],
+            'sad': ['unhappy', 'down', 'gloomy', 'disappointed']
+        })
+        self.time_indicators = {'morning': 'start', 'afternoon': 'middle', 'evening': 'end',
+                                'night': 'end', 'today': 'throughout'}
+        self.time_matcher = KeywordMatcher({word: [word] for word in self.time_indicators})
+        self.response_emotion_matcher = KeywordMatcher({
             'romantic': ['care', 'appreciate', 'connection', 'feeling'],
             'fun': ['happy', 'joy', 'laugh', 'exciting'],
             'excited': ['thrilled', 'eager', 'looking forward'],
             'tough': ['difficult', 'challenging', 'hard'],
             'sad': ['unhappy', 'down', 'gloomy']
+        })
+        self.generation_config = {
+            'response_mime_type': 'application/json',
+            'response_schema': {
+                'type': 'OBJECT',
+                'properties': {
+                    'analysis': {'type': 'STRING'},
+                    'emotion': {'type': 'STRING', 'format': 'enum', 'enum': list(self.emotion_mapping)},
+                    'observation': {'type': 'STRING'},
+                },
+                'required': ['analysis', 'emotion', 'observation'],
+            },
+            'max_output_tokens': MAX_RESPONSE_TOKENS,
         }
-        
-        text_lower = text.lower()
-        for emotion_type, keywords in emotion_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                emotion = emotion_type
-                break
-                
-        return analysis, emotion, observation
+        # For entries whose tone the local classifier is sure of
+        self.comment_config = dict(self.generation_config, response_schema={
+            'type': 'OBJECT',
+            'properties': {'analysis': {'type': 'STRING'}, 'observation': {'type': 'STRING'}},
+            'required': ['analysis', 'observation'],
+        })
+        # Results are keyed on model, instructions and budget, so changing any starts afresh
+        self.cache = None
+        if cache_path:
+            self.cache = AnalysisCache(cache_path, self.model_name, json.dumps(
+                [self.system_instruction, self.generation_config, self.token_budget]))
+
+    @classmethod
+    def from_env(cls, api_key, **kwargs):
+        """Analyzer using GEMINI_MODEL and DIARY_TOKEN_BUDGET when they are set"""
+        kwargs.setdefault('model_name', os.getenv('GEMINI_MODEL') or DEFAULT_MODEL)
+        kwargs.setdefault('token_budget', int(os.getenv('DIARY_TOKEN_BUDGET') or DEFAULT_TOKEN_BUDGET))
+        return cls(api_key, **kwargs)
+
+    def _create_model(self, system_instruction):
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+
+    @property
+    def model(self):
+        """Gemini model with the analysis instructions, created on first use.
+
+        The SDK and its gRPC stack are slow to import, so this is deferred
+        until the first analysis instead of delaying startup.
+        """
+        with self._model_lock:
+            if self._model is None:
+                self._model = self._create_model(self.system_instruction)
+            return self._model
+
+    @property
+    def condense_model(self):
+        """Gemini model with CONDENSE_INSTRUCTION, for entries over the token budget"""
+        with self._model_lock:
+            if self._condense_model is None:
+                self._condense_model = self._create_model(CONDENSE_INSTRUCTION)
+            return self._condense_model
+
+    @property
+    def classifier(self):
+        """Local tone classifier (tone_classifier.ToneClassifier), loaded on
+        first use; None without a classifier_path"""
+        if self.classifier_path is None:
+            return None
+        with self._model_lock:
+            if self._classifier is None:
+                from tone_classifier import ToneClassifier  # Keeps NumPy out of startup
+                self._classifier = ToneClassifier(self.classifier_path)
+            return self._classifier
+
+    def predict_tone(self, content):
+        """(tone, confidence) from the local classifier; (None, 0.0) if there is none yet"""
+        if self.classifier is None:
+            return None, 0.0
+        return self.classifier.predict(content)
+
+    def save_classifier(self):
+        """Write what the local classifier has learned, if it has been used"""
+        if self._classifier is not None:
+            self._classifier.save()
+
+    def close(self):
+        """Save the classifier and what the analysis cache knows of recent use"""
+        self.save_classifier()
+        if self.cache is not None:
+            self.cache.close()
+
+    def preprocess_entry(self, content):
+        """Sanitize input to avoid triggering content filters"""
+        return self.sanitizer(content)
+
+    def restore_wording(self, sanitized, analysis):
+        """Map words introduced by preprocessing back to the writer's own"""
+        summary, emotion, comment = analysis
+        return Analysis(sanitized.restore_output(summary), emotion,
+                        sanitized.restore_output(comment), analysis.tone_source)
+
+    def map_emotion(self, emotion):
+        return self.emotion_mapping.get(emotion, emotion)
+
+    def validate_analysis(self, result):
+        """Check a parsed response and return (summary, tone, comment).
+
+        Raises ValueError if a field is missing. An emotion outside the
+        schema's options is replaced by one detected from the text.
+        """
+        if not isinstance(result, dict):
+            raise ValueError("Response is not a JSON object")
+        fields = []
+        for key in ('analysis', 'emotion', 'observation'):
+            value = result.get(key)
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError(f"Response has no '{key}'")
+            fields.append(value.strip())
+        summary, emotion, comment = fields
+        emotion = emotion.lower()
+        if emotion in self.emotion_mapping:
+            tone = self.map_emotion(emotion)
+        elif emotion in self.emotion_mapping.values():
+            tone = emotion
+        else:
+            print(f"Unexpected emotion in response: {emotion}")
+            tone = self.response_emotion_matcher.first(f"{summary}\n{comment}", default='neutral')
+        return summary, tone, comment
+
+    def prompt_tokens(self, processed_content):
+        """Estimated input tokens of an analysis request: instructions plus entry"""
+        return estimate_tokens(self.system_instruction) + estimate_tokens(processed_content)
+
+    def _stream_response(self, prompt, sanitized, on_partial, tone=None):
+        """Generate with stream=True, passing fields to on_partial as they arrive.
+
+        on_partial receives a dict with 'summary', 'tone' and 'comment' keys
+        holding whatever text has been received for each so far; the tone is
+        only filled in once the emotion is complete, unless the local tone is
+        given. Returns the full text.
+        """
+        start = time.perf_counter()
+        config = self.generation_config if tone is None else self.comment_config
+        response = self.model.generate_content(
+            prompt, generation_config=config,
+            safety_settings=self.safety_settings, stream=True,
+            request_options={'timeout': self.request_timeout})
+        parser = StreamingJsonFields()
+        chunks = []
+        usage = None
+        for chunk in response:
+            text = chunk.text
+            if not chunks:
+                metrics.observe('gemini_first_chunk_seconds', time.perf_counter() - start)
+            chunks.append(text)
+            usage = getattr(chunk, 'usage_metadata', None) or usage
+            if not parser.feed(text):
+                continue
+            fields = parser.fields
+            emotion = fields.get('emotion', '') if 'emotion' in parser.complete else ''
+            on_partial({
+                'summary': sanitized.restore_output(fields.get('analysis', '')),
+                'tone': tone or (self.map_emotion(emotion.strip().lower()) if emotion else ''),
+                'comment': sanitized.restore_output(fields.get('observation', '')),
+            })
+        response_text = ''.join(chunks)
+        self._record_usage(usage, self.prompt_tokens(prompt), response_text)
+        return response_text
+
+    def analyze_entry(self, content, on_partial=None):
+        """Return (summary, tone, comment) for an entry.
+
+        With on_partial, the response is streamed and partial fields are
+        passed to it as they arrive (on the calling thread). The returned
+        result is always the validated full response. An entry over the
+        token budget is condensed first (see condense). When the local
+        classifier is confident of the tone, Gemini only writes the summary
+        and comment; otherwise the classifier learns from Gemini's tone. If
+        Gemini cannot be reached, even after retries, the entry gets offline
+        analysis.
+        """
+        sanitized = self.sanitizer.sanitize(content)
+        processed_content = sanitized.text
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(processed_content)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics.inc('analysis_cache_hits_total')
+                # Results cached before tone sources were kept have Gemini's tone
+                return self.restore_wording(sanitized, Analysis(*cached))
+
+        tone, confidence = self.predict_tone(content)
+        local_tone = tone if confidence >= self.tone_confidence else None
+        try:
+            prompt = self.condense(processed_content)
+            analysis = self.resilience.call(
+                lambda: self._request_analysis(prompt, sanitized, on_partial, local_tone))
+        except CircuitOpenError:
+            print("AI analysis is paused after repeated failures; using offline analysis.")
+            metrics.inc('analysis_mock_fallback_total')
+            return self.mock_analyze_entry(content)
+        except Exception as e:
+            print(f"Error in AI analysis: {e}")
+            print("Using offline analysis for this entry.")
+            metrics.inc('analysis_mock_fallback_total')
+            return self.mock_analyze_entry(content)
+
+        if local_tone is not None:
+            metrics.inc('analysis_local_tone_total')
+        elif self.classifier is not None:
+            self.classifier.learn(content, analysis[1])
+        analysis = Analysis(*analysis, tone_source='gemini' if local_tone is None else 'local')
+        if cache_key is not None:
+            self.cache.put(cache_key, analysis + (analysis.tone_source,))
+        return self.restore_wording(sanitized, analysis)
+
+    def _request_analysis(self, prompt, sanitized, on_partial, tone=None):
+        """One model request; returns the parsed (unrestored) analysis.
+
+        With a tone from the local classifier, the model is not asked for one.
+        """
+        print(f"Sending request to AI model with content: {prompt[:50]}...")
+        config = self.generation_config if tone is None else self.comment_config
+        with metrics.timer('gemini_request_seconds'):
+            if on_partial is not None:
+                response_text = self._stream_response(prompt, sanitized, on_partial, tone)
+            else:
+                response = self.model.generate_content(
+                    prompt, generation_config=config,
+                    safety_settings=self.safety_settings,
+                    request_options={'timeout': self.request_timeout})
+                response_text = response.text
+                self._record_usage(getattr(response, 'usage_metadata', None),
+                                   self.prompt_tokens(prompt), response_text)
+
+        print(f"Received response from AI model: {response_text[:100]}...")
+
+        # The response schema makes the reply plain JSON; anything else is an error
+        with metrics.timer('analysis_parse_seconds'):
+            result = json.loads(response_text)
+            if tone is not None and isinstance(result, dict):
+                result['emotion'] = tone
+            analysis = self.validate_analysis(result)
+        metrics.inc('analysis_success_total')
+        return analysis
+
+    def condense(self, processed_content):
+        """Entry text that fits the token budget, condensed by map-reduce if needed.
+
+        Text over the budget is split into chunks, each chunk is shortened by
+        its own request (several at once) and the results are joined; this
+        repeats until the text fits, and after MAX_CONDENSE_ROUNDS whatever is
+        still over is cut.
+        """
+        available = self.token_budget - estimate_tokens(self.system_instruction)
+        if estimate_tokens(processed_content) <= available:
+            return processed_content
+        metrics.inc('analysis_condensed_total')
+        text = processed_content
+        chunk_tokens = self.token_budget - estimate_tokens(CONDENSE_INSTRUCTION) - 16
+        for _ in range(MAX_CONDENSE_ROUNDS):
+            chunks = split_text(text, chunk_tokens)
+            # Each chunk's reply is capped at its share of the condensed entry
+            output_tokens = max(MIN_CONDENSED_TOKENS, min(available, CONDENSED_TOKENS) // len(chunks) - 1)
+            with ThreadPoolExecutor(max_workers=min(len(chunks), self.condense_concurrency)) as pool:
+                text = '\n\n'.join(pool.map(
+                    lambda chunk: self._condense_chunk(chunk, output_tokens), chunks))
+            if estimate_tokens(text) <= available:
+                return text
+        print(f"Entry is still over the token budget after condensing; cutting it to {available} tokens")
+        return text[:(available - 1) * 4]
+
+    def _condense_chunk(self, chunk, max_tokens):
+        # Fewer words than the cap allows, so the reply ends before it is cut off
+        prompt = f"Shorten to at most {max_tokens * 2 // 3} words:\n\n{chunk}"
+        response = self.resilience.call(lambda: self.condense_model.generate_content(
+            prompt, generation_config={'max_output_tokens': max_tokens},
+            safety_settings=self.safety_settings,
+            request_options={'timeout': self.request_timeout}))
+        text = response.text.strip()
+        metrics.inc('gemini_condense_calls_total')
+        self._record_usage(getattr(response, 'usage_metadata', None),
+                           estimate_tokens(CONDENSE_INSTRUCTION) + estimate_tokens(prompt), text)
+        return text
+
+    @staticmethod
+    def _record_usage(usage, prompt_tokens, response_text):
+        """Count tokens from the response's usage metadata, or estimated ones"""
+        prompt_tokens = getattr(usage, 'prompt_token_count', None) or prompt_tokens
+        response_tokens = getattr(usage, 'candidates_token_count', None) or estimate_tokens(response_text)
+        metrics.inc('gemini_prompt_tokens_total', prompt_tokens)
+        metrics.inc('gemini_response_tokens_total', response_tokens)
+
+    @staticmethod
+    def is_mock_summary(summary):
+        """Whether a summary was written by mock_analyze_entry"""
+        return bool(MOCK_SUMMARY.match(summary))
+
+    @staticmethod
+    def is_mock_result(result):
+        """Whether an analysis came from mock_analyze_entry"""
+        return AIAnalyzer.is_mock_summary(result[0])
+
+    @staticmethod
+    def is_gemini_tone(entry):
+        """Whether a stored entry's tone came from Gemini, so can be learned.
+
+        Entries stored before tone sources were kept have Gemini's tone
+        unless their summary is an offline one.
+        """
+        if not entry.get('summary'):
+            return False
+        tone_source = entry.get('tone_source')
+        if tone_source is not None:
+            return tone_source == 'gemini'
+        return not AIAnalyzer.is_mock_summary(entry['summary'])
 
     def mock_analyze_entry(self, content):
         """Enhanced mock implementation with more nuanced analysis"""
-        # Expanded keyword sets for better emotion detection
-        emotion_indicators = {
-            'romantic': ['appreciate', 'care', 'connection', 'close', 'together'],
-            'fun': ['happy', 'joy', 'laugh', 'exciting', 'wonderful'],
-            'excited': ['thrilled', 'eager', 'anticipate', 'looking forward'],
-            'neutral': ['normal', 'regular', 'usual', 'typical'],
-            'tough': ['difficult', 'challenging', 'hard', 'struggle'],
-            'sad': ['unhappy', 'down', 'gloomy', 'disappointed']
-        }
-
-        content_lower = content.lower()
-        emotion_scores = {emotion: sum(1 for word in keywords if word in content_lower)
-                         for emotion, keywords in emotion_indicators.items()}
-        
-        primary_emotion = max(emotion_scores.items(), key=lambda x: x[1])[0]
+        # The local classifier, once it has learned from Gemini, beats keyword
+        # counting when it is as sure as it must be to stand in for Gemini
+        primary_emotion, confidence = self.predict_tone(content)
+        tone_source = 'local'
+        if primary_emotion is None or confidence < self.tone_confidence:
+            emotion_scores = self.emotion_matcher.scores(content)
+            primary_emotion = max(emotion_scores.items(), key=lambda x: x[1])[0]
+            tone_source = 'keywords'
         
         # Generate more contextual summary
         word_count = len(content.split())
-        time_indicators = {'morning': 'start', 'afternoon': 'middle', 'evening': 'end', 
-                         'night': 'end', 'today': 'throughout'}
-        time_context = next((time_indicators[word] for word in time_indicators 
-                           if word in content_lower), 'throughout')
+        time_word = self.time_matcher.first(content)
+        time_context = self.time_indicators[time_word] if time_word else 'throughout'
         
         summary = f"A {word_count}-word entry reflecting on experiences from the {time_context} of the day, expressing primarily {primary_emotion} sentiments."
         
@@ -139,7 +508,7 @@ Format the response as JSON with keys: 'analysis', 'emotion', 'observation'"""
             'sad': "Expression through writing can be very healing."
         }
         
-        return summary, primary_emotion, observations[primary_emotion]
+        return Analysis(summary, primary_emotion, observations[primary_emotion], tone_source)
 
     def analyze_all_entries(self, entries):
         """Analyze trends across multiple entries with robust error handling"""
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class AnalysisCache:
+    """Content-addressed, size-bounded cache of AI analysis results.
+
+    Results are keyed on a hash of the model name, system prompt and
+    preprocessed entry text, kept in an in-memory LRU and persisted to SQLite.
+    Opening the cache with a different model or prompt drops every result
+    that was produced by the old configuration.
+    """
+
+    def __init__(self, path, model_name, system_prompt, max_entries=5000, memory_entries=256):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._config = _sha256(model_name, system_prompt)
+        self._memory = OrderedDict()
+        self._touched = {}  # key -> time of memory hits not yet written to last_used
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    key TEXT PRIMARY KEY,
+                    config TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )""")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache (last_used)")
+            self.conn.execute("DELETE FROM analysis_cache WHERE config != ?", (self._config,))
+
+    def key(self, processed_content):
+        return _sha256(self._config, processed_content)
+
+    def get(self, key):
+        """Return the cached (analysis, emotion, observation) tuple or None"""
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                # Written with the next put (before it evicts) or on close
+                self._touched[key] = time.time()
+                self.hits += 1
+                return result
+
+            row = self.conn.execute(
+                "SELECT result FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE analysis_cache SET last_used = ? WHERE key = ?",
+                                  (time.time(), key))
+            result = tuple(json.loads(row[0]))
+            self._remember(key, result)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        result = tuple(result)
+        with self._lock:
+            self._remember(key, result)
+            with self.conn:
+                self._write_touched()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache VALUES (?, ?, ?, ?)",
+                    (key, self._config, json.dumps(result), time.time()))
+                # Evict least recently used rows beyond the size bound
+                self.conn.execute("""
+                    DELETE FROM analysis_cache WHERE key IN (
+                        SELECT key FROM analysis_cache ORDER BY last_used DESC
+                        LIMIT -1 OFFSET ?)""", (self.max_entries,))
+
+    def _write_touched(self):
+        """Record memory hits in last_used, so eviction follows actual use"""
+        if self._touched:
+            self.conn.executemany("UPDATE analysis_cache SET last_used = ? WHERE key = ?",
+                                  [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            with self.conn:
+                self.conn.execute("DELETE FROM analysis_cache")
+
+    def close(self):
+        with self._lock:
+            with self.conn:
+                self._write_touched()
+            self.conn.close()
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
@@ -0,0 +1,121 @@
+import logging
+import queue
+import threading
+from itertools import count
+
+
+class AnalysisExecutor:
+    """Runs AI analysis on worker threads and hands results back to Tk.
+
+    Jobs are fed to a small pool of daemon threads through a queue. Finished
+    jobs are placed on a result queue which ``poll`` drains from the Tk main
+    loop via ``after()``, so callbacks always run on the UI thread.
+
+    Jobs submitted with ``on_progress`` pass a progress callback to
+    ``analyze``; progress values go through the same result queue, and only
+    the latest value per job is delivered on each poll.
+    """
+
+    def __init__(self, analyze, workers=2, poll_interval=100):
+        self.analyze = analyze
+        self.poll_interval = poll_interval
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._ids = count(1)
+        self._cancelled = set()
+        self._closed = threading.Event()
+        self._widget = None
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name=f"analysis-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, content, on_done, on_error=None, on_progress=None):
+        """Queue content for analysis and return a job id"""
+        if self._closed.is_set():
+            raise RuntimeError("Analysis executor has been shut down")
+        job_id = next(self._ids)
+        self._jobs.put((job_id, content, on_done, on_error, on_progress))
+        return job_id
+
+    def cancel(self, job_id):
+        """Drop the result of a job; it is skipped if it has not started yet"""
+        self._cancelled.add(job_id)
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None or self._closed.is_set():
+                break
+            job_id, content, on_done, on_error, on_progress = job
+            if job_id in self._cancelled:
+                self._cancelled.discard(job_id)  # Nothing of it reaches the result queue
+                continue
+            try:
+                if on_progress is None:
+                    result = self.analyze(content)
+                else:
+                    result = self.analyze(content, on_partial=self._reporter(job_id, on_progress))
+            except Exception as e:
+                self._results.put((job_id, on_error, e, False))
+            else:
+                self._results.put((job_id, on_done, result, False))
+
+    def _reporter(self, job_id, on_progress):
+        def report(value):
+            if job_id not in self._cancelled:
+                self._results.put((job_id, on_progress, value, True))
+        return report
+
+    def start_polling(self, widget):
+        """Deliver results through widget.after() until shut down"""
+        self._widget = widget
+        self._schedule()
+
+    def _schedule(self):
+        if not self._closed.is_set():
+            self._widget.after(self.poll_interval, self._poll_and_reschedule)
+
+    def _poll_and_reschedule(self):
+        self.poll()
+        self._schedule()
+
+    def poll(self):
+        """Run callbacks for finished jobs; must be called on the Tk thread"""
+        progress = {}  # job id -> (callback, latest value)
+        while not self._closed.is_set():
+            try:
+                job_id, callback, value, is_progress = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if is_progress:
+                if job_id not in self._cancelled:
+                    progress[job_id] = (callback, value)
+                continue
+            progress.pop(job_id, None)
+            if job_id in self._cancelled:
+                self._cancelled.discard(job_id)
+                continue
+            if callback is None:
+                logging.error(f"Analysis job {job_id} failed: {value}")
+                continue
+            self._run_callback(callback, value)
+        for callback, value in progress.values():
+            self._run_callback(callback, value)
+
+    @staticmethod
+    def _run_callback(callback, value):
+        try:
+            callback(value)
+        except Exception as e:
+            logging.error(f"Analysis callback failed: {e}")
+
+    def shutdown(self):
+        """Stop workers and discard queued and in-flight results.
+
+        Workers are daemon threads, so a slow model call never blocks exit.
+        """
+        self._closed.set()
+        for _ in self._threads:
+            self._jobs.put(None)
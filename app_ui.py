@@ -2,11 +2,20 @@ import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.dialogs import Messagebox
 from datetime import datetime
-from ui_components import CalendarWidget, EntryEditor, EntryDisplay, AnalysisSummary, LoginWindow
-from mood_analytics import AnalyticsDashboard
+from ui_components import (CalendarWidget, EntryEditor, EntryDisplay, AnalysisSummary, LoginWindow,
+                           SearchPanel, DiagnosticsWindow)
+from analysis_worker import AnalysisExecutor
+import metrics
+from resilience import UpgradeQueue
 import logging
+import os
 import tkinter as tk
 
+STARTUP_PROBE_MARKER = "startup-probe: login window ready"
+PRERENDER_DELAY_MS = 3000  # Analytics charts are redrawn this long after the last mood change
+BOOTSTRAP_DELAY_MS = 1000  # The tone classifier is loaded (or first trained) this long after login
+BOOTSTRAP_SLICE = 200  # Past entries the tone classifier learns per Tk callback
+
 class DiaryApp(ttk.Window):
     def __init__(self, diary_manager, ai_analyzer):
         # Initialize the main window first
@@ -15,7 +24,14 @@ class DiaryApp(ttk.Window):
         
         self.diary_manager = diary_manager
         self.ai_analyzer = ai_analyzer
-        self._save_in_progress = False
+        self.analysis_executor = AnalysisExecutor(ai_analyzer.analyze_entry, poll_interval=50)
+        self._pending_analysis = {}  # date string -> analysis job id
+        # Entries that got offline analysis, re-analyzed once Gemini answers again
+        self.upgrade_queue = UpgradeQueue()
+        self._upgrading = {}  # date string -> analysis job id
+        self._tone_hints = {}  # date string -> local tone shown while the analysis runs
+        self._prerender_job = None
+        self._analytics_opened = False  # Charts are only prerendered once someone looks at them
         self._want_to_close = False
         
         # Handle login
@@ -25,8 +41,12 @@ class DiaryApp(ttk.Window):
             self.protocol("WM_DELETE_WINDOW", self.on_closing)
             self.create_widgets()
             self.create_menu()
+            self.analysis_executor.start_polling(self)
             self.deiconify()  # Show window after setup
+            self.after(2000, self.upgrade_mock_analyses)
+            self.after(BOOTSTRAP_DELAY_MS, self.bootstrap_classifier)
         else:
+            self.analysis_executor.shutdown()
             self.destroy()
             return
             
@@ -34,6 +54,11 @@ class DiaryApp(ttk.Window):
         """Handle login and return True if successful"""
         try:
             login_window = LoginWindow(self)
+            if os.getenv('DIARY_STARTUP_PROBE'):
+                # Used by benchmarks/startup_timing.py: report once the login
+                # window has been drawn, then close it without logging in
+                login_window.after_idle(lambda: (print(STARTUP_PROBE_MARKER, flush=True),
+                                                 login_window.destroy()))
             self.wait_window(login_window)
             return login_window.is_authenticated
         except Exception as e:
@@ -66,6 +91,14 @@ class DiaryApp(ttk.Window):
         self.calendar = CalendarWidget(calendar_frame)
         self.calendar.pack(fill=X)
         self.calendar.set_callback(self.on_date_selected)
+        self.calendar.set_entry_provider(self.diary_manager.get_summaries)
+
+        logging.info("Creating search panel")
+        search_frame = ttk.LabelFrame(left_panel, text="Search", padding=10)
+        search_frame.pack(fill=X, pady=(0, 10))
+
+        self.search_panel = SearchPanel(search_frame, self.search_entries, self.on_date_selected)
+        self.search_panel.pack(fill=X)
 
         logging.info("Creating entry editor")
         editor_frame = ttk.LabelFrame(left_panel, text="New Entry", padding=10)
@@ -105,11 +138,12 @@ class DiaryApp(ttk.Window):
 
         file_menu = ttk.Menu(menu_bar, tearoff=0)
         menu_bar.add_cascade(label="File", menu=file_menu)
-        file_menu.add_command(label="Exit", command=self.quit)
+        file_menu.add_command(label="Exit", command=self.on_closing)
 
         view_menu = ttk.Menu(menu_bar, tearoff=0)
         menu_bar.add_cascade(label="View", menu=view_menu)
         view_menu.add_command(label="Show Analytics", command=self.show_analytics)
+        view_menu.add_command(label="Diagnostics", command=self.show_diagnostics)
 
         help_menu = ttk.Menu(menu_bar, tearoff=0)
         menu_bar.add_cascade(label="Help", menu=help_menu)
@@ -119,91 +153,222 @@ class DiaryApp(ttk.Window):
         logging.info(f"Date selected: {date}")
         entry = self.diary_manager.get_entry(date)
         if entry:
-            self.entry_display.display_entry(date, entry['content'], entry['summary'], entry['tone'])
+            date_str = date.strftime('%Y-%m-%d')
+            self.entry_display.display_entry(date, entry['content'], entry['summary'], entry['tone'],
+                                             entry.get('comment', ''),
+                                             pending=date_str in self._pending_analysis)
+            if date_str in self._pending_analysis and date_str in self._tone_hints:
+                self.entry_display.show_partial(tone=self._tone_hints[date_str])
         else:
             self.entry_display.display_entry(date, "No entry for this date.", "", "")
 
+    def search_entries(self, query):
+        """Search rows of (date, tone, snippet) for the search panel"""
+        rows = []
+        for date_str, score in self.diary_manager.search(query):
+            entry = self.diary_manager.get_entry(datetime.strptime(date_str, '%Y-%m-%d'))
+            snippet = ' '.join(entry['content'].split())[:80] if entry else ""
+            rows.append((date_str, entry.get('tone', '') if entry else "", snippet))
+        return rows
+
     def save_entry(self):
-        if self._save_in_progress:  # Prevent multiple saves
-            return
-            
-        self._save_in_progress = True
         content = self.entry_editor.get_content()
         
         try:
             if not content:
                 Messagebox.show_warning("Please enter some content for your diary entry.")
-                self._save_in_progress = False
                 return
 
             today = datetime.now().date()
             if self.diary_manager.is_valid_date(today):
-                # First save the entry
+                # Persist the entry right away; analysis runs in the background
                 self.diary_manager.add_entry(today, content)
-                self.update()
-                
-                # Do AI analysis
+                self.entry_display.display_entry(today, content, pending=True)
+                self.entry_editor.set_content("")
+                self.calendar.refresh_tooltips()
+
+                # The local classifier's tone shows at once, until the analysis replaces it
+                date_str = today.strftime('%Y-%m-%d')
+                self._tone_hints.pop(date_str, None)
+                tone, confidence = self.ai_analyzer.predict_tone(content)
+                if tone is not None:
+                    self._tone_hints[date_str] = f"{tone} ({confidence:.0%})"
+                    self.entry_display.show_partial(tone=self._tone_hints[date_str])
+
+                # A re-save of the same day supersedes any analysis still running
+                if date_str in self._pending_analysis:
+                    self.analysis_executor.cancel(self._pending_analysis[date_str])
+                if date_str in self._upgrading:
+                    self.analysis_executor.cancel(self._upgrading.pop(date_str))
+
                 logging.info(f"Analyzing entry: {content[:50]}...")
-                try:
-                    summary, tone, comment = self.ai_analyzer.analyze_entry(content)
-                    logging.info(f"Analysis complete - Summary: {summary[:50]}, Tone: {tone}")
-                    
-                    # Update entry with analysis
-                    self.diary_manager.update_entry_analysis(today, summary, tone, comment)
-                    
-                    def update_ui():
-                        try:
-                            # Update UI elements
-                            self.entry_display.display_entry(today, content, summary, tone, comment)
-                            self.entry_editor.set_content("")
-                            self.update_analysis_summary()
-                            self.calendar.update_tooltips(self.diary_manager.get_all_entries())
-                            Messagebox.show_info("Entry saved and analyzed successfully!")
-                        finally:
-                            self._save_in_progress = False
-                    
-                    # Schedule UI update for after current event
-                    self.after(100, update_ui)
-                    
-                except Exception as analysis_error:
-                    logging.error(f"Analysis error: {analysis_error}")
-                    self._save_in_progress = False
-                    Messagebox.show_warning(
-                        "Entry saved but analysis failed. Please try refreshing the app."
-                    )
+                self._pending_analysis[date_str] = self.analysis_executor.submit(
+                    content,
+                    on_done=lambda result: self.on_analysis_complete(today, content, result),
+                    on_error=lambda error: self.on_analysis_failed(today, error),
+                    on_progress=lambda partial: self.on_analysis_progress(today, partial))
             else:
-                self._save_in_progress = False
                 Messagebox.show_warning("You can only add entries for today or yesterday.")
                 
         except Exception as e:
-            self._save_in_progress = False
             logging.error(f"Save error: {e}")
             Messagebox.show_error(f"Error saving entry: {str(e)}")
 
+    def on_analysis_progress(self, date, partial):
+        """Show streamed analysis text as it arrives; runs on the Tk thread"""
+        if self.entry_display.shows_date(date):
+            tone = partial['tone'] or self._tone_hints.get(date.strftime('%Y-%m-%d'), '')
+            self.entry_display.show_partial(partial['summary'], tone, partial['comment'])
+
+    def on_analysis_complete(self, date, content, result):
+        """Store a finished analysis; runs on the Tk thread"""
+        self._pending_analysis.pop(date.strftime('%Y-%m-%d'), None)
+        self._tone_hints.pop(date.strftime('%Y-%m-%d'), None)
+        summary, tone, comment = result
+        logging.info(f"Analysis complete - Summary: {summary[:50]}, Tone: {tone}")
+        try:
+            self.diary_manager.update_entry_analysis(date, summary, tone, comment, result.tone_source)
+        except ValueError:
+            logging.warning(f"Entry for {date} was removed before its analysis finished")
+            return
+
+        if self.entry_display.shows_date(date):
+            self.entry_display.display_entry(date, content, summary, tone, comment)
+        self.update_analysis_summary()
+        self.calendar.refresh_tooltips()
+        self.schedule_analytics_prerender()
+
+        date_str = date.strftime('%Y-%m-%d')
+        if self.ai_analyzer.is_mock_result(result):
+            self.upgrade_queue.add(date_str)
+        else:
+            self.upgrade_queue.discard(date_str)
+            # Gemini is answering, so catch up on entries that missed it
+            self.upgrade_mock_analyses()
+
+    def upgrade_mock_analyses(self):
+        """Re-analyze queued entries that were given offline analysis"""
+        for date_str in self.upgrade_queue.dates():
+            if date_str in self._upgrading or date_str in self._pending_analysis:
+                continue
+            date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            entry = self.diary_manager.get_entry(date)
+            if entry is None:
+                self.upgrade_queue.discard(date_str)
+                continue
+            logging.info(f"Upgrading offline analysis for {date_str}")
+            self._upgrading[date_str] = self.analysis_executor.submit(
+                entry['content'],
+                on_done=lambda result, date=date, content=entry['content']:
+                    self.on_upgrade_complete(date, content, result),
+                on_error=lambda error, date_str=date_str: self._upgrading.pop(date_str, None))
+
+    def on_upgrade_complete(self, date, content, result):
+        date_str = date.strftime('%Y-%m-%d')
+        self._upgrading.pop(date_str, None)
+        if self.ai_analyzer.is_mock_result(result):
+            return  # Still offline; stays queued
+        summary, tone, comment = result
+        try:
+            self.diary_manager.update_entry_analysis(date, summary, tone, comment, result.tone_source)
+        except ValueError:
+            self.upgrade_queue.discard(date_str)
+            return
+        self.upgrade_queue.discard(date_str)
+        if self.entry_display.shows_date(date):
+            self.entry_display.display_entry(date, content, summary, tone, comment)
+        self.update_analysis_summary()
+        self.calendar.refresh_tooltips()
+        self.schedule_analytics_prerender()
+
+    def on_analysis_failed(self, date, error):
+        self._pending_analysis.pop(date.strftime('%Y-%m-%d'), None)
+        self._tone_hints.pop(date.strftime('%Y-%m-%d'), None)
+        logging.error(f"Analysis error: {error}")
+        Messagebox.show_warning(
+            "Entry saved but analysis failed. Please try refreshing the app."
+        )
+
     def update_analysis_summary(self):
         logging.info("Updating analysis summary")
-        entries = self.diary_manager.get_all_entries()
-        toughest_day, most_fun_day, most_romantic_day = self.ai_analyzer.analyze_all_entries(entries)
+        toughest_day, most_fun_day, most_romantic_day = self.diary_manager.get_significant_days()
         self.analysis_summary.update_analysis(toughest_day, most_fun_day, most_romantic_day)
 
     def show_about(self):
         Messagebox.show_info("AI Diary\nVersion 1.0\n\nA cool diary app for Aaryash!")
 
+    def bootstrap_classifier(self):
+        """Load the local tone classifier; a new one first learns the tones
+        Gemini gave past entries, a slice at a time so the UI stays responsive"""
+        classifier = self.ai_analyzer.classifier
+        if classifier is None or classifier.bootstrapped:
+            return
+        classifier.reset()
+        dates = sorted(date_str for date_str, tone in self.diary_manager.get_tones().items()
+                       if tone in classifier.tones)
+        logging.info(f"Training the tone classifier on {len(dates)} past entries")
+        self._learn_history(classifier, dates, 0)
+
+    def _learn_history(self, classifier, dates, start):
+        for date_str in dates[start:start + BOOTSTRAP_SLICE]:
+            entry = self.diary_manager.get_entry(datetime.strptime(date_str, '%Y-%m-%d'))
+            if entry and self.ai_analyzer.is_gemini_tone(entry):
+                classifier.learn(entry['content'], entry['tone'])
+        if start + BOOTSTRAP_SLICE < len(dates):
+            self.after(1, self._learn_history, classifier, dates, start + BOOTSTRAP_SLICE)
+        else:
+            classifier.mark_bootstrapped()
+            classifier.save()
+
     def show_analytics(self):
-        entries = self.diary_manager.get_all_entries()
-        AnalyticsDashboard(self, entries)
+        # Charts are drawn on a render thread, which is also where matplotlib is imported
+        from mood_analytics import AnalyticsDashboard
+        self._analytics_opened = True
+        AnalyticsDashboard(self, self.diary_manager)
+
+    def schedule_analytics_prerender(self):
+        """Redraw the analytics charts in the background once moods stop changing.
+
+        Gathering the chart data runs on this thread, and the first time it
+        imports NumPy and reads every tone, so nothing is prerendered until
+        the dashboard has been opened (and has paid that cost) once.
+        """
+        if not self._analytics_opened:
+            return
+        if self._prerender_job is not None:
+            self.after_cancel(self._prerender_job)
+        self._prerender_job = self.after(PRERENDER_DELAY_MS, self.prerender_analytics)
+
+    def prerender_analytics(self):
+        self._prerender_job = None
+        from mood_analytics import prerender
+        prerender(self.diary_manager)
         
+    def show_diagnostics(self):
+        DiagnosticsWindow(self, metrics.registry)
+
     def on_closing(self):
         """Handle window closing event"""
-        if self._save_in_progress:
-            Messagebox.show_warning("Please wait for the current operation to complete.")
-            return
-            
         if not self._want_to_close:
             self._want_to_close = True
-            if Messagebox.show_question("Do you want to quit?", "Confirm Exit"):
+            message = "Do you want to quit?"
+            if self._pending_analysis:
+                message = ("AI analysis is still running. Your entry is saved, "
+                           "but its analysis will be discarded.\n\n" + message)
+            if Messagebox.show_question(message, "Confirm Exit"):
+                try:
+                    # Buffered changes are written first; if that fails the app stays open
+                    self.diary_manager.flush()
+                except OSError as e:
+                    logging.error(f"Could not write diary changes: {e}")
+                    Messagebox.show_error(f"Your latest changes could not be saved:\n{e}")
+                    self._want_to_close = False
+                    return
                 try:
                     logging.info("Closing application")
+                    self.analysis_executor.shutdown()
+                    self.diary_manager.close()
+                    self.ai_analyzer.close()
                     self.destroy()  # Changed from quit() to destroy()
                 except Exception as e:
                     logging.error(f"Error while closing: {e}")
@@ -0,0 +1,222 @@
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from ai_analyzer import MOCK_SUMMARY, estimate_tokens
+
+BATCH_INSTRUCTIONS = """Follow your instructions for every diary entry below, answering with one object per entry.
+Copy each entry's date exactly as given into 'date'."""
+
+# Rough allowance for the JSON object the model writes back for each entry
+OUTPUT_TOKENS_PER_ENTRY = 120
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than requests_per_minute are made"""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+
+    def wait(self):
+        now = time.monotonic()
+        if now < self._next_slot:
+            time.sleep(self._next_slot - now)
+            now = self._next_slot
+        self._next_slot = now + self.interval
+
+
+class BackfillPipeline:
+    """Re-analyzes historical entries, many entries per Gemini request.
+
+    Progress is kept in a state file after every batch, so an interrupted run
+    picks up where it stopped. Results are written to the diary in one batch
+    once every request has been made.
+    """
+
+    def __init__(self, diary_manager, ai_analyzer, token_budget=8000, requests_per_minute=10,
+                 max_entries_per_batch=25, state_path='backfill_state.json'):
+        self.diary_manager = diary_manager
+        self.ai_analyzer = ai_analyzer
+        self.token_budget = token_budget
+        self.max_entries_per_batch = max_entries_per_batch
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.state_path = state_path
+
+    @staticmethod
+    def needs_backfill(entry):
+        """Entries never analyzed, or analyzed by the keyword-based mock"""
+        return not entry.get('tone') or bool(MOCK_SUMMARY.match(entry.get('summary', '')))
+
+    def select_dates(self, include_all=False):
+        # Shortened summaries are enough to spot mock analyses, and leave entry text on disk
+        summaries = self.diary_manager.get_summaries()
+        return sorted(date for date, entry in summaries.items()
+                      if include_all or self.needs_backfill(entry))
+
+    def _sanitized(self, date_str):
+        """The entry's text as sent to the model, or None if it has been deleted"""
+        entry = self.diary_manager.get_entry(datetime.strptime(date_str, '%Y-%m-%d'))
+        return self.ai_analyzer.sanitizer.sanitize(entry['content']) if entry else None
+
+    @staticmethod
+    def _format_entry(date_str, text):
+        return f"Date: {date_str}\nEntry: {text}\n"
+
+    def make_batches(self, dates):
+        """Group dates so each request stays within the token budget"""
+        # The model's system instruction is billed with every request too
+        overhead = estimate_tokens(self.ai_analyzer.system_instruction + BATCH_INSTRUCTIONS)
+        batch, used = [], overhead
+        for date_str in dates:
+            sanitized = self._sanitized(date_str)
+            if sanitized is None:
+                continue
+            cost = estimate_tokens(self._format_entry(date_str, sanitized.text)) + OUTPUT_TOKENS_PER_ENTRY
+            if batch and (used + cost > self.token_budget
+                          or len(batch) >= self.max_entries_per_batch):
+                yield batch
+                batch, used = [], overhead
+            # An entry larger than the budget on its own still gets a request
+            batch.append(date_str)
+            used += cost
+        if batch:
+            yield batch
+
+    def build_prompt(self, batch):
+        """(prompt, {date: SanitizedText}) for the entries of a batch still in the diary"""
+        sanitized = {}
+        for date_str in batch:
+            text = self._sanitized(date_str)
+            if text is not None:
+                sanitized[date_str] = text
+        parts = [BATCH_INSTRUCTIONS]
+        parts.extend(self._format_entry(date_str, text.text) for date_str, text in sanitized.items())
+        return "\n\n".join(parts), sanitized
+
+    def generation_config(self):
+        """The analyzer's response schema, as an array of dated analyses"""
+        config = dict(self.ai_analyzer.generation_config)
+        item = dict(config['response_schema'])
+        item['properties'] = dict(item['properties'], date={'type': 'STRING'})
+        item['required'] = ['date'] + item['required']
+        config['response_schema'] = {'type': 'ARRAY', 'items': item}
+        config['max_output_tokens'] = OUTPUT_TOKENS_PER_ENTRY * 2 * self.max_entries_per_batch
+        return config
+
+    def analyze_batch(self, batch):
+        """Send one request and return {date: [analysis, emotion, observation]}"""
+        prompt, sanitized = self.build_prompt(batch)
+        if not sanitized:
+            return {}
+        self.rate_limiter.wait()
+        response = self.ai_analyzer.resilience.call(
+            lambda: self.ai_analyzer.model.generate_content(
+                prompt,
+                generation_config=self.generation_config(),
+                safety_settings=self.ai_analyzer.safety_settings,
+                request_options={'timeout': self.ai_analyzer.request_timeout}
+            ))
+        items = json.loads(response.text)
+
+        results = {}
+        for item in items if isinstance(items, list) else []:
+            date_str = item.get('date') if isinstance(item, dict) else None
+            if not isinstance(date_str, str) or date_str not in sanitized:
+                logging.warning(f"Skipping backfill result for no entry in the batch: {item!r}")
+                continue
+            try:
+                # The checks analyze_entry makes; a bad item is left for another run
+                summary, tone, comment = self.ai_analyzer.validate_analysis(item)
+            except ValueError as e:
+                logging.warning(f"Skipping malformed backfill result for {date_str}: {e}")
+                continue
+            # Put the writer's own words back, as analyze_entry does
+            restore = sanitized[date_str].restore_output
+            results[date_str] = [restore(summary), tone, restore(comment)]
+        return results
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save_state(self, state):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self, include_all=False, progress=print):
+        """Run or resume a backfill and return the number of entries updated"""
+        state = self._load_state()
+        if state is None:
+            state = {'dates': self.select_dates(include_all), 'results': {}}
+            self._save_state(state)
+        else:
+            progress(f"Resuming backfill: {len(state['results'])} of "
+                     f"{len(state['dates'])} entries already analyzed")
+
+        remaining = [date_str for date_str in state['dates'] if date_str not in state['results']]
+        batches = list(self.make_batches(remaining))
+        for number, batch in enumerate(batches, start=1):
+            results = self.analyze_batch(batch)
+            state['results'].update(results)
+            self._save_state(state)
+            progress(f"Batch {number}/{len(batches)}: {len(results)} of {len(batch)} entries analyzed")
+
+        updated = self.apply_results(state['results'])
+        os.remove(self.state_path)
+        missing = len(state['dates']) - len(state['results'])
+        if missing:
+            progress(f"{missing} entries got no result and can be retried with another run")
+        return updated
+
+    def apply_results(self, results):
+        updated = 0
+        with self.diary_manager.batch():
+            for date_str, (summary, tone, comment) in results.items():
+                date = datetime.strptime(date_str, '%Y-%m-%d').date()
+                try:
+                    self.diary_manager.update_entry_analysis(date, summary, tone, comment, 'gemini')
+                    updated += 1
+                except ValueError:
+                    logging.warning(f"Entry for {date_str} was deleted during backfill")
+        return updated
+
+
+def main():
+    from dotenv import load_dotenv
+    from ai_analyzer import AIAnalyzer
+    from diary_manager import DiaryManager
+
+    parser = argparse.ArgumentParser(description="Re-analyze historical diary entries in batches")
+    parser.add_argument('--all', action='store_true',
+                        help="re-analyze every entry, not just unanalyzed or mock-analyzed ones")
+    parser.add_argument('--token-budget', type=int, default=8000,
+                        help="estimated tokens per request (default: 8000)")
+    parser.add_argument('--rpm', type=float, default=10,
+                        help="maximum requests per minute (default: 10)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        parser.error("GEMINI_API_KEY is not set")
+
+    diary_manager = DiaryManager(storage=os.getenv('DIARY_STORAGE', 'json'), lock=True)
+    pipeline = BackfillPipeline(diary_manager, AIAnalyzer.from_env(api_key),
+                                token_budget=args.token_budget, requests_per_minute=args.rpm)
+    try:
+        updated = pipeline.run(include_all=args.all)
+        print(f"Updated {updated} entries")
+    finally:
+        diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
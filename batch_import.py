@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime
+
+# A line holding only a date (optionally as a Markdown heading) starts an entry
+DATE_HEADER = re.compile(r'^\s*#*\s*(\d{4}-\d{2}-\d{2})\s*$')
+
+
+def read_ndjson(path):
+    """Yield entry dicts from a file with one JSON object per line.
+
+    Each object needs 'date' and 'content'; 'summary', 'tone', 'comment'
+    and 'tone_source' are kept if present.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                yield {'date': record['date'], 'content': record['content'],
+                       'summary': record.get('summary', ''), 'tone': record.get('tone', ''),
+                       'comment': record.get('comment', ''),
+                       'tone_source': record.get('tone_source', '')}
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"{path}:{number}: skipping malformed line ({e})")
+
+
+def read_text(path):
+    """Yield entries from a text file.
+
+    Entries start at a line holding only a date (YYYY-MM-DD, optionally as
+    a '# ' heading). A file without date lines is one entry dated by its
+    file name, e.g. 2024-03-01.txt.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    current, lines = None, []
+    for line in text.splitlines():
+        match = DATE_HEADER.match(line)
+        if match:
+            if current is not None and '\n'.join(lines).strip():
+                yield {'date': current, 'content': '\n'.join(lines).strip()}
+            current, lines = match.group(1), []
+        else:
+            lines.append(line)
+    if current is not None:
+        if '\n'.join(lines).strip():
+            yield {'date': current, 'content': '\n'.join(lines).strip()}
+        return
+    name = os.path.splitext(os.path.basename(path))[0]
+    if DATE_HEADER.match(name) and text.strip():
+        yield {'date': name, 'content': text.strip()}
+    else:
+        print(f"{path}: no date lines and the file name is not a date; skipped")
+
+
+def read_entries(paths):
+    for path in paths:
+        if path.endswith(('.ndjson', '.jsonl')):
+            yield from read_ndjson(path)
+        else:
+            yield from read_text(path)
+
+
+class Progress:
+    """Prints done/total (or just done, if total is None) and throughput at most every interval seconds"""
+
+    def __init__(self, total, label, interval=1.0):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def advance(self, count=1):
+        self.done += count
+        now = time.perf_counter()
+        if now - self._last >= self.interval or self.done == self.total:
+            self._last = now
+            rate = self.done / max(now - self.start, 1e-9)
+            done = self.done if self.total is None else f"{self.done}/{self.total}"
+            print(f"{self.label}: {done} ({rate:.1f} entries/s)", flush=True)
+
+
+# Each pool process builds its own analyzer once
+_worker_analyzer = None
+
+
+def _init_mock_worker():
+    global _worker_analyzer
+    from ai_analyzer import AIAnalyzer
+    _worker_analyzer = AIAnalyzer('offline', cache_path=None)
+
+
+def _mock_analyze_chunk(contents):
+    return [_worker_analyzer.mock_analyze_entry(content) for content in contents]
+
+
+def analyze_offline(contents, workers=None, chunk_size=200):
+    """Mock analysis of every entry on a process pool; results in input order"""
+    progress = Progress(len(contents), "Offline analysis")
+    chunks = [contents[i:i + chunk_size] for i in range(0, len(contents), chunk_size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_mock_worker) as pool:
+        for chunk_results in pool.map(_mock_analyze_chunk, chunks):
+            results.extend(chunk_results)
+            progress.advance(len(chunk_results))
+    return results
+
+
+async def _analyze_online(analyzer, contents, concurrency):
+    progress = Progress(len(contents), "Gemini analysis")
+    limit = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    # analyze_entry is blocking (SDK call, cache, retries), so each call runs
+    # on a thread; the semaphore keeps at most `concurrency` in flight
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-analysis") as threads:
+        async def analyze(content):
+            async with limit:
+                result = await loop.run_in_executor(threads, analyzer.analyze_entry, content)
+            progress.advance()
+            return result
+        return await asyncio.gather(*(analyze(content) for content in contents))
+
+
+def analyze_online(analyzer, contents, concurrency=4):
+    """Gemini analysis with at most `concurrency` requests in flight; results in input order"""
+    return asyncio.run(_analyze_online(analyzer, contents, concurrency))
+
+
+def import_entries(diary_manager, entries, analyses, allow_any_date=False):
+    """Write entries and their (summary, tone, comment) analyses in one batch.
+
+    An analysis that is an ai_analyzer.Analysis also stores its tone_source.
+    """
+    with diary_manager.batch():
+        for entry, analysis in zip(entries, analyses):
+            summary, tone, comment = analysis
+            entry_date = date.fromisoformat(entry['date'])
+            diary_manager.add_entry(entry_date, entry['content'], allow_any_date=allow_any_date)
+            if tone:
+                diary_manager.update_entry_analysis(entry_date, summary, tone, comment,
+                                                    getattr(analysis, 'tone_source', None))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='main.py import',
+        description="Import diary entries from text or NDJSON files and analyze them, without the UI")
+    parser.add_argument('files', nargs='+',
+                        help="NDJSON (.ndjson/.jsonl) files, or text files with YYYY-MM-DD lines")
+    parser.add_argument('--allow-any-date', action='store_true',
+                        help="accept entries for any date, not just today or yesterday")
+    parser.add_argument('--mock', action='store_true',
+                        help="use offline keyword analysis even if GEMINI_API_KEY is set")
+    parser.add_argument('--no-analysis', action='store_true', help="import without analyzing")
+    parser.add_argument('--reanalyze', action='store_true',
+                        help="analyze entries that already carry a tone in the input")
+    parser.add_argument('--skip-existing', action='store_true',
+                        help="leave dates that are already in the diary untouched")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processes for offline analysis (default: CPU count)")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Gemini requests in flight (default: 4)")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from ai_analyzer import TONE_SOURCES, Analysis
+    from diary_manager import DiaryManager
+    load_dotenv()
+
+    diary_manager = DiaryManager(storage=os.getenv('DIARY_STORAGE', 'json'), lock=True)
+    try:
+        entries, rejected = {}, 0
+        for entry in read_entries(args.files):
+            try:
+                entry_date = datetime.strptime(entry['date'], '%Y-%m-%d').date()
+            except ValueError:
+                print(f"Skipping entry with invalid date {entry['date']!r}")
+                rejected += 1
+                continue
+            if not args.allow_any_date and not diary_manager.is_valid_date(entry_date):
+                rejected += 1
+                continue
+            if args.skip_existing and diary_manager.get_entry(entry_date) is not None:
+                continue
+            entries[entry['date']] = entry  # A later duplicate date wins
+        if rejected and not args.allow_any_date:
+            print(f"{rejected} entries are not for today or yesterday; "
+                  f"use --allow-any-date to import them")
+        entries = list(entries.values())
+        if not entries:
+            print("Nothing to import")
+            return
+
+        analyses = [Analysis(e.get('summary', ''), e.get('tone', ''), e.get('comment', ''),
+                             e.get('tone_source') if e.get('tone_source') in TONE_SOURCES else None)
+                    for e in entries]
+        todo = [i for i, e in enumerate(entries)
+                if not args.no_analysis and (args.reanalyze or not e.get('tone'))]
+        contents = [entries[i]['content'] for i in todo]
+        start = time.perf_counter()
+        api_key = os.getenv('GEMINI_API_KEY')
+        if not contents:
+            results = []
+        elif args.mock or not api_key:
+            if not args.mock:
+                print("GEMINI_API_KEY is not set; using offline analysis")
+            results = analyze_offline(contents, args.workers)
+        else:
+            from ai_analyzer import AIAnalyzer
+            results = analyze_online(AIAnalyzer.from_env(api_key), contents, args.concurrency)
+        for i, result in zip(todo, results):
+            analyses[i] = result
+        analysis_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        import_entries(diary_manager, entries, analyses, allow_any_date=True)
+        print(f"Imported {len(entries)} entries ({len(contents)} analyzed in {analysis_seconds:.1f}s); "
+              f"written in {time.perf_counter() - start:.2f}s")
+    finally:
+        diary_manager.close()
+
+
+if __name__ == "__main__":
+    main()
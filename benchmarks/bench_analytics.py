@@ -0,0 +1,120 @@
+"""Cost of the mood trend queries behind the analytics dashboard.
+
+Builds the tone history of --count synthetic days (benchmarks/corpus.py)
+and times each MoodSeries query against the same result computed with
+plain Python loops over the {date: tone} mapping. It also times what the
+dashboard pays after one entry changes: MoodTrends re-reads only that
+month and recomputes only the results covering it.
+
+Run from the project root:
+    python benchmarks/bench_analytics.py --count 100000
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import iter_entries  # noqa: E402
+from mood_timeseries import POSITIVE_TONES, MoodSeries, MoodTrends  # noqa: E402
+
+
+def timed(func, repeat=3):
+    """Best of repeat runs, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def loop_rollup(tones):
+    counts = Counter()
+    for date_str, tone in tones.items():
+        counts[date_str[:7], tone] += 1
+    return counts
+
+
+def loop_rolling_ratio(tones, window=30):
+    days = sorted(tones)
+    first, last = date.fromisoformat(days[0]), date.fromisoformat(days[-1])
+    ratios = []
+    day = first
+    while day <= last:
+        hits = counted = 0
+        for back in range(window):
+            tone = tones.get((day - timedelta(days=back)).isoformat())
+            if tone:
+                counted += 1
+                hits += tone in POSITIVE_TONES
+        ratios.append(hits / counted if counted else None)
+        day += timedelta(days=1)
+    return ratios
+
+
+def loop_streak(tones):
+    longest = run = 0
+    previous = None
+    for date_str in sorted(tones):
+        day = date.fromisoformat(date_str)
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    return longest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mood trend queries")
+    parser.add_argument('--count', type=int, default=100000, help="days of history")
+    args = parser.parse_args()
+
+    tones = {date_str: entry['tone'] for date_str, entry in iter_entries(args.count)}
+
+    def provider(start, end):
+        if start is None:
+            return tones
+        return {d: t for d, t in tones.items() if start <= d <= end}
+
+    build_ms = timed(lambda: MoodSeries.from_tones(tones), repeat=1)
+    series = MoodSeries.from_tones(tones)
+    rows = [
+        ('monthly rollup', lambda: series.rollup('month'), lambda: loop_rollup(tones)),
+        ('rolling 30-day ratio', lambda: series.rolling_ratio(POSITIVE_TONES),
+         lambda: loop_rolling_ratio(tones)),
+        ('longest streak', lambda: series.streaks(), lambda: loop_streak(tones)),
+        ('tone counts', lambda: series.counts(), lambda: Counter(tones.values())),
+    ]
+    print(f"{args.count} days; building the arrays took {build_ms:.1f} ms")
+    print(f"{'query':24}{'numpy ms':>10}{'loops ms':>10}{'speedup':>9}")
+    for name, vectorized, loops in rows:
+        fast, slow = timed(vectorized), timed(loops, repeat=1)
+        print(f"{name:24}{fast:10.1f}{slow:10.1f}{slow / fast:8.0f}x")
+
+    trends = MoodTrends(provider)
+    last = max(tones)
+
+    def dashboard():
+        trends.rollup('month')
+        trends.rolling_ratio(POSITIVE_TONES)
+        trends.counts()
+        trends.weekday_profile()
+
+    cold = timed(dashboard, repeat=1)
+    warm = timed(dashboard)
+
+    def edit():
+        tones[last] = 'sad' if tones[last] != 'sad' else 'fun'
+        trends.invalidate(last)
+        dashboard()
+
+    print(f"dashboard queries: first {cold:.1f} ms, cached {warm:.2f} ms, "
+          f"after one edit {timed(edit):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
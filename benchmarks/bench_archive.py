@@ -0,0 +1,103 @@
+"""Throughput and memory of streaming archive export and restore.
+
+An NDJSON archive of --count synthetic entries is written straight from
+benchmarks/corpus.py (never held in memory), restored into an empty diary
+with diary_archive.restore_archive, and exported again in every format.
+Each step reports entries/s, MB/s of archive data and the peak memory
+traced while it ran; for a streaming pipeline the peak should stay roughly
+flat as --count grows.
+
+The json backend keeps an index record per entry and rewrites the whole
+file with every batch, so its peak grows with the diary, and restore
+batches grow with it too (diary_archive.REWRITE_BATCH_SHARE). Restore with
+--storage json:
+
+    entries   fixed 1000-entry batches     growing batches
+     10000      4.9 s  2050/s    7.6 MB     4.3 s  2304/s    9.3 MB
+     40000     55.7 s   719/s   24.5 MB    18.1 s  2211/s   35.6 MB
+     80000    195.6 s   409/s   47.0 MB    40.1 s  1996/s   69.5 MB
+
+Run from the project root:
+    python benchmarks/bench_archive.py --count 100000 --storage partitioned
+    python benchmarks/bench_archive.py --count 40000 --storage json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import iter_entries  # noqa: E402
+from diary_archive import export_entries, open_archive, restore_archive  # noqa: E402
+from diary_manager import DiaryManager  # noqa: E402
+
+
+def write_archive(path, count):
+    with open_archive(path, 'w') as f:
+        for date_str, entry in iter_entries(count):
+            f.write(json.dumps({'date': date_str, **entry}, ensure_ascii=False) + '\n')
+
+
+def size_of(path):
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path))
+    return os.path.getsize(path)
+
+
+def measure(func):
+    """(seconds, peak traced MB) for func(), with its progress output hidden"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming export and restore")
+    parser.add_argument('--count', type=int, default=100000, help="entries in the archive")
+    parser.add_argument('--storage', default='partitioned',
+                        choices=['json', 'journal', 'sqlite', 'partitioned'])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='diary-archive-')
+    try:
+        source = os.path.join(workdir, 'source.ndjson')
+        print(f"Writing an archive of {args.count} entries...")
+        write_archive(source, args.count)
+
+        diary_manager = DiaryManager(os.path.join(workdir, 'diary_entries.json'), args.storage)
+        steps = [('restore ndjson', source,
+                  lambda: restore_archive(diary_manager, source, args.batch_size))]
+        for name, fmt in (('export.ndjson', 'ndjson'), ('export.ndjson.gz', 'ndjson'),
+                          ('export.csv', 'csv'), ('export.csv.gz', 'csv'),
+                          ('markdown', 'markdown')):
+            path = os.path.join(workdir, name)
+            steps.append((f'export {name}', path,
+                          lambda path=path, fmt=fmt: export_entries(diary_manager, path, fmt)))
+
+        print(f"{'step':24}{'seconds':>10}{'entries/s':>12}{'MB/s':>8}{'peak MB':>10}")
+        for name, path, func in steps:
+            seconds, peak = measure(func)
+            megabytes = size_of(path) / 1e6
+            print(f"{name:24}{seconds:10.2f}{args.count / seconds:12.0f}"
+                  f"{megabytes / seconds:8.1f}{peak:10.1f}")
+        diary_manager.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
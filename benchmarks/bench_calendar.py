@@ -0,0 +1,116 @@
+"""UI benchmark: cost of one CalendarWidget month navigation.
+
+Compares the pooled CalendarWidget with the previous approach that destroyed
+and recreated every day button and tooltip on each month change. Each
+navigation is followed by update_idletasks() so layout work is included.
+
+Run from the project root (needs a display):
+    python benchmarks/bench_calendar.py [--navigations 200] [--entries 3650]
+"""
+import argparse
+import calendar
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ttkbootstrap as ttk
+from idlelib.tooltip import Hovertip
+
+from ui_components import CalendarWidget
+
+
+def make_entries(count):
+    start = date.today() - timedelta(days=count)
+    return {str(start + timedelta(days=i)): {'content': "...", 'summary': "A day worth writing about",
+                                             'tone': 'fun', 'comment': ""}
+            for i in range(count)}
+
+
+class RebuildingCalendar(CalendarWidget):
+    """The previous implementation: destroy and recreate the grid on every navigation"""
+
+    def create_widgets(self):
+        self.header = ttk.Label(self)
+        self.calendar = ttk.Frame(self)
+        self.calendar.pack()
+        self._tooltips = []
+        self.update_calendar()
+
+    def update_calendar(self):
+        for widget in self.calendar.winfo_children():
+            widget.destroy()
+        cal = calendar.monthcalendar(self.date.year, self.date.month)
+        for i, day in enumerate(['M', 'T', 'W', 'T', 'F', 'S', 'S']):
+            ttk.Label(self.calendar, text=day, font=("Roboto", 10)).grid(
+                row=0, column=i, padx=2, pady=(0, 5))
+        self.date_buttons = {}
+        for week_num, week in enumerate(cal, start=1):
+            for day_num, day in enumerate(week):
+                if day != 0:
+                    btn = ttk.Button(self.calendar, text=str(day), bootstyle="info-outline",
+                                     command=lambda d=day: self.on_date_click(d), width=4)
+                    btn.grid(row=week_num, column=day_num, padx=2, pady=2)
+                    self.date_buttons[day] = btn
+        self.header.config(text=self.date.strftime("%B %Y"))
+        if self.entry_provider:
+            self.update_tooltips(self.entry_provider(*self.month_range()))
+
+    def update_tooltips(self, entries):
+        for tip in self._tooltips:
+            tip.__del__()
+        self._tooltips = []
+        for day, btn in self.date_buttons.items():
+            date_str = f"{self.date.year}-{self.date.month:02d}-{day:02d}"
+            if date_str in entries:
+                entry = entries[date_str]
+                text = f"Mood: {entry['tone']}\n{entry['summary'][:50]}..."
+            else:
+                text = "No entry"
+            self._tooltips.append(Hovertip(btn, text, hover_delay=500))
+
+
+def measure(root, widget_class, provider, navigations):
+    widget = widget_class(root)
+    widget.pack()
+    widget.set_entry_provider(provider)
+    root.update()
+    start = time.perf_counter()
+    for i in range(navigations):
+        # Scroll back a year, then forward again
+        if (i // 12) % 2 == 0:
+            widget.prev_month()
+        else:
+            widget.next_month()
+        root.update_idletasks()
+    elapsed = time.perf_counter() - start
+    widget.destroy()
+    return elapsed / navigations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--navigations', type=int, default=200)
+    parser.add_argument('--entries', type=int, default=3650)
+    args = parser.parse_args()
+
+    entries = make_entries(args.entries)
+
+    def provider(start, end):
+        start, end = str(start), str(end)
+        return {d: e for d, e in entries.items() if start <= d <= end}
+
+    root = ttk.Window(themename="darkly")
+    try:
+        for name, widget_class in (("rebuild per month", RebuildingCalendar),
+                                   ("pooled cells", CalendarWidget)):
+            per_nav = measure(root, widget_class, provider, args.navigations)
+            print(f"  {name:<18} {per_nav:7.2f} ms per navigation")
+    finally:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    main()
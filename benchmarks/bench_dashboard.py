@@ -0,0 +1,104 @@
+"""UI benchmark: opening the analytics dashboard over and over.
+
+The default view is pre-rendered (as the app does after login), then the
+dashboard is opened and closed --opens times. Each open is timed until its
+charts are on screen, and the process memory is sampled as it goes; with
+one shared off-screen figure and a bounded image cache it should stay flat.
+
+Run from the project root (needs a display):
+    python benchmarks/bench_dashboard.py [--opens 100] [--days 3650]
+"""
+import argparse
+import gc
+import os
+import random
+import statistics
+import sys
+import time
+import types
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ttkbootstrap as ttk
+
+from mood_analytics import AnalyticsDashboard, prerender
+from mood_charts import renderer
+from mood_timeseries import MoodTrends
+
+TONES = ['fun', 'neutral', 'excited', 'tough', 'sad', 'romantic', '']
+
+
+def make_tones(days):
+    rng = random.Random(7)
+    today = date.today()
+    return {str(today - timedelta(days=i)): rng.choice(TONES) for i in range(days)
+            if rng.random() < 0.8}
+
+
+def memory_mb():
+    """Resident memory where /proc is available, else None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        return None
+
+
+def wait_until(root, done, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise RuntimeError("charts were not drawn in time")
+        root.update()
+        time.sleep(0.001)
+
+
+def open_once(root, diary):
+    start = time.perf_counter()
+    dashboard = AnalyticsDashboard(root, diary)
+    wait_until(root, lambda: dashboard._shown is not None and dashboard._shown == dashboard._key)
+    elapsed = (time.perf_counter() - start) * 1000
+    # Let a resize to the real chart size render too, as it would on screen
+    root.after(300)
+    root.update()
+    wait_until(root, lambda: dashboard._shown == dashboard._key)
+    dashboard.destroy()
+    root.update()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--opens', type=int, default=100)
+    parser.add_argument('--days', type=int, default=3650)
+    args = parser.parse_args()
+
+    tones = make_tones(args.days)
+    diary = types.SimpleNamespace(mood_trends=MoodTrends(lambda start, end: tones))
+    root = ttk.Window(themename="darkly")
+    root.withdraw()
+    try:
+        prerender(diary)
+        wait_until(root, lambda: len(renderer._cache) > 0)
+        times, samples = [], []
+        for i in range(args.opens):
+            times.append(open_once(root, diary))
+            if i in (0, 9, args.opens - 1):
+                gc.collect()
+                samples.append((i + 1, memory_mb()))
+        renderer._cache.clear()
+        cold = open_once(root, diary)
+
+        print(f"  open, pre-rendered  median {statistics.median(times):7.1f} ms"
+              f"   max {max(times):7.1f} ms")
+        print(f"  open, cache cleared        {cold:7.1f} ms")
+        for opens, megabytes in samples:
+            if megabytes is not None:
+                print(f"  memory after {opens:4} opens  {megabytes:7.1f} MB")
+    finally:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Memory retained by an open diary, per storage backend.
+
+A diary is generated with benchmarks/corpus.py, then each variant opens it
+in a fresh Python process and asks for what the calendar view needs (the
+tone and summary of every entry):
+
+  dict         json.load of the whole file, the old in-memory model
+  json         DiaryManager with JSON storage (EntryRecord index, lazy text)
+  journal      DiaryManager with JSON plus a write-ahead journal
+  sqlite       DiaryManager with SQLite storage
+  partitioned  DiaryManager with one JSON file per month
+
+Retained memory is what tracemalloc still counts after the open, with the
+result held; peak RSS is the process high-water mark. Each backend is opened
+once before measuring, so sidecar files and migrations are not
+part of the numbers.
+
+Run from the project root:
+    python benchmarks/bench_memory.py --count 100000
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = ('dict', 'json', 'journal', 'sqlite', 'partitioned')
+
+
+def open_variant(variant, path):
+    """Open the diary and return what keeps it alive"""
+    if variant == 'dict':
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    from diary_manager import DiaryManager
+    diary_manager = DiaryManager(path, variant)
+    return diary_manager, diary_manager.get_summaries()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def measure(variant, path):
+    """Runs in the child process; prints one JSON line"""
+    import diary_manager  # noqa: F401  Imports are not part of the measurement
+    gc.collect()
+    tracemalloc.start()
+    held = open_variant(variant, path)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(json.dumps({'variant': variant, 'retained_bytes': retained,
+                      'peak_rss_mb': peak_rss_mb()}))
+    del held
+
+
+def run_variant(variant, path):
+    if variant != 'dict':
+        from diary_manager import DiaryManager
+        DiaryManager(path, variant).close()
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', variant, path],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory held by an open diary")
+    parser.add_argument('--count', type=int, default=100000, help="entries in the corpus")
+    parser.add_argument('--variants', default=','.join(VARIANTS),
+                        help="comma-separated subset of " + ', '.join(VARIANTS))
+    parser.add_argument('--child', nargs=2, metavar=('VARIANT', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        measure(*args.child)
+        return
+
+    from corpus import write_corpus
+    workdir = tempfile.mkdtemp(prefix='diary-mem-')
+    try:
+        source = os.path.join(workdir, 'corpus.json')
+        print(f"Generating {args.count} entries...")
+        write_corpus(source, args.count)
+        print(f"{'variant':13}{'retained MB':>14}{'bytes/entry':>14}{'peak RSS MB':>14}")
+        for variant in args.variants.split(','):
+            variant_dir = os.path.join(workdir, variant)
+            os.mkdir(variant_dir)
+            path = os.path.join(variant_dir, 'diary_entries.json')
+            shutil.copy(source, path)
+            result = run_variant(variant, path)
+            retained = result['retained_bytes']
+            print(f"{variant:13}{retained / 1e6:14.1f}{retained / args.count:14.0f}"
+                  f"{result['peak_rss_mb']:14.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Tokens and latency per entry: the old single-prompt request versus the
+token-budgeted AIAnalyzer.
+
+  before   the whole analysis prompt and the entry in one request, as
+           analyze_entry used to send it, with no size limit
+  after    AIAnalyzer.analyze_entry: instructions as a system instruction,
+           JSON schema output, and entries over --token-budget condensed
+           chunk by chunk before the analysis request
+
+Entries come from the synthetic corpus (typical days) plus long and very
+long entries made by joining --long and --very-long days together.
+Against the fake model, latency is --latency seconds per request plus
+--prompt-token-ms and --response-token-ms per token. With --live the
+report uses Gemini (GEMINI_API_KEY, GEMINI_MODEL) and its token counts.
+
+Run from the project root:
+    python benchmarks/bench_prompt.py --entries 40 --token-budget 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metrics  # noqa: E402
+from ai_analyzer import CONDENSE_INSTRUCTION, AIAnalyzer, estimate_tokens  # noqa: E402
+from corpus import iter_entries  # noqa: E402
+from fake_model import FakeModel  # noqa: E402
+
+# The prompt analyze_entry used to put in front of every entry
+LEGACY_PROMPT = """You are an AI diary analyst and the writer's best friend and the writer's name is Writer, and you have to give an friednly response as if you are talking to him. For the given diary entry, please provide:
+1. An objective analysis focusing on the writer's daily experiences and emotional journey (2-3 sentences)
+2. The primary emotional state expressed (options: appreciative, joyful, content, reflective, concerned, downhearted)
+3. A constructive observation about the writer's experiences (1 sentence)
+Format the response as JSON with keys: 'analysis', 'emotion', 'observation'"""
+
+
+class InstructedModel:
+    """Fake model wrapper that bills the system instruction with each prompt,
+    as Gemini does, and records the input tokens of every request"""
+
+    def __init__(self, model, analysis_instruction):
+        self.model = model
+        self.analysis_instruction = analysis_instruction
+        self.request_tokens = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        analysis = (generation_config or {}).get('response_mime_type') == 'application/json'
+        prompt = f"{self.analysis_instruction if analysis else CONDENSE_INSTRUCTION}\n\n{prompt}"
+        with self._lock:
+            self.request_tokens.append(estimate_tokens(prompt))
+        return self.model.generate_content(prompt, generation_config=generation_config, **kwargs)
+
+
+def make_entries(count, long_days, very_long_days):
+    days = [entry['content'] for _, entry in iter_entries(count * (1 + long_days + very_long_days))]
+    groups = {'typical': days[:count], 'long': [], 'very long': []}
+    rest = days[count:]
+    for i in range(count):
+        groups['long'].append('\n\n'.join(rest[:long_days]))
+        rest = rest[long_days:]
+    for i in range(count):
+        groups['very long'].append('\n\n'.join(rest[:very_long_days]))
+        rest = rest[very_long_days:]
+    return groups
+
+
+def run_before(model, analyzer, entries):
+    """(prompt tokens, response tokens, requests, seconds) per entry, old style"""
+    results = []
+    for content in entries:
+        prompt = f"{LEGACY_PROMPT}\n\nDiary entry: {analyzer.preprocess_entry(content)}"
+        start = time.perf_counter()
+        response = model.generate_content(prompt, safety_settings=analyzer.safety_settings)
+        seconds = time.perf_counter() - start
+        usage = getattr(response, 'usage_metadata', None)
+        results.append((getattr(usage, 'prompt_token_count', None) or estimate_tokens(prompt),
+                        getattr(usage, 'candidates_token_count', None) or estimate_tokens(response.text),
+                        1, seconds))
+    return results
+
+
+def run_after(analyzer, entries):
+    counters = metrics.registry.counters
+    names = ('gemini_prompt_tokens_total', 'gemini_response_tokens_total', 'gemini_condense_calls_total')
+    results = []
+    for content in entries:
+        before = [counters[name].value for name in names]
+        start = time.perf_counter()
+        analyzer.analyze_entry(content)
+        seconds = time.perf_counter() - start
+        prompt, response, condense = (counters[name].value - value for name, value in zip(names, before))
+        results.append((prompt, response, 1 + condense, seconds))
+    return results
+
+
+def summarize(results):
+    prompt, response, requests, seconds = zip(*results)
+    seconds = sorted(seconds)
+    return (statistics.mean(prompt), statistics.mean(response), statistics.mean(requests),
+            statistics.mean(seconds) * 1000, seconds[int(len(seconds) * 0.95)] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tokens and latency per analysis request")
+    parser.add_argument('--entries', type=int, default=40, help="entries per size group")
+    parser.add_argument('--long', type=int, default=20, help="days joined into a long entry")
+    parser.add_argument('--very-long', type=int, default=60, help="days joined into a very long entry")
+    parser.add_argument('--token-budget', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.3, help="fake model seconds per request")
+    parser.add_argument('--prompt-token-ms', type=float, default=0.2,
+                        help="fake model milliseconds per prompt token")
+    parser.add_argument('--response-token-ms', type=float, default=5.0,
+                        help="fake model milliseconds per response token")
+    parser.add_argument('--live', action='store_true', help="use Gemini instead of the fake model")
+    args = parser.parse_args()
+
+    sys.stdout = open(os.devnull, 'w')  # The analyzer logs every request
+    if args.live:
+        from dotenv import load_dotenv
+        load_dotenv()
+        analyzer = AIAnalyzer.from_env(os.environ['GEMINI_API_KEY'], cache_path=None,
+                                       token_budget=args.token_budget)
+        import google.generativeai as genai
+        legacy_model = genai.GenerativeModel(analyzer.model_name)
+        recorder = None
+    else:
+        fake = FakeModel(args.latency, prompt_token_latency=args.prompt_token_ms / 1000,
+                         response_token_latency=args.response_token_ms / 1000)
+        analyzer = AIAnalyzer('fake', cache_path=None, token_budget=args.token_budget)
+        recorder = InstructedModel(fake, analyzer.system_instruction)
+        analyzer = AIAnalyzer('fake', cache_path=None, token_budget=args.token_budget, model=recorder)
+        legacy_model = fake
+    groups = make_entries(args.entries, args.long, args.very_long)
+    rows = []
+    for name, entries in groups.items():
+        before = summarize(run_before(legacy_model, analyzer, entries))
+        after = summarize(run_after(analyzer, entries))
+        rows.append((name, before, after))
+    sys.stdout = sys.__stdout__
+
+    print(f"{'entries':<10}{'':>7}{'prompt tok':>12}{'reply tok':>11}{'requests':>10}"
+          f"{'mean ms':>10}{'p95 ms':>10}")
+    for name, before, after in rows:
+        for label, (prompt, response, requests, mean, p95) in (('before', before), ('after', after)):
+            print(f"{name:<10}{label:>7}{prompt:12.0f}{response:11.0f}{requests:10.1f}"
+                  f"{mean:10.0f}{p95:10.0f}")
+    if recorder is not None:
+        largest = max(recorder.request_tokens)
+        ok = largest <= args.token_budget
+        print(f"{'PASS' if ok else 'FAIL'}  every request stays within the token budget"
+              f" (largest {largest} of {args.token_budget})")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
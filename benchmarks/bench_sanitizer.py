@@ -0,0 +1,71 @@
+"""Micro-benchmark: Sanitizer versus the old chained str.replace preprocessing.
+
+Run from the project root:
+    python benchmarks/bench_sanitizer.py [--size 8192] [--entries 200]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_sanitizer import DEFAULT_REPLACEMENTS, Sanitizer
+
+# Diary-like filler vocabulary; sanitized words are mixed in at a chosen rate
+FILLER = ("today I went to the park with my friends and felt calm about work "
+          "the morning was hard but the evening made everything feel light again "
+          "we talked for hours about plans for the weekend and what comes next "
+          "heartbeat sweetheart lovely").split()
+SANITIZED = "love heart relationship romantic romance relationships Love".split()
+
+
+def legacy_preprocess(content):
+    processed_content = content
+    for old, new in DEFAULT_REPLACEMENTS.items():
+        processed_content = processed_content.replace(old, new)
+    return processed_content
+
+
+def make_entry(rng, size, density):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(SANITIZED if rng.random() < density else FILLER)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=8192, help="characters per entry")
+    parser.add_argument('--entries', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    sanitizer = Sanitizer()
+    for label, density in (("typical", 0.01), ("dense", 0.10)):
+        rng = random.Random(42)
+        entries = [make_entry(rng, args.size, density) for _ in range(args.entries)]
+        total_mb = sum(len(entry) for entry in entries) / 1e6
+
+        def run(func):
+            best = min(timeit.repeat(lambda: [func(entry) for entry in entries],
+                                     number=1, repeat=args.repeat))
+            return best, total_mb / best
+
+        results = [
+            ("str.replace chain", run(legacy_preprocess)),
+            ("Sanitizer (text only)", run(sanitizer)),
+            ("Sanitizer (with offset map)", run(sanitizer.sanitize)),
+        ]
+        print(f"{label}: {density:.0%} sanitized words, {args.entries} entries x "
+              f"{args.size} chars ({total_mb:.1f} MB), best of {args.repeat}")
+        for name, (seconds, mb_per_s) in results:
+            print(f"  {name:<28} {seconds * 1000:8.1f} ms  {mb_per_s:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Load test of the diary server (main.py serve) with concurrent clients.
+
+The server runs in its own process on a temporary diary, with a fake model
+of --latency seconds per analysis. For each client count in --clients:
+
+  storage      every client thread makes --requests calls through its own
+               DiaryClient: saves of its own days, reads, calendar
+               summaries and searches; reports requests/s and latency
+  analysis     every client asks for an analysis of one of a few distinct
+               texts at the same moment; coalescing should keep the model
+               calls near the number of distinct texts
+
+Then it checks that a second process cannot open the diary while the
+server has it, and that after shutdown the diary holds every client's
+last save of each of its days.
+
+Run from the project root:
+    python benchmarks/bench_server.py --clients 1,4,16,64 --requests 200
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from diary_client import DiaryClient  # noqa: E402
+from diary_manager import DiaryManager  # noqa: E402
+from file_lock import DiaryLockedError  # noqa: E402
+
+FIRST_DAY = date(2020, 1, 1)
+DAYS = 730
+DISTINCT_TEXTS = 4
+URL = None  # Of the server, once it is up
+
+
+def run_server(path, storage, latency, concurrency, ready, stop):
+    """Server process: serve the diary until stop is set, then save and close it"""
+    sys.stdout = open(os.devnull, 'w')  # The analyzer logs every request
+    from ai_analyzer import AIAnalyzer
+    from diary_server import DiaryServer
+    from fake_model import FakeModel
+
+    analyzer = AIAnalyzer('fake', cache_path=None, model=FakeModel(latency))
+    server = DiaryServer(DiaryManager(path, storage, lock=True), analyzer.analyze_entry,
+                         port=0, concurrency=concurrency)
+
+    async def serve():
+        await server.start()
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        threading.Thread(target=lambda: (stop.wait(), loop.call_soon_threadsafe(stopped.set)),
+                         daemon=True).start()
+        ready.put(server.port)
+        await server.serve(stopped)
+
+    asyncio.run(serve())
+    server.close()
+
+
+def run_clients(count, work):
+    """Run work(client number, client) on count threads at once; returns wall seconds"""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def client_thread(number):
+        client = DiaryClient(URL)
+        barrier.wait()
+        try:
+            work(number, client)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=client_thread, args=(i,)) for i in range(count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - start
+
+
+def storage_load(clients, requests, saved):
+    latencies = []
+    lock = threading.Lock()
+
+    def work(number, client):
+        rng = random.Random(number)
+        own_days = [FIRST_DAY + timedelta(days=d) for d in range(number, DAYS, clients)]
+        timings = []
+        for i in range(requests):
+            kind = rng.random()
+            start = time.perf_counter()
+            if kind < 0.4:
+                day = rng.choice(own_days)
+                content = f"client {number} save {i}: a walk, some work and an early night"
+                client.add_entry(day, content, allow_any_date=True)
+                saved[day.isoformat()] = content
+            elif kind < 0.8:
+                client.get_entry(FIRST_DAY + timedelta(days=rng.randrange(DAYS)))
+            elif kind < 0.9:
+                month = FIRST_DAY + timedelta(days=rng.randrange(DAYS))
+                client.get_summaries(month.replace(day=1), month.replace(day=28))
+            else:
+                client.search(rng.choice(["walk", "work", "night", "early*"]))
+            timings.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(timings)
+
+    seconds = run_clients(clients, work)
+    latencies.sort()
+    return (len(latencies) / seconds, statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.95)] * 1000)
+
+
+def analysis_load(clients, round_number):
+    def work(number, client):
+        # Distinct per round, so no round finds another round's analysis running
+        client.analyze(f"Round {round_number}, text {number % DISTINCT_TEXTS}: "
+                       f"a quiet day with a long walk.")
+
+    calls_before = server_counter('server_analysis_calls_total')
+    seconds = run_clients(clients, work)
+    return seconds, server_counter('server_analysis_calls_total') - calls_before
+
+
+def server_counter(name):
+    client = DiaryClient(URL)
+    try:
+        text = client.request('GET', '/metrics')
+    finally:
+        client.close()
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.split()[1])
+    return 0.0
+
+
+def main():
+    global URL
+    parser = argparse.ArgumentParser(description="Load test the diary server")
+    parser.add_argument('--clients', default='1,4,16,64', help="comma-separated client counts")
+    parser.add_argument('--requests', type=int, default=200, help="storage requests per client")
+    parser.add_argument('--storage', default='json',
+                        choices=['json', 'journal', 'sqlite', 'partitioned'])
+    parser.add_argument('--latency', type=float, default=0.2, help="fake model seconds per call")
+    parser.add_argument('--concurrency', type=int, default=4, help="server analysis pool size")
+    args = parser.parse_args()
+    client_counts = [int(n) for n in args.clients.split(',')]
+
+    failed = 0
+    with tempfile.TemporaryDirectory(prefix='diary-server-') as workdir:
+        path = os.path.join(workdir, 'diary_entries.json')
+        context = multiprocessing.get_context('spawn')
+        ready, stop = context.Queue(), context.Event()
+        process = context.Process(target=run_server, args=(path, args.storage, args.latency,
+                                                           args.concurrency, ready, stop))
+        process.start()
+        URL = f"http://127.0.0.1:{ready.get(timeout=60)}"
+        saved = {}
+        try:
+            print(f"{'clients':>8}{'requests/s':>12}{'p50 ms':>9}{'p95 ms':>9}"
+                  f"{'analyses':>10}{'model calls':>13}{'seconds':>9}")
+            for round_number, clients in enumerate(client_counts):
+                rate, p50, p95 = storage_load(clients, args.requests, saved)
+                seconds, calls = analysis_load(clients, round_number)
+                print(f"{clients:8}{rate:12.0f}{p50:9.1f}{p95:9.1f}"
+                      f"{clients:10}{calls:13.0f}{seconds:9.2f}")
+
+            try:
+                DiaryManager(path, args.storage, lock=True)
+                ok = False
+            except DiaryLockedError:
+                ok = True
+            failed += not ok
+            print(f"{'PASS' if ok else 'FAIL'}  a second process cannot open the served diary")
+        finally:
+            stop.set()
+            process.join(timeout=60)
+
+        diary_manager = DiaryManager(path, args.storage)
+        entries = diary_manager.get_entries_in_range()
+        diary_manager.storage.close()
+        lost = [day for day, content in saved.items()
+                if entries.get(day, {}).get('content') != content]
+        failed += bool(lost)
+        print(f"{'FAIL' if lost else 'PASS'}  every acknowledged save is on disk after shutdown"
+              f" ({len(saved)} days, {len(lost)} lost)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Storage, analysis and aggregation benchmarks on synthetic diaries.
+
+For each corpus size, a diary is generated with benchmarks/corpus.py in a
+scratch directory and the hot paths are timed (best of --repeat runs):
+
+  open_diary_warm      DiaryManager(...) after a clean shutdown, as at app startup
+  open_diary           DiaryManager(...) on a diary with no sidecar files
+  load_entries         DiaryManager.load_entries
+  save_entries         DiaryManager.save_entries
+  mock_analyze_entry   AIAnalyzer.mock_analyze_entry, per entry of a sample
+  preprocess_entry     AIAnalyzer.preprocess_entry, per entry of a sample
+  analyze_all_entries  AIAnalyzer.analyze_all_entries over the whole diary
+  mood_counts          DiaryManager.count_by_tone(), as used by plot_mood_trends
+  mood_counts_year     DiaryManager.count_by_tone() over the last 365 days
+  mood_aggregates      MoodAggregates.from_tones, the cold-start rebuild
+
+Peak traced memory is measured in a separate run of each step under
+tracemalloc, so it does not distort the timings. Results are written as
+JSON; with --baseline, each result is compared against an earlier results
+file and the exit status is 1 if any step got slower than --tolerance.
+
+Run from the project root:
+    python benchmarks/bench_suite.py --sizes 1000,10000,100000 --output results.json
+    python benchmarks/bench_suite.py --sizes 1000,10000 --baseline results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai_analyzer import AIAnalyzer  # noqa: E402
+from corpus import write_corpus  # noqa: E402
+from diary_manager import DiaryManager  # noqa: E402
+from mood_aggregates import MoodAggregates  # noqa: E402
+
+SAMPLE_SIZE = 2000  # Entries timed for the per-entry analysis steps
+
+
+def measure(func, repeat, memory):
+    """(best seconds, peak MB or None) for func()"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return best, peak_mb
+
+
+def remove_sidecars(filepath):
+    for suffix in ('.aggregates', '.search'):
+        base = os.path.splitext(filepath)[0]
+        # JSON and journal, sqlite, and partitioned sidecars
+        for path in (filepath + suffix, base + '.db' + suffix, base + suffix):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def run_size(size, storage, repeat, memory, workdir, progress=print):
+    filepath = os.path.join(workdir, f'diary_{size}.json')
+    progress(f"Generating {size} entries...")
+    entries = write_corpus(filepath, size)
+    sample = list(entries.values())[:SAMPLE_SIZE]
+    del entries
+
+    analyzer = AIAnalyzer('benchmark', cache_path=None)
+    # One untimed open, which for sqlite and partitioned also migrates the
+    # JSON file, and leaves the sidecars open_diary_warm starts from
+    manager = DiaryManager(filepath, storage)
+    manager.close()
+
+    def open_diary():
+        remove_sidecars(filepath)
+        DiaryManager(filepath, storage)
+
+    def open_diary_warm():
+        DiaryManager(filepath, storage)
+
+    manager = DiaryManager(filepath, storage)
+    all_entries = manager.entries
+    tones = manager.get_tones()
+    last_year = date.fromisoformat(max(tones)) - timedelta(days=364)
+
+    steps = [
+        ('open_diary_warm', open_diary_warm, 1),
+        ('open_diary', open_diary, 1),
+        ('load_entries', manager.load_entries, 1),
+        ('save_entries', manager.save_entries, 1),
+        ('mock_analyze_entry', lambda: [analyzer.mock_analyze_entry(e['content']) for e in sample],
+         len(sample)),
+        ('preprocess_entry', lambda: [analyzer.preprocess_entry(e['content']) for e in sample],
+         len(sample)),
+        ('analyze_all_entries', lambda: analyzer.analyze_all_entries(all_entries), size),
+        ('mood_counts', manager.count_by_tone, 1),
+        ('mood_counts_year', lambda: manager.count_by_tone(last_year, None), 1),
+        ('mood_aggregates', lambda: MoodAggregates.from_tones(tones), size),
+    ]
+    results = []
+    for name, func, items in steps:
+        seconds, peak_mb = measure(func, repeat, memory)
+        results.append({'name': name, 'size': size, 'storage': storage, 'seconds': seconds,
+                        'per_item_us': seconds / items * 1e6, 'peak_mb': peak_mb})
+        peak = f"{peak_mb:9.1f} MB" if peak_mb is not None else ""
+        progress(f"  {name:<20} {seconds * 1000:10.2f} ms  {seconds / items * 1e6:10.2f} us/item{peak}")
+    manager.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against baseline; return the number of regressions"""
+    previous = {(r['name'], r['size'], r['storage']): r for r in baseline['results']}
+    regressions = 0
+    print(f"\nCompared with baseline ({baseline['meta'].get('timestamp', 'unknown date')}):")
+    for result in results:
+        old = previous.get((result['name'], result['size'], result['storage']))
+        if old is None or not old['seconds']:
+            continue
+        ratio = result['seconds'] / old['seconds']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"  {result['name']:<20} {result['size']:>8}  {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark storage, analysis and aggregation")
+    parser.add_argument('--sizes', default='1000,10000',
+                        help="comma-separated corpus sizes (default: 1000,10000)")
+    parser.add_argument('--storage', default='json', choices=['json', 'journal', 'sqlite', 'partitioned'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc runs")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed slowdown against the baseline (default: 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(s) for s in args.sizes.split(',')):
+            results.extend(run_size(size, args.storage, args.repeat, not args.no_memory, workdir))
+
+    report = {
+        'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'python': platform.python_version(), 'platform': platform.platform()},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Synthetic diary generator for benchmarks.
+
+Writes a diary_entries.json with one entry per consecutive day. Entry
+lengths follow a log-normal distribution (median about 120 words, with a
+long tail of multi-page entries). The text is assembled from diary-like
+sentences that include the mood and time words the offline analysis looks
+for, and most entries already carry an analysis.
+
+Run from the project root:
+    python benchmarks/corpus.py 100000 --out /tmp/diary_entries.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+from datetime import date, timedelta
+
+SUBJECTS = ["I", "We", "My sister", "The team", "Everyone at work", "My best friend", "Mum"]
+VERBS = ["went to", "talked about", "finally finished", "could not stop thinking about",
+         "spent hours on", "laughed about", "worried about", "looked forward to"]
+OBJECTS = ["the park", "the new project", "dinner plans", "an old photo album", "the exam",
+           "a long walk by the river", "the weekend trip", "a difficult conversation",
+           "our relationship", "the garden", "a movie night", "the morning run"]
+MOODS = ["It was a happy and wonderful day.", "Honestly it felt difficult and hard.",
+         "I feel a bit down and disappointed.", "Just a normal, regular day.",
+         "I am thrilled and eager about what is next.", "We felt close and together.",
+         "Everything was challenging but I kept going.", "So much joy and laughter.",
+         "I love how the evening turned out.", "A gloomy afternoon, nothing special."]
+TIMES = ["This morning", "In the afternoon", "Late in the evening", "At night", "Today"]
+
+TONES = ['fun', 'neutral', 'excited', 'tough', 'sad', 'romantic']
+TONE_WEIGHTS = [25, 30, 12, 15, 10, 8]
+
+
+def _sentence_pool(rng, size=4000):
+    pool = []
+    for _ in range(size):
+        if rng.random() < 0.3:
+            pool.append(rng.choice(MOODS))
+        else:
+            pool.append(f"{rng.choice(TIMES)} {rng.choice(SUBJECTS).lower() if rng.random() < 0.5 else 'I'} "
+                        f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}.")
+    return pool
+
+
+def start_date(count, end=None):
+    """First date of a run of count days ending at end (default: today)"""
+    end = end or date.today()
+    earliest = date(1000, 1, 1)  # Keeps four-digit years for very large corpora
+    return max(earliest, end - timedelta(days=count - 1))
+
+
+def iter_entries(count, seed=42, analyzed=0.9):
+    """Yield (date string, entry) for count consecutive days"""
+    rng = random.Random(seed)
+    pool = _sentence_pool(rng)
+    mu, sigma = math.log(120), 0.6
+    day = start_date(count)
+    one_day = timedelta(days=1)
+    for _ in range(count):
+        words = max(5, int(rng.lognormvariate(mu, sigma)))
+        sentences = rng.choices(pool, k=max(1, words // 8))
+        content = ' '.join(sentences)
+        if rng.random() < analyzed:
+            tone = rng.choices(TONES, TONE_WEIGHTS)[0]
+            summary = f"A day of {tone} moments, mostly around {rng.choice(OBJECTS)}."
+            comment = "Keep writing about the things that matter to you."
+        else:
+            tone = summary = comment = ''
+        yield day.isoformat(), {'content': content, 'summary': summary,
+                                'tone': tone, 'comment': comment}
+        day += one_day
+
+
+def generate_entries(count, seed=42, analyzed=0.9):
+    """{date string: entry} for count consecutive days"""
+    return dict(iter_entries(count, seed, analyzed))
+
+
+def write_corpus(path, count, seed=42):
+    entries = generate_entries(count, seed)
+    with open(path, 'w') as f:
+        json.dump(entries, f, indent=2)  # Same layout JsonStorage writes
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic diary_entries.json")
+    parser.add_argument('count', type=int, help="number of entries (days)")
+    parser.add_argument('--out', default='diary_entries.json')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        parser.error(f"{args.out} already exists; refusing to overwrite a diary")
+    write_corpus(args.out, args.count, args.seed)
+    print(f"Wrote {args.count} entries ({os.path.getsize(args.out) / 1e6:.1f} MB) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
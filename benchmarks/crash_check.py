@@ -0,0 +1,193 @@
+"""Check that a crash while saving never leaves the diary truncated or corrupt.
+
+Two kinds of crash are injected:
+
+  killed_writer       a child process saves entries in a loop and is killed
+                      at a random moment; the diary must then open cleanly
+                      and hold every save the child reported as done
+  failed_write        fsyncing a new file or renaming it over the old one
+                      fails; the files on disk must be unchanged and the
+                      buffered change must be written by the next flush
+
+Each check runs against the json, journal and partitioned backends. A
+third check, edited_file, opens a json diary saved by another editor with
+CRLF line endings and non-ASCII text, and checks that every entry reads
+back unchanged before and after a save.
+
+Run from the project root:
+    python benchmarks/crash_check.py --kills 20
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import diary_storage  # noqa: E402
+from diary_manager import DiaryManager  # noqa: E402
+
+BACKENDS = ('json', 'journal', 'partitioned')
+DATES = [date(2024, 1, 1) + timedelta(days=i) for i in range(40)]
+
+
+def writer(kind, path):
+    """Child process: save entries forever, printing each one once it is on disk"""
+    rng = random.Random()
+    diary_manager = DiaryManager(path, kind, write_delay=0)
+    generation = 0
+    while True:
+        day = DATES[generation % len(DATES)]
+        content = f"{generation} " + "x" * rng.randint(100, 20000)
+        diary_manager.add_entry(day, content, allow_any_date=True)
+        print(generation, day.isoformat(), flush=True)
+        generation += 1
+
+
+def killed_writer(kind, workdir, kills):
+    path = os.path.join(workdir, f'killed_{kind}.json')
+    total_saves = 0
+    for _ in range(kills):
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--writer', kind, path],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        time.sleep(random.uniform(0.2, 1.0))  # Past interpreter startup
+        proc.kill()
+        output, _ = proc.communicate()
+
+        saved = {}  # date -> last generation reported as written
+        # A kill can cut the last line short; only whole lines were reported
+        for line in output.split('\n')[:-1]:
+            fields = line.split()
+            if len(fields) != 2:
+                continue
+            generation, date_str = fields
+            saved[date_str] = int(generation)
+            total_saves += 1
+        try:
+            diary_manager = DiaryManager(path, kind)
+            entries = diary_manager.get_entries_in_range()
+            diary_manager.close()
+        except ValueError as e:
+            print(f"  {kind}: diary does not open after a kill: {e}")
+            return False
+        for date_str, generation in saved.items():
+            entry = entries.get(date_str)
+            if entry is None or int(entry['content'].split()[0]) < generation:
+                print(f"  {kind}: lost the save of generation {generation} for {date_str}")
+                return False
+    print(f"  {kind}: {kills} kills during {total_saves} saves")
+    return total_saves > 0
+
+
+def failed_write(kind, workdir):
+    path = os.path.join(workdir, f'failed_{kind}.json')
+    diary_manager = DiaryManager(path, kind, write_delay=60)  # Written by flush() only
+    for day in DATES[:10]:
+        diary_manager.add_entry(day, f"original {day}", allow_any_date=True)
+    diary_manager.flush()
+
+    def fail(*args, **kwargs):
+        raise OSError("injected failure")
+
+    real_fsync, real_replace = os.fsync, diary_storage.replace_file
+    # The journal only appends, so there is no rename to fail
+    for target in ('fsync',) if kind == 'journal' else ('fsync', 'replace'):
+        diary_manager.add_entry(DATES[0], f"changed before {target} failed", allow_any_date=True)
+        if target == 'fsync':
+            os.fsync = fail
+        else:
+            diary_storage.replace_file = fail
+        try:
+            diary_manager.flush()
+            print(f"  {kind}: flush did not report the failed {target}")
+            return False
+        except OSError:
+            pass
+        finally:
+            os.fsync, diary_storage.replace_file = real_fsync, real_replace
+
+        # The files on disk still hold the last good state. A journal append
+        # whose fsync failed can still be read back, which is harmless as
+        # the retry appends the same record again.
+        allowed = {f"original {DATES[0]}"}
+        if kind == 'journal':
+            allowed.add(f"changed before {target} failed")
+        reopened = DiaryManager(path, kind)
+        entries = reopened.get_entries_in_range()
+        reopened.storage.close()
+        if len(entries) != 10 or entries[DATES[0].isoformat()]['content'] not in allowed:
+            print(f"  {kind}: a failed {target} changed the diary on disk")
+            return False
+
+        # ...and the change is still buffered, so the next flush writes it
+        diary_manager.flush()
+        reopened = DiaryManager(path, kind)
+        content = reopened.get_entry(DATES[0])['content']
+        reopened.storage.close()
+        if content != f"changed before {target} failed":
+            print(f"  {kind}: the change was lost after a failed {target}")
+            return False
+        diary_manager.add_entry(DATES[0], f"original {DATES[0]}", allow_any_date=True)
+        diary_manager.flush()
+    diary_manager.close()
+    return True
+
+
+def edited_file(workdir):
+    path = os.path.join(workdir, 'edited.json')
+    entries = {
+        '2024-01-01': {'content': "Café au lait with Zoë \u2615", 'tone': 'fun', 'summary': "Größer als gedacht"},
+        '2024-01-02': {'content': "Line one\r\nLine two", 'tone': 'neutral', 'summary': "Ordinary"},
+        '2024-01-03': {'content': "日記を書いた", 'tone': 'romantic', 'summary': "Écrit à la main"},
+    }
+    text = json.dumps(entries, indent=2, ensure_ascii=False).replace('\n', '\r\n')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+
+    storage = diary_storage.JsonStorage(path)
+    read_back = {date_str: storage.get(date_str) for date_str in entries}
+    if read_back != entries:
+        print(f"  json: entries read back differently: {read_back}")
+        return False
+    entries['2024-01-02'] = {'content': "Rewritten – naïvely", 'tone': 'sad', 'summary': "Édité"}
+    storage.put('2024-01-02', entries['2024-01-02'])
+    with open(path, 'rb') as f:
+        on_disk = json.load(f)
+    reopened = diary_storage.JsonStorage(path)
+    if on_disk != entries or {date_str: reopened.get(date_str) for date_str in entries} != entries:
+        print(f"  json: a save garbled the file: {on_disk}")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inject crashes while the diary is being saved")
+    parser.add_argument('--kills', type=int, default=10, help="kills per backend (default: 10)")
+    parser.add_argument('--writer', nargs=2, metavar=('KIND', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.writer:
+        writer(*args.writer)
+        return
+
+    failed = 0
+    with tempfile.TemporaryDirectory(prefix='diary-crash-') as workdir:
+        for kind in BACKENDS:
+            for name, check in (('killed_writer', lambda: killed_writer(kind, workdir, args.kills)),
+                                ('failed_write', lambda: failed_write(kind, workdir))):
+                ok = check()
+                failed += not ok
+                print(f"{'PASS' if ok else 'FAIL'}  {name} ({kind})")
+        ok = edited_file(workdir)
+        failed += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  edited_file (json)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
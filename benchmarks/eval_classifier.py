@@ -0,0 +1,159 @@
+"""Accuracy and latency of the local tone classifier.
+
+Entries are taken in date order: the classifier learns the first
+--train-share of them one at a time, as the app does, and is tested on the
+rest. The keyword matcher behind offline analysis is scored on the same
+test entries for comparison. For each confidence threshold the report
+shows how many test entries would skip Gemini for their tone (coverage)
+and how often that local tone is right.
+
+With --diary the labels are the tones in an existing diary; only entries
+whose tone came from Gemini are used, not offline or local ones. Without
+it a synthetic diary with tone-dependent wording and --noise wrong labels
+is generated.
+
+Run from the project root:
+    python benchmarks/eval_classifier.py --entries 5000
+    python benchmarks/eval_classifier.py --diary diary_entries.json --storage json
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai_analyzer import AIAnalyzer  # noqa: E402
+from corpus import iter_entries  # noqa: E402
+from tone_classifier import TONES, ToneClassifier  # noqa: E402
+
+THRESHOLDS = (0.5, 0.7, 0.8, 0.9, 0.95, 0.99)
+
+# Sentences that lean towards one tone; the rest of an entry is everyday filler
+TONE_SENTENCES = {
+    'romantic': ["We held hands the whole way home.", "Dinner for two felt like our first date.",
+                 "I keep thinking about how close we have become.", "She smiled at me and I melted."],
+    'fun': ["We laughed until our stomachs hurt.", "The party was a blast from start to finish.",
+            "Played games all night with the gang.", "Such a silly, happy afternoon."],
+    'excited': ["I cannot wait for the trip next week!", "Got the offer and I am buzzing.",
+                "Tickets are booked, counting the days.", "Big news coming, I can hardly sleep."],
+    'neutral': ["Worked, cooked, went to bed.", "Nothing much happened today.",
+                "Did the laundry and answered emails.", "A regular Tuesday, really."],
+    'tough': ["The deadline crushed me today.", "Argued with my boss again and it was exhausting.",
+              "Everything went wrong at work.", "I barely kept it together this afternoon."],
+    'sad': ["I miss her so much it hurts.", "Cried in the car on the way home.",
+            "Feeling lonely and empty tonight.", "The news about grandpa left me heartbroken."],
+}
+
+
+def synthetic_entries(count, noise, seed=7):
+    """[(content, tone)] in date order.
+
+    Each entry gets up to three sentences of its tone, and often one of
+    another tone, so some entries are clear and some are not; a share of
+    noise labels is swapped at random.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for _, entry in iter_entries(count, seed=seed):
+        tone = rng.choice(TONES)
+        sentences = entry['content'].split('. ')
+        mixed = [rng.choice(TONE_SENTENCES[tone]) for _ in range(rng.randint(0, 3))]
+        if rng.random() < 0.4:
+            mixed.append(rng.choice(TONE_SENTENCES[rng.choice(TONES)]))
+        for sentence in mixed:
+            sentences.insert(rng.randrange(len(sentences) + 1), sentence)
+        label = rng.choice(TONES) if rng.random() < noise else tone
+        entries.append(('. '.join(sentences), label))
+    return entries
+
+
+def diary_entries(path, storage):
+    from diary_manager import DiaryManager
+    diary_manager = DiaryManager(path, storage)
+    try:
+        return [(entry['content'], entry['tone'])
+                for _, entry in diary_manager.iter_entries()
+                if entry.get('tone') in TONES and AIAnalyzer.is_gemini_tone(entry)]
+    finally:
+        diary_manager.storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local tone classifier")
+    parser.add_argument('--entries', type=int, default=5000, help="synthetic entries")
+    parser.add_argument('--noise', type=float, default=0.1, help="share of wrong synthetic labels")
+    parser.add_argument('--diary', help="evaluate on this diary's labels instead")
+    parser.add_argument('--storage', default='json', choices=['json', 'journal', 'sqlite', 'partitioned'])
+    parser.add_argument('--train-share', type=float, default=0.8)
+    args = parser.parse_args()
+
+    entries = diary_entries(args.diary, args.storage) if args.diary else \
+        synthetic_entries(args.entries, args.noise)
+    split = int(len(entries) * args.train_share)
+    train, test = entries[:split], entries[split:]
+    print(f"{len(train)} training and {len(test)} test entries")
+
+    with tempfile.TemporaryDirectory(prefix='tone-model-') as workdir:
+        path = os.path.join(workdir, 'tone_model.npz')
+        classifier = ToneClassifier(path)
+        start = time.perf_counter()
+        for content, tone in train:
+            classifier.learn(content, tone)
+        classifier.mark_bootstrapped()
+        learn_seconds = time.perf_counter() - start
+
+        timings, predictions = [], []
+        for content, tone in test:
+            start = time.perf_counter()
+            predictions.append(classifier.predict(content))
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+
+        start = time.perf_counter()
+        classifier.save()
+        save_seconds = time.perf_counter() - start
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        reloaded = ToneClassifier(path)
+        load_seconds = time.perf_counter() - start
+        same = all(reloaded.predict(content) == prediction
+                   for (content, _), prediction in zip(test[:200], predictions))
+
+    sys.stdout = open(os.devnull, 'w')
+    analyzer = AIAnalyzer('offline', cache_path=None)
+    keyword_tones = [analyzer.mock_analyze_entry(content)[1] for content, _ in test]
+    sys.stdout = sys.__stdout__
+
+    labels = [tone for _, tone in test]
+    accuracy = statistics.mean(p[0] == tone for p, tone in zip(predictions, labels))
+    keyword_accuracy = statistics.mean(k == tone for k, tone in zip(keyword_tones, labels))
+    print(f"learn: {len(train) / learn_seconds:,.0f} entries/s")
+    print(f"predict: p50 {timings[len(timings) // 2] * 1e6:.0f} us,"
+          f" p95 {timings[int(len(timings) * 0.95)] * 1e6:.0f} us")
+    print(f"model file: {size / 1024:.0f} KiB, save {save_seconds * 1000:.0f} ms,"
+          f" load {load_seconds * 1000:.0f} ms")
+    print(f"accuracy: classifier {accuracy:.1%}, keyword matcher {keyword_accuracy:.1%}")
+    print(f"{'threshold':>10}{'coverage':>10}{'accuracy':>10}")
+    for threshold in THRESHOLDS:
+        confident = [p[0] == tone for p, tone in zip(predictions, labels) if p[1] >= threshold]
+        print(f"{threshold:10.2f}{len(confident) / len(labels):10.1%}"
+              f"{statistics.mean(confident) if confident else 0:10.1%}")
+
+    checks = [
+        ("the classifier beats the keyword matcher", accuracy > keyword_accuracy),
+        ("predictions take under 5 ms (p95)", timings[int(len(timings) * 0.95)] < 0.005),
+        ("a saved model predicts the same after loading", same),
+    ]
+    for name, ok in checks:
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(ok for _, ok in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Exercise retries, timeouts and the circuit breaker against a fake model.
+
+Runs AIAnalyzer.analyze_entry against fake_model.FakeModel with injected
+latency and failures and checks that transient errors are retried, that
+repeated failures open the breaker, and that a probe after the cool-down
+closes it again. Needs no API key or network access.
+
+Run from the project root:
+    python benchmarks/resilience_check.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_analyzer import AIAnalyzer  # noqa: E402
+from fake_model import FakeModel, FakeServiceError  # noqa: E402
+from resilience import CircuitBreaker, ResilientCaller, RetryPolicy  # noqa: E402
+
+ENTRY = "Went for a walk this morning and had a regular day at work."
+
+
+def make_analyzer(model, cooldown=0.5, request_timeout=1.0):
+    resilience = ResilientCaller(RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.05),
+                                 CircuitBreaker(failure_threshold=2, cooldown=cooldown))
+    return AIAnalyzer('fake-key', cache_path=None, model=model,
+                      request_timeout=request_timeout, resilience=resilience)
+
+
+def transient_errors_are_retried():
+    model = FakeModel(failures=[FakeServiceError("503 unavailable"), TimeoutError("deadline")])
+    result = make_analyzer(model).analyze_entry(ENTRY)
+    return not AIAnalyzer.is_mock_result(result) and model.calls == 3
+
+
+def rate_limit_hint_is_honoured():
+    model = FakeModel(failures=[FakeServiceError("429 Please retry in 0.3s", code=429)])
+    start = time.perf_counter()
+    result = make_analyzer(model).analyze_entry(ENTRY)
+    return not AIAnalyzer.is_mock_result(result) and time.perf_counter() - start >= 0.3
+
+
+def slow_calls_time_out():
+    model = FakeModel(latency=0.5)
+    start = time.perf_counter()
+    result = make_analyzer(model, request_timeout=0.05).analyze_entry(ENTRY)
+    return AIAnalyzer.is_mock_result(result) and time.perf_counter() - start < 0.5
+
+
+def breaker_opens_and_recovers():
+    model = FakeModel(failure_rate=1.0)
+    analyzer = make_analyzer(model, cooldown=0.3)
+    for _ in range(2):
+        analyzer.analyze_entry(ENTRY)  # Each exhausts its retries
+    calls = model.calls
+    start = time.perf_counter()
+    offline = analyzer.analyze_entry(ENTRY)
+    refused_quickly = model.calls == calls and time.perf_counter() - start < 0.05
+    model.failure_rate = 0.0
+    time.sleep(0.3)
+    probe = analyzer.analyze_entry(ENTRY)
+    return (refused_quickly and AIAnalyzer.is_mock_result(offline)
+            and not AIAnalyzer.is_mock_result(probe)
+            and analyzer.resilience.breaker.state == CircuitBreaker.CLOSED)
+
+
+def failed_probe_reopens_breaker():
+    model = FakeModel(failure_rate=1.0)
+    analyzer = make_analyzer(model, cooldown=0.2)
+    for _ in range(2):
+        analyzer.analyze_entry(ENTRY)
+    time.sleep(0.2)
+    analyzer.analyze_entry(ENTRY)
+    return analyzer.resilience.breaker.state == CircuitBreaker.OPEN
+
+
+def streaming_survives_a_retry():
+    model = FakeModel(failures=[FakeServiceError("503 unavailable")], chunk_size=5)
+    partials = []
+    result = make_analyzer(model).analyze_entry(ENTRY, on_partial=partials.append)
+    return not AIAnalyzer.is_mock_result(result) and partials[-1]['comment'] == result[2]
+
+
+CHECKS = [transient_errors_are_retried, rate_limit_hint_is_honoured, slow_calls_time_out,
+          breaker_opens_and_recovers, failed_probe_reopens_breaker, streaming_survives_a_retry]
+
+
+def main():
+    failed = 0
+    for check in CHECKS:
+        ok = check()
+        failed += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {check.__name__}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Cold-start budget check: time from launching main.py to the login window.
+
+Runs main.py in a scratch directory with ``-X importtime`` and the
+DIARY_STARTUP_PROBE hook, which makes the app print a marker and exit as soon
+as the login window is drawn. Reports the slowest imports and exits non-zero
+if startup exceeds the budget or if a deferred module was imported early.
+
+Run from the project root (needs a display):
+    python benchmarks/startup_timing.py [--budget-ms 1500] [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must match app_ui.STARTUP_PROBE_MARKER
+MARKER = "startup-probe: login window ready"
+
+# Heavy modules that should only load on first analysis / first analytics view
+DEFERRED_MODULES = ('google.generativeai', 'matplotlib')
+
+
+def parse_importtime(stderr):
+    """Return ({module: cumulative us}, set of top-level module names)"""
+    cumulative = {}
+    top_level = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        cumulative[name.strip()] = int(cumulative_us)
+        # Nested imports are indented under the module that imported them
+        if not name[1:].startswith(' '):
+            top_level.add(name.strip())
+    return cumulative, top_level
+
+
+def run_once(python):
+    env = dict(os.environ, DIARY_STARTUP_PROBE='1',
+               GEMINI_API_KEY=os.environ.get('GEMINI_API_KEY', 'startup-probe'))
+    with tempfile.TemporaryDirectory() as workdir:
+        # importtime output can exceed a pipe buffer, so send it to a file
+        stderr_path = os.path.join(workdir, 'importtime.log')
+        with open(stderr_path, 'w') as stderr_file:
+            start = time.perf_counter()
+            proc = subprocess.Popen(
+                [python, '-X', 'importtime', os.path.join(ROOT, 'main.py')],
+                cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+            elapsed = None
+            for line in proc.stdout:
+                if line.strip() == MARKER:
+                    elapsed = time.perf_counter() - start
+                    break
+            proc.stdout.read()
+            proc.wait(timeout=60)
+        with open(stderr_path) as f:
+            stderr = f.read()
+    if elapsed is None:
+        raise RuntimeError(f"main.py exited without showing the login window:\n{stderr[-2000:]}")
+    return elapsed, parse_importtime(stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to the login window")
+    parser.add_argument('--budget-ms', type=float, default=1500,
+                        help="fail if the median startup exceeds this (default: 1500)")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help="number of slow imports to list")
+    parser.add_argument('--python', default=sys.executable)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        elapsed, (imports, top_level) = run_once(args.python)
+        timings.append(elapsed * 1000)
+
+    median_ms = statistics.median(timings)
+    print(f"Time to login window: median {median_ms:.0f} ms "
+          f"(runs: {', '.join(f'{t:.0f}' for t in timings)}; budget {args.budget_ms:.0f} ms)")
+    print("Slowest top-level imports (cumulative, last run):")
+    slowest = sorted(top_level, key=imports.get, reverse=True)[:args.top]
+    for name, us in ((name, imports[name]) for name in slowest):
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    early = [name for name in imports
+             if any(name == module or name.startswith(module + '.') for module in DEFERRED_MODULES)]
+    if early:
+        print(f"FAIL: deferred modules imported before the login window: {', '.join(sorted(early))}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: startup {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import sys
+from datetime import date
+from ai_analyzer import TONE_SOURCES, Analysis
+from batch_import import Progress, import_entries
+from diary_storage import replace_file
+
+FIELDS = ('date', 'content', 'summary', 'tone', 'comment', 'tone_source')
+EXPORT_FORMATS = ('ndjson', 'csv', 'markdown')
+_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# On storage that rewrites the whole diary with every write (json), a restore
+# batch is at least this share of the diary, so the batches copy a few times
+# the final diary in all instead of an amount growing with its square
+REWRITE_BATCH_SHARE = 0.25
+
+# Archive fields can hold whole entries, far beyond csv's default limit
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def open_archive(path, mode):
+    """Text file for reading ('r') or writing ('w'), gzip-compressed if path ends in .gz"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def archive_format(path):
+    """'ndjson' or 'csv' from a file name such as diary.ndjson.gz"""
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith('.csv'):
+        return 'csv'
+    raise ValueError(f"Cannot tell the archive format of {path}; use .ndjson, .jsonl or .csv")
+
+
+def write_ndjson(entries, f):
+    for date_str, entry in entries:
+        record = {'date': date_str, **{field: entry.get(field, '') for field in FIELDS[1:]}}
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        yield date_str
+
+
+def write_csv(entries, f):
+    writer = csv.writer(f)
+    writer.writerow(FIELDS)
+    for date_str, entry in entries:
+        writer.writerow([date_str] + [entry.get(field, '') for field in FIELDS[1:]])
+        yield date_str
+
+
+def markdown_page(date_str, entry):
+    lines = [f"# {date_str}", "", entry.get('content', '')]
+    if entry.get('tone'):
+        lines += ["", "---", "", f"**Mood:** {entry['tone']}", "",
+                  f"**Summary:** {entry.get('summary', '')}"]
+        if entry.get('comment'):
+            lines += ["", f"**Comment:** {entry['comment']}"]
+    return '\n'.join(lines) + '\n'
+
+
+def write_markdown(entries, directory, compress=False):
+    """One YYYY-MM-DD.md file per day"""
+    os.makedirs(directory, exist_ok=True)
+    suffix = '.md.gz' if compress else '.md'
+    for date_str, entry in entries:
+        with open_archive(os.path.join(directory, date_str + suffix), 'w') as f:
+            f.write(markdown_page(date_str, entry))
+        yield date_str
+
+
+def export_entries(diary_manager, path, fmt=None, start=None, end=None, compress=False):
+    """Stream entries from start to end to path; returns the number written.
+
+    NDJSON and CSV go to a single file (gzip-compressed if path ends in
+    .gz), which only appears under its name once it is complete. Markdown
+    writes one file per day into the directory path.
+    """
+    fmt = fmt or archive_format(path)
+    total = sum(diary_manager.count_by_tone(start, end).values())
+    progress = Progress(total, "Export")
+    entries = diary_manager.iter_entries(start, end)
+    written = 0
+    if fmt == 'markdown':
+        for _ in write_markdown(entries, path, compress):
+            written += 1
+            progress.advance()
+        return written
+
+    # The .part name keeps the .gz suffix that selects compression
+    tmp_path = path[:-3] + '.part.gz' if path.endswith('.gz') else path + '.part'
+    writer = write_ndjson if fmt == 'ndjson' else write_csv
+    with open(tmp_path, 'wb') as raw:
+        # Layered by hand (rather than open_archive) so the gzip trailer is
+        # in raw, and raw still open, when it is fsynced
+        stream = gzip.GzipFile(fileobj=raw, mode='wb') if tmp_path.endswith('.gz') else raw
+        f = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        for _ in writer(entries, f):
+            written += 1
+            progress.advance()
+        f.flush()
+        f.detach()
+        if stream is not raw:
+            stream.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+    replace_file(tmp_path, path)
+    return written
+
+
+def read_archive(path, skip=0):
+    """Yield (record number, dict) from an NDJSON or CSV archive.
+
+    A record that cannot be parsed is yielded as (number, None). The first
+    skip records are passed over without being yielded.
+    """
+    fmt = archive_format(path)
+    with open_archive(path, 'r') as f:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(f), start=1):
+                if number > skip:
+                    yield number, row
+            return
+        for number, line in enumerate(f, start=1):
+            if number <= skip or not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def validate_record(record):
+    """The (date, entry) in an archive record; raises ValueError if it is not usable"""
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+    date_str = record.get('date')
+    if not isinstance(date_str, str) or not _DATE.match(date_str):
+        raise ValueError(f"invalid date {date_str!r}")
+    date.fromisoformat(date_str)  # Rejects 2024-02-30
+    content = record.get('content')
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("missing content")
+    entry = {'content': content}
+    for field in FIELDS[2:]:
+        value = record.get(field) or ''
+        if not isinstance(value, str):
+            raise ValueError(f"{field} is not a string")
+        entry[field] = value
+    # Optional, as archives from before tone sources were kept lack it
+    if entry['tone_source'] and entry['tone_source'] not in TONE_SOURCES:
+        raise ValueError(f"unknown tone_source {entry['tone_source']!r}")
+    return date_str, entry
+
+
+class RestoreCheckpoint:
+    """Progress of an archive restore, kept next to the archive.
+
+    Records the last record number written to the diary, along with the
+    archive's size and modification time so a changed archive starts over.
+    """
+
+    def __init__(self, archive_path):
+        self.path = archive_path + '.restore-state'
+        stat = os.stat(archive_path)
+        self.identity = {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def load(self):
+        """(last record number, imported, rejected) to resume from"""
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            if state['archive'] == self.identity:
+                return state['record'], state['imported'], state['rejected']
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            pass
+        return 0, 0, 0
+
+    def save(self, record, imported, rejected):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'archive': self.identity, 'record': record,
+                       'imported': imported, 'rejected': rejected}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def restore_archive(diary_manager, path, batch_size=1000, resume=True):
+    """Upsert every valid record of an archive, batch_size entries per write.
+
+    Progress is checkpointed after each batch, so an interrupted restore
+    continues after the last written batch. Where every write rewrites the
+    whole diary, batches grow with it (see REWRITE_BATCH_SHARE).
+    Returns (imported, rejected).
+    """
+    checkpoint = RestoreCheckpoint(path)
+    done, imported, rejected = checkpoint.load() if resume else (0, 0, 0)
+    if done:
+        print(f"Resuming {path} after record {done}")
+    progress = Progress(None, "Restore")
+    entries, analyses = [], []
+    limit = batch_size
+
+    def commit(number):
+        nonlocal imported, limit
+        import_entries(diary_manager, entries, analyses, allow_any_date=True)
+        imported += len(entries)
+        checkpoint.save(number, imported, rejected)
+        entries.clear()
+        analyses.clear()
+        if diary_manager.storage.rewrites:
+            size = sum(diary_manager.count_by_tone().values())
+            limit = max(batch_size, int(size * REWRITE_BATCH_SHARE))
+
+    number = done
+    for number, record in read_archive(path, skip=done):
+        try:
+            date_str, entry = validate_record(record)
+        except ValueError as e:
+            print(f"{path}: record {number}: skipped ({e})")
+            rejected += 1
+            continue
+        entries.append({'date': date_str, 'content': entry['content']})
+        analyses.append(Analysis(entry['summary'], entry['tone'], entry['comment'],
+                                 entry['tone_source'] or None))
+        if len(entries) >= limit:
+            progress.advance(len(entries))
+            commit(number)
+    if entries:
+        progress.advance(len(entries))
+        commit(number)
+    checkpoint.clear()
+    return imported, rejected
+
+
+def export_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='main.py export',
+        description="Export the diary to NDJSON, CSV or one Markdown file per day, streaming")
+    parser.add_argument('output', help="file (.ndjson, .jsonl or .csv, optionally .gz) "
+                                       "or, for Markdown, a directory")
+    parser.add_argument('--format', choices=EXPORT_FORMATS,
+                        help="default: from the output file name")
+    parser.add_argument('--from', dest='start', help="first date (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', help="last date (YYYY-MM-DD)")
+    parser.add_argument('--gzip', action='store_true',
+                        help="compress Markdown files (NDJSON and CSV: name the output .gz)")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from diary_manager import DiaryManager
+    load_dotenv()
+
+    if args.format != 'markdown':
+        try:
+            args.format = args.format or archive_format(args.output)
+        except ValueError as e:
+            parser.error(str(e))
+    diary_manager = DiaryManager(storage=os.getenv('DIARY_STORAGE', 'json'), lock=True)
+    try:
+        written = export_entries(diary_manager, args.output, args.format,
+                                 args.start, args.end, args.gzip)
+        print(f"Exported {written} entries to {args.output}")
+    finally:
+        diary_manager.close()
+
+
+def restore_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='main.py restore',
+        description="Import an NDJSON or CSV archive (as written by main.py export) into the "
+                    "diary, replacing entries with the same date. Resumes if interrupted.")
+    parser.add_argument('archive', help=".ndjson, .jsonl or .csv file, optionally .gz")
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help="entries per write and checkpoint (default: 1000)")
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore a checkpoint from an interrupted run")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from diary_manager import DiaryManager
+    load_dotenv()
+
+    try:
+        archive_format(args.archive)
+    except ValueError as e:
+        parser.error(str(e))
+    diary_manager = DiaryManager(storage=os.getenv('DIARY_STORAGE', 'json'), lock=True)
+    try:
+        imported, rejected = restore_archive(diary_manager, args.archive, args.batch_size,
+                                             resume=not args.restart)
+        print(f"Restored {imported} entries from {args.archive}"
+              + (f"; skipped {rejected} invalid records" if rejected else ""))
+    finally:
+        diary_manager.close()
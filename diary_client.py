@@ -0,0 +1,157 @@
+import http.client
+import json
+import threading
+from urllib.parse import urlencode, urlsplit
+from diary_manager import DiaryManager, _date_key
+
+
+class DiaryServerError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class DiaryClient:
+    """The diary through a running diary server (main.py serve).
+
+    Offers the DiaryManager methods the app uses, so DiaryApp can run
+    against a diary shared with other clients. Writes go straight to the
+    server, which buffers and saves them, so flush() has nothing to do.
+    """
+
+    is_valid_date = DiaryManager.is_valid_date
+
+    def __init__(self, url, timeout=30.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._connection = None
+        self._lock = threading.Lock()
+        self._mood_trends = None
+
+    def request(self, method, path, body=None, query=None, allow=(200, 202)):
+        """Decoded JSON (or text) response; raises DiaryServerError for other statuses"""
+        if query:
+            path += '?' + urlencode({key: value for key, value in query.items() if value is not None})
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        with self._lock:
+            for attempt in (1, 2):
+                if self._connection is None:
+                    self._connection = http.client.HTTPConnection(self.host, self.port,
+                                                                  timeout=self.timeout)
+                try:
+                    self._connection.request(method, path, payload, headers)
+                    response = self._connection.getresponse()
+                    data = response.read()
+                    break
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    # The server closed an idle keep-alive connection; reconnect once
+                    self._connection.close()
+                    self._connection = None
+                    if attempt == 2:
+                        raise
+        if not response.getheader('Content-Type', '').startswith('application/json'):
+            return data.decode('utf-8')  # /metrics
+        result = json.loads(data) if data else None
+        if response.status not in allow:
+            message = result.get('error', '') if isinstance(result, dict) else ''
+            raise DiaryServerError(response.status, message)
+        return result
+
+    def _entry_path(self, date):
+        return f"/entries/{_date_key(date)}"
+
+    @property
+    def mood_trends(self):
+        if self._mood_trends is None:
+            from mood_timeseries import MoodTrends
+            self._mood_trends = MoodTrends(self.get_tones)
+        return self._mood_trends
+
+    def _changed(self, date):
+        if self._mood_trends is not None:
+            self._mood_trends.invalidate(_date_key(date))
+
+    def add_entry(self, date, content, allow_any_date=False):
+        try:
+            self.request('PUT', self._entry_path(date),
+                         {'content': content, 'allow_any_date': allow_any_date})
+        except DiaryServerError as e:
+            if e.status == 400:
+                raise ValueError(str(e)) from None
+            raise
+        self._changed(date)
+
+    def get_entry(self, date):
+        try:
+            return self.request('GET', self._entry_path(date))
+        except DiaryServerError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def update_entry_analysis(self, date, summary, tone, comment="", tone_source=None):
+        body = {'summary': summary, 'tone': tone, 'comment': comment}
+        if tone_source:
+            body['tone_source'] = tone_source
+        try:
+            self.request('PUT', self._entry_path(date) + '/analysis', body)
+        except DiaryServerError as e:
+            if e.status == 404:
+                raise ValueError("Entry not found for the specified date.") from None
+            raise
+        self._changed(date)
+
+    def delete_entry(self, date):
+        try:
+            self.request('DELETE', self._entry_path(date))
+        except DiaryServerError as e:
+            if e.status == 404:
+                raise ValueError("Entry not found for the specified date.") from None
+            raise
+        self._changed(date)
+
+    def get_entries_in_range(self, start=None, end=None):
+        return self.request('GET', '/entries', query={'from': _date_key(start), 'to': _date_key(end)})
+
+    def iter_entries(self, start=None, end=None):
+        return iter(self.get_entries_in_range(start, end).items())
+
+    def count_by_tone(self, start=None, end=None):
+        result = self.request('GET', '/aggregates', query={'from': _date_key(start), 'to': _date_key(end)})
+        return result['counts']
+
+    def get_significant_days(self):
+        days = self.request('GET', '/aggregates')['significant_days']
+        return days['toughest'], days['most_fun'], days['most_romantic']
+
+    def get_summaries(self, start=None, end=None):
+        return self.request('GET', '/summaries', query={'from': _date_key(start), 'to': _date_key(end)})
+
+    def get_tones(self, start=None, end=None):
+        return self.request('GET', '/tones', query={'from': _date_key(start), 'to': _date_key(end)})
+
+    def search(self, query, limit=20):
+        return [tuple(result) for result in
+                self.request('GET', '/search', query={'q': query, 'limit': limit})]
+
+    def analyze(self, content, timeout=60.0):
+        """(summary, tone, comment) from the server's analysis pool"""
+        job = self.request('POST', '/analysis', {'content': content})
+        while job['status'] == 'running':
+            job = self.request('GET', f"/analysis/{job['id']}", query={'wait': timeout})
+        if job['status'] != 'done':
+            raise DiaryServerError(500, job.get('error', 'analysis failed'))
+        result = job['result']
+        return result['summary'], result['tone'], result['comment']
+
+    def flush(self):
+        pass  # The server owns buffering and saving
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
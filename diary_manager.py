@@ -1,62 +1,246 @@
-import json
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import os
+import metrics
+from diary_storage import SidecarFile, create_storage
+from file_lock import FileLock
+from mood_aggregates import MoodAggregates
+from search_index import SearchIndex
+from write_behind import WriteBehind
 
 class DiaryManager:
-    def __init__(self, filepath='diary_entries.json'):
+    def __init__(self, filepath='diary_entries.json', storage='json', write_delay=1.0, lock=False):
+        """write_delay: seconds without changes before they are written
+        (0 writes every change immediately). lock: hold an inter-process lock
+        on the diary while it is open; raises file_lock.DiaryLockedError if
+        another process holds it."""
         self.filepath = filepath
-        self.entries = self.load_entries()
+        # One lock for every backend's files, taken before any of them is opened
+        self.lock = None
+        if lock:
+            self.lock = FileLock(os.path.splitext(filepath)[0] + '.lock')
+            self.lock.acquire()
+        self.storage = create_storage(storage, filepath)
+        self._entries = None
+        self.write_delay = write_delay
+        self._writes = WriteBehind(self._write, delay=write_delay or None)
+        if not self.storage.lazy:
+            self._entries = self.load_entries()
+        self.aggregate_store = SidecarFile(self.storage.filepath + '.aggregates')
+        self.aggregates = _from_sidecar(self.aggregate_store, MoodAggregates.from_dict)
+        if self.aggregates is None:
+            self.aggregates = MoodAggregates.from_tones(self.get_tones())
+        # The search index is loaded or built on the first search
+        self.search_store = SidecarFile(self.storage.filepath + '.search')
+        self._search_index = None
+        self._mood_trends = None
+
+    @property
+    def entries(self):
+        # Lazy backends only load the full history when something asks for it
+        if self._entries is None:
+            self._entries = self.load_entries()
+        return self._entries
 
     def load_entries(self):
-        try:
-            with open(self.filepath, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+        self.flush()
+        with metrics.timer('diary_load_seconds'):
+            return self.storage.load()
 
     def save_entries(self):
-        with open(self.filepath, 'w') as f:
-            json.dump(self.entries, f, indent=2)
+        self.flush()
+        with metrics.timer('diary_save_seconds'):
+            self.storage.save(self.entries)
+
+    def flush(self):
+        """Write buffered changes to storage now"""
+        self._writes.flush()
+
+    def _write(self, puts, deletes):
+        with metrics.timer('diary_save_seconds'):
+            self.storage.apply_batch(puts, deletes)
+
+    def close(self):
+        """Write buffered changes and finish any pending background writes"""
+        self.flush()
+        self.storage.close()
+        self.aggregate_store.save(self.aggregates.to_dict())
+        if self._search_index is not None:
+            self.search_store.save(self._search_index.to_dict())
+        if self.lock is not None:
+            self.lock.release()
+
+    @property
+    def search_index(self):
+        if self._search_index is None:
+            self._search_index = _from_sidecar(self.search_store, SearchIndex.from_dict)
+            if self._search_index is None:
+                # Built from a temporary full read, so entry text is not kept around
+                self._search_index = SearchIndex.build(self._entries or self.get_entries_in_range())
+        return self._search_index
+
+    @property
+    def mood_trends(self):
+        """Time-series mood analytics (mood_timeseries.MoodTrends), built on first use"""
+        if self._mood_trends is None:
+            from mood_timeseries import MoodTrends  # NumPy is only needed for analytics
+            self._mood_trends = MoodTrends(self.get_tones)
+        return self._mood_trends
+
+    def search(self, query, limit=20):
+        """Ranked full-text search; returns [(date string, score)].
+
+        Supports plain words, "quoted phrases", prefix* and tone:name filters.
+        """
+        return self.search_index.search(query, limit)
+
+    @contextmanager
+    def batch(self):
+        """Group mutations so they reach storage in one write when the block exits"""
+        self._writes.hold()
+        try:
+            yield self
+        finally:
+            self._writes.release()
+            if not self._writes.held:
+                self.flush()
+
+    def _track(self, date_str, old_tone, new_tone):
+        self.aggregate_store.mark_dirty()
+        self.aggregates.change(date_str, old_tone, new_tone)
+        if self._mood_trends is not None and old_tone != new_tone:
+            self._mood_trends.invalidate(date_str)
+
+    def _reindex(self, date_str, entry):
+        """Keep the search index in step with an added, updated (entry) or deleted (None) entry"""
+        self.search_store.mark_dirty()
+        if self._search_index is not None:
+            if entry is None:
+                self._search_index.remove(date_str)
+            else:
+                self._search_index.update(date_str, entry)
+
+    def _put(self, date_str, entry):
+        # A copy, so the write-behind thread never sees an entry being edited
+        self._writes.put(date_str, dict(entry))
+        if not self.write_delay and not self._writes.held:
+            self.flush()
+
+    def _delete(self, date_str):
+        self._writes.delete(date_str)
+        if not self.write_delay and not self._writes.held:
+            self.flush()
 
     def is_valid_date(self, date):
         today = datetime.now().date()
         yesterday = today - timedelta(days=1)
         return date in [today, yesterday]
 
-    def add_entry(self, date, content):
-        if self.is_valid_date(date):
+    def add_entry(self, date, content, allow_any_date=False):
+        """Add or replace the entry for date; only today or yesterday unless allow_any_date"""
+        if allow_any_date or self.is_valid_date(date):
             date_str = date.strftime('%Y-%m-%d')
-            self.entries[date_str] = {
+            previous = self.get_entry(date)
+            entry = {
                 'content': content,
                 'summary': '',
                 'tone': '',
                 'comment': ''
             }
-            self.save_entries()
+            self._track(date_str, previous.get('tone', '') if previous else None, '')
+            if self._entries is not None:
+                self._entries[date_str] = entry
+            self._put(date_str, entry)
+            self._reindex(date_str, entry)
         else:
             raise ValueError("Entries can only be added for today or yesterday.")
 
     def get_entry(self, date):
         date_str = date.strftime('%Y-%m-%d')
-        return self.entries.get(date_str)
+        if self._entries is not None:
+            return self._entries.get(date_str)
+        buffered, entry = self._writes.lookup(date_str)
+        if buffered:
+            return dict(entry) if entry is not None else None
+        return self.storage.get(date_str)
 
     def get_all_entries(self):
         return self.entries
 
-    def update_entry_analysis(self, date, summary, tone, comment=""):
+    def get_entries_in_range(self, start=None, end=None):
+        """Entries dated between start and end inclusive, ordered by date"""
+        self.flush()
+        return self.storage.query_range(_date_key(start), _date_key(end))
+
+    def iter_entries(self, start=None, end=None):
+        """Yield (date string, entry) in date order, holding only a few entries at a time"""
+        self.flush()
+        return self.storage.iter_range(_date_key(start), _date_key(end))
+
+    def count_by_tone(self, start=None, end=None):
+        """Number of entries per tone between start and end inclusive"""
+        if start is None and end is None:
+            return dict(self.aggregates.counts)
+        self.flush()
+        return self.storage.count_tones(_date_key(start), _date_key(end))
+
+    def get_significant_days(self):
+        """(toughest, most fun, most romantic) days from the running aggregates"""
+        return self.aggregates.significant_days()
+
+    def get_summaries(self, start=None, end=None):
+        """{date string: {'tone', 'summary'}} with shortened summaries, without reading entry text"""
+        self.flush()
+        return self.storage.summaries(_date_key(start), _date_key(end))
+
+    def get_tones(self, start=None, end=None):
+        """Map of date string to tone, without loading entry text"""
+        self.flush()
+        return self.storage.tones(_date_key(start), _date_key(end))
+
+    def update_entry_analysis(self, date, summary, tone, comment="", tone_source=None):
+        """Store an analysis; tone_source is Analysis.tone_source, if known"""
         date_str = date.strftime('%Y-%m-%d')
-        if date_str in self.entries:
-            self.entries[date_str]['summary'] = summary
-            self.entries[date_str]['tone'] = tone
-            self.entries[date_str]['comment'] = comment
-            self.save_entries()
+        entry = self.get_entry(date)
+        if entry is not None:
+            self._track(date_str, entry.get('tone', ''), tone)
+            entry['summary'] = summary
+            entry['tone'] = tone
+            entry['comment'] = comment
+            if tone_source:
+                entry['tone_source'] = tone_source
+            else:
+                entry.pop('tone_source', None)
+            self._put(date_str, entry)
+            self._reindex(date_str, entry)
         else:
             raise ValueError("Entry not found for the specified date.")
 
     def delete_entry(self, date):
         date_str = date.strftime('%Y-%m-%d')
-        if date_str in self.entries:
-            del self.entries[date_str]
-            self.save_entries()
+        entry = self.get_entry(date)
+        if entry is not None:
+            self._track(date_str, entry.get('tone', ''), None)
+            if self._entries is not None:
+                del self._entries[date_str]
+            self._delete(date_str)
+            self._reindex(date_str, None)
         else:
             raise ValueError("Entry not found for the specified date.")
 
+
+def _from_sidecar(sidecar, from_dict):
+    """Load derived data, or None if it is missing or in an older format"""
+    data = sidecar.load()
+    if data is None:
+        return None
+    try:
+        return from_dict(data)
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+def _date_key(date):
+    if date is None or isinstance(date, str):
+        return date
+    return date.strftime('%Y-%m-%d')
@@ -0,0 +1,475 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import signal
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from itertools import count
+from urllib.parse import parse_qs, urlsplit
+import metrics
+
+DEFAULT_PORT = 8765
+MAX_BODY = 16 * 1024 * 1024
+IDLE_TIMEOUT = 300.0  # Seconds a keep-alive connection may sit unused
+DATE = r'(\d{4}-\d{2}-\d{2})'
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method, target, headers, body):
+        self.method = method
+        url = urlsplit(target)
+        self.path = url.path
+        self.query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            data = json.loads(self.body or b'{}')
+        except ValueError:
+            raise HttpError(400, "Request body is not valid JSON") from None
+        if not isinstance(data, dict):
+            raise HttpError(400, "Request body must be a JSON object")
+        return data
+
+    def date_range(self):
+        """(start, end) from the from/to query parameters"""
+        return (_parse_date(self.query['from']) if 'from' in self.query else None,
+                _parse_date(self.query['to']) if 'to' in self.query else None)
+
+
+def _parse_date(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise HttpError(400, f"Invalid date {text!r}; use YYYY-MM-DD") from None
+
+
+def _text_field(data, name, required=False):
+    value = data.get(name, '')
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise HttpError(400, f"'{name}' must be a{' non-empty' if required else ''} string")
+    return value
+
+
+class StorageActor:
+    """Runs every DiaryManager call on one thread, in arrival order.
+
+    DiaryManager is not thread-safe, so the server only ever touches it
+    from this thread; handlers ``await call(...)``. Writes are still
+    coalesced by the manager's write-behind buffer, and the manager holds
+    the diary's inter-process lock, so this is its only writer.
+    """
+
+    def __init__(self, diary_manager):
+        self.diary_manager = diary_manager
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diary-storage")
+
+    async def call(self, func, *args):
+        """func(*args) on the storage thread, e.g. call(diary_manager.get_entry, day)"""
+        return await asyncio.get_running_loop().run_in_executor(self._thread, func, *args)
+
+    def close(self):
+        self._thread.submit(self.diary_manager.close).result()
+        self._thread.shutdown()
+
+
+class AnalysisJob:
+    def __init__(self, job_id, date_str=None):
+        self.id = job_id
+        self.date = date_str
+        self.status = 'running'
+        self.result = None
+        self.error = None
+        self.task = None
+
+    def to_dict(self):
+        job = {'id': self.id, 'status': self.status}
+        if self.date:
+            job['date'] = self.date
+        if self.result is not None:
+            summary, tone, comment = self.result
+            job['result'] = {'summary': summary, 'tone': tone, 'comment': comment}
+        if self.error:
+            job['error'] = self.error
+        return job
+
+
+class AnalysisPool:
+    """Analyses on a bounded thread pool, with identical requests coalesced.
+
+    At most ``concurrency`` calls to ``analyze`` (e.g.
+    AIAnalyzer.analyze_entry, which blocks on Gemini) run at once. Content
+    that is already being analyzed joins the running analysis instead of
+    starting another. The last ``max_jobs`` jobs are kept for polling.
+    """
+
+    def __init__(self, analyze, concurrency=4, max_jobs=1000):
+        self.analyze = analyze
+        self.max_jobs = max_jobs
+        self._threads = ThreadPoolExecutor(max_workers=concurrency,
+                                           thread_name_prefix="server-analysis")
+        self._running = {}  # content hash -> task of the analysis
+        self._jobs = OrderedDict()
+        self._ids = count(1)
+
+    def submit(self, content, then=None, date_str=None):
+        """Start a job analyzing content; then(result) is awaited before it is done"""
+        key = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        analysis = self._running.get(key)
+        if analysis is None:
+            metrics.inc('server_analysis_calls_total')
+            analysis = asyncio.ensure_future(self._analyze(key, content))
+            self._running[key] = analysis
+        else:
+            metrics.inc('server_analysis_coalesced_total')
+        job = AnalysisJob(next(self._ids), date_str)
+        job.task = asyncio.ensure_future(self._run(job, analysis, then))
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def _analyze(self, key, content):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._threads, self.analyze, content)
+        finally:
+            self._running.pop(key, None)
+
+    async def _run(self, job, analysis, then):
+        try:
+            result = await analysis
+            if then is not None:
+                await then(result)
+        except Exception as e:
+            logging.error(f"Analysis job {job.id} failed: {e}")
+            job.status, job.error = 'failed', str(e)
+        else:
+            job.status, job.result = 'done', tuple(result)
+
+    def close(self):
+        self._threads.shutdown(wait=False)
+
+
+class DiaryServer:
+    """Local HTTP/JSON API over a DiaryManager and an analyzer.
+
+    Plain asyncio streams with keep-alive; every endpoint answers JSON
+    (except /metrics). See the README's "Server mode" section for the
+    endpoints.
+    """
+
+    def __init__(self, diary_manager, analyze, host='127.0.0.1', port=DEFAULT_PORT, concurrency=4):
+        self.diary_manager = diary_manager
+        self.storage = StorageActor(diary_manager)
+        self.analysis = AnalysisPool(analyze, concurrency)
+        self.host = host
+        self.port = port
+        self.server = None
+        self._connections = set()  # Writers of open connections
+        self.routes = [
+            ('GET', r'/health', self.health),
+            ('GET', r'/entries', self.list_entries),
+            ('GET', rf'/entries/{DATE}', self.get_entry),
+            ('PUT', rf'/entries/{DATE}', self.put_entry),
+            ('DELETE', rf'/entries/{DATE}', self.delete_entry),
+            ('PUT', rf'/entries/{DATE}/analysis', self.put_analysis),
+            ('POST', rf'/entries/{DATE}/analysis', self.analyze_entry),
+            ('POST', r'/analysis', self.submit_analysis),
+            ('GET', r'/analysis/(\d+)', self.get_job),
+            ('GET', r'/aggregates', self.aggregates),
+            ('GET', r'/summaries', self.summaries),
+            ('GET', r'/tones', self.tones),
+            ('GET', r'/search', self.search),
+            ('GET', r'/metrics', self.metrics),
+        ]
+        self.routes = [(method, re.compile(pattern + '$'), handler)
+                       for method, pattern, handler in self.routes]
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # The real one if port was 0
+
+    async def serve(self, stop):
+        """Answer requests (after start()) until the asyncio.Event stop is set"""
+        try:
+            await stop.wait()
+        finally:
+            self.server.close()
+            for writer in list(self._connections):
+                writer.close()  # Idle keep-alive connections would otherwise linger
+            await asyncio.sleep(0)  # Let their handlers see the close
+
+    def close(self):
+        """Write buffered changes and close the diary (after the event loop has finished)"""
+        self.analysis.close()
+        self.storage.close()
+
+    # Connection handling
+
+    async def _serve_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), IDLE_TIMEOUT)
+                except HttpError as e:
+                    await self._respond(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                keep_alive = request.headers.get('connection', '').lower() != 'close'
+                status, body = await self._dispatch(request)
+                await self._respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader):
+        """The next Request, or None once the client has closed the connection"""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if version == 'HTTP/1.0' and headers.get('connection', '').lower() != 'keep-alive':
+            headers['connection'] = 'close'
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length") from None
+        if length > MAX_BODY:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return Request(method.upper(), target, headers, body)
+
+    async def _dispatch(self, request):
+        metrics.inc('server_requests_total')
+        with metrics.timer('server_request_seconds'):
+            allowed = False
+            for method, pattern, handler in self.routes:
+                match = pattern.match(request.path)
+                if match is None:
+                    continue
+                if method != request.method:
+                    allowed = True
+                    continue
+                try:
+                    return await handler(request, *match.groups())
+                except HttpError as e:
+                    return e.status, {'error': str(e)}
+                except Exception as e:
+                    logging.exception(f"{request.method} {request.path} failed")
+                    metrics.inc('server_errors_total')
+                    return 500, {'error': str(e)}
+            if allowed:
+                return 405, {'error': f"{request.method} is not allowed on {request.path}"}
+            return 404, {'error': f"No endpoint at {request.path}"}
+
+    async def _respond(self, writer, status, body, keep_alive):
+        if isinstance(body, str):
+            payload, content_type = body.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            payload, content_type = json.dumps(body).encode('utf-8'), 'application/json'
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+    # Endpoints
+
+    async def health(self, request):
+        return 200, {'status': 'ok'}
+
+    async def list_entries(self, request):
+        start, end = request.date_range()
+        return 200, await self.storage.call(self.diary_manager.get_entries_in_range, start, end)
+
+    async def get_entry(self, request, date_str):
+        entry = await self.storage.call(self.diary_manager.get_entry, _parse_date(date_str))
+        if entry is None:
+            raise HttpError(404, f"No entry for {date_str}")
+        return 200, entry
+
+    async def put_entry(self, request, date_str):
+        """Body: {"content", "allow_any_date": false, "analyze": false}"""
+        entry_date = _parse_date(date_str)
+        data = request.json()
+        content = _text_field(data, 'content', required=True)
+        try:
+            await self.storage.call(self.diary_manager.add_entry, entry_date, content,
+                                    bool(data.get('allow_any_date')))
+        except ValueError as e:
+            raise HttpError(400, str(e)) from None
+        body = {'date': date_str}
+        if data.get('analyze'):
+            body['job'] = self._analyze_and_store(entry_date, content).to_dict()
+        return 200, body
+
+    async def delete_entry(self, request, date_str):
+        try:
+            await self.storage.call(self.diary_manager.delete_entry, _parse_date(date_str))
+        except ValueError as e:
+            raise HttpError(404, str(e)) from None
+        return 200, {'date': date_str}
+
+    async def put_analysis(self, request, date_str):
+        """Body: {"summary", "tone", "comment"} and optionally "tone_source",
+        e.g. from an analysis the client ran"""
+        data = request.json()
+        fields = [_text_field(data, name) for name in ('summary', 'tone', 'comment', 'tone_source')]
+        try:
+            await self.storage.call(self.diary_manager.update_entry_analysis,
+                                    _parse_date(date_str), *fields)
+        except ValueError as e:
+            raise HttpError(404, str(e)) from None
+        return 200, {'date': date_str}
+
+    async def analyze_entry(self, request, date_str):
+        """Analyze the stored entry and save the result to it"""
+        entry_date = _parse_date(date_str)
+        entry = await self.storage.call(self.diary_manager.get_entry, entry_date)
+        if entry is None:
+            raise HttpError(404, f"No entry for {date_str}")
+        return 202, self._analyze_and_store(entry_date, entry['content']).to_dict()
+
+    def _analyze_and_store(self, entry_date, content):
+        async def store(result):
+            summary, tone, comment = result
+            entry = await self.storage.call(self.diary_manager.get_entry, entry_date)
+            # A newer save of the same day supersedes this analysis
+            if entry is not None and entry['content'] == content:
+                await self.storage.call(self.diary_manager.update_entry_analysis,
+                                        entry_date, summary, tone, comment,
+                                        getattr(result, 'tone_source', None))
+        return self.analysis.submit(content, then=store, date_str=entry_date.isoformat())
+
+    async def submit_analysis(self, request):
+        """Body: {"content"}; analyzes without storing anything"""
+        content = _text_field(request.json(), 'content', required=True)
+        return 202, self.analysis.submit(content).to_dict()
+
+    async def get_job(self, request, job_id):
+        """?wait=SECONDS holds the response until the job finishes (at most 60 s)"""
+        job = self.analysis.get(int(job_id))
+        if job is None:
+            raise HttpError(404, f"No analysis job {job_id}")
+        try:
+            wait = min(float(request.query.get('wait', 0)), 60.0)
+        except ValueError:
+            raise HttpError(400, "wait must be a number of seconds") from None
+        if wait > 0 and job.status == 'running':
+            await asyncio.wait({job.task}, timeout=wait)
+        return 200, job.to_dict()
+
+    async def aggregates(self, request):
+        start, end = request.date_range()
+        counts = await self.storage.call(self.diary_manager.count_by_tone, start, end)
+        toughest, most_fun, most_romantic = await self.storage.call(
+            self.diary_manager.get_significant_days)
+        return 200, {'counts': counts,
+                     'significant_days': {'toughest': toughest, 'most_fun': most_fun,
+                                          'most_romantic': most_romantic}}
+
+    async def summaries(self, request):
+        start, end = request.date_range()
+        return 200, await self.storage.call(self.diary_manager.get_summaries, start, end)
+
+    async def tones(self, request):
+        start, end = request.date_range()
+        return 200, await self.storage.call(self.diary_manager.get_tones, start, end)
+
+    async def search(self, request):
+        query = request.query.get('q', '')
+        try:
+            limit = int(request.query.get('limit', 20))
+        except ValueError:
+            raise HttpError(400, "limit must be a number") from None
+        results = await self.storage.call(self.diary_manager.search, query, limit)
+        return 200, [[date_str, score] for date_str, score in results]
+
+    async def metrics(self, request):
+        return 200, metrics.registry.to_prometheus()
+
+
+def create_analyze():
+    """The analysis function for the server, configured from the environment like main.py"""
+    from ai_analyzer import AIAnalyzer
+    api_key = os.getenv('GEMINI_API_KEY')
+    model = None
+    if os.getenv('DIARY_FAKE_MODEL'):
+        from fake_model import FakeModel
+        model = FakeModel.from_spec(os.getenv('DIARY_FAKE_MODEL'))
+    elif not api_key:
+        print("GEMINI_API_KEY is not set; the server uses offline analysis")
+        return AIAnalyzer('offline', cache_path=None).mock_analyze_entry
+    return AIAnalyzer.from_env(api_key or 'fake', model=model).analyze_entry
+
+
+def serve_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='main.py serve',
+        description="Serve the diary over a local HTTP/JSON API, so several clients can share it")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address to listen on (default: 127.0.0.1, this machine only)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Gemini requests in flight (default: 4)")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from diary_manager import DiaryManager
+    load_dotenv()
+
+    diary_manager = DiaryManager(storage=os.getenv('DIARY_STORAGE', 'json'), lock=True)
+    server = DiaryServer(diary_manager, create_analyze(), args.host, args.port, args.concurrency)
+
+    async def run():
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+            except (NotImplementedError, AttributeError):
+                pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+        await server.start()
+        print(f"Serving the diary at http://{args.host}:{server.port}/ (Ctrl+C to stop)", flush=True)
+        await server.serve(stop)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print("Diary saved and closed")
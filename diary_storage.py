@@ -0,0 +1,912 @@
+import json
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import date
+from json.decoder import scanstring
+import metrics
+from entry_record import EntryRecord, SUMMARY_PREFIX_LENGTH, date_ordinal
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def replace_file(tmp_path, path):
+    """Atomically move a written and fsynced tmp_path over path.
+
+    The directory is fsynced too where the OS allows it, so the rename
+    itself survives a power cut.
+    """
+    os.replace(tmp_path, path)
+    if os.name == 'posix':
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _encode_entry(entry):
+    """entry as json.dump(entries, indent=2) lays out a nested object, as bytes"""
+    if all(type(value) is str for value in entry.values()):
+        # json.dumps with indent runs the pure-Python encoder; entries are flat
+        # string maps, so assemble the same text from C-encoded strings
+        dumps = json.dumps
+        fields = ',\n    '.join(f'{dumps(key)}: {dumps(value)}' for key, value in entry.items())
+        text = '{\n    ' + fields + '\n  }' if entry else '{}'
+    else:
+        text = json.dumps(entry, indent=2).replace('\n', '\n  ')
+    return text.encode('utf-8')
+
+
+class JsonStorage:
+    """Stores the whole diary as a single JSON document (the original format).
+
+    Only an EntryRecord per day (date, tone, start of the summary and where
+    the entry sits in the file) is kept in memory. Entry text is read back
+    from the file when asked for. Every change rewrites the file, copying
+    unchanged entries across byte for byte instead of re-encoding them.
+    """
+
+    # Lazy backends can answer queries without loading every entry
+    lazy = True
+    # Every write copies the whole diary, however few entries changed
+    rewrites = True
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._records = {}  # date ordinal -> EntryRecord
+        self._ordinals = []  # Sorted keys of _records, for range queries
+        self._pending = {}  # date string -> entry whose latest version is not in the file
+        self._lock = threading.RLock()
+        self._scan()
+
+    def _scan(self):
+        """Index the file: one record per entry, with its byte range"""
+        try:
+            with open(self.filepath, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # Latin-1 maps every byte to one character, so positions in text are
+        # byte offsets into the file whatever its line endings or encoding.
+        # JSON syntax is all ASCII, which UTF-8 never uses inside a character.
+        text = data.decode('latin-1')
+        records = {}
+        decoder = json.JSONDecoder()
+        skip = _WHITESPACE.match
+        pos = skip(text, 0).end()
+        if pos == len(text):
+            self._records = records
+            return
+        if text[pos] != '{':
+            raise ValueError(f"{self.filepath} does not contain a JSON object")
+        pos = skip(text, pos + 1).end()
+        while text[pos] != '}':
+            key_start = pos
+            date_str, pos = scanstring(text, pos + 1)
+            pos = skip(text, pos).end()
+            if text[pos] != ':':
+                raise ValueError(f"Expected ':' at byte {pos} of {self.filepath}")
+            start = skip(text, pos + 1).end()
+            entry, end = decoder.raw_decode(text, start)
+            if not data[key_start:end].isascii():
+                # Decoded as Latin-1 above; parse the UTF-8 bytes properly
+                date_str = json.loads(data[key_start:pos])
+                entry = json.loads(data[start:end])
+            ordinal = date_ordinal(date_str)
+            records[ordinal] = EntryRecord.from_entry(ordinal, entry, start, end - start)
+            pos = skip(text, end).end()
+            if text[pos] == ',':
+                pos = skip(text, pos + 1).end()
+        self._records = records
+        self._ordinals = sorted(records)
+
+    def _read(self, f, date_str, record):
+        pending = self._pending.get(date_str)
+        if pending is not None:
+            return dict(pending)
+        f.seek(record.offset)
+        return json.loads(f.read(record.length))
+
+    def _read_records(self, records):
+        """{date string: entry} for records, opening the file only if one is on disk"""
+        if all(record.offset < 0 for record in records):
+            return {record.date_str: dict(self._pending[record.date_str]) for record in records}
+        with open(self.filepath, 'rb') as f:
+            return {record.date_str: self._read(f, record.date_str, record) for record in records}
+
+    def _range(self, start, end):
+        """Records with start <= date <= end (ISO strings, None = unbounded), by date"""
+        ordinals = self._ordinals
+        low = bisect_left(ordinals, date_ordinal(start)) if start is not None else 0
+        high = bisect_right(ordinals, date_ordinal(end)) if end is not None else len(ordinals)
+        records = self._records
+        return [records[ordinal] for ordinal in ordinals[low:high]]
+
+    def load(self):
+        """Every entry, as a dict keyed by date string"""
+        with self._lock:
+            if not self._records:
+                return {}
+            on_disk = {}
+            if any(record.offset >= 0 for record in self._records.values()):
+                with open(self.filepath, 'rb') as f:
+                    on_disk = json.load(f)
+            entries = {}
+            for record in self._range(None, None):
+                date_str = record.date_str
+                entry = self._pending.get(date_str)
+                entries[date_str] = dict(entry) if entry is not None else on_disk[date_str]
+            return entries
+
+    def get(self, date_str):
+        with self._lock:
+            record = self._records.get(date_ordinal(date_str))
+            if record is None:
+                return None
+            return self._read_records([record])[date_str]
+
+    def _set(self, date_str, entry):
+        ordinal = date_ordinal(date_str)
+        self._pending[date_str] = dict(entry)
+        if ordinal not in self._records:
+            insort(self._ordinals, ordinal)
+        self._records[ordinal] = EntryRecord.from_entry(ordinal, entry)
+
+    def _remove(self, date_str):
+        ordinal = date_ordinal(date_str)
+        self._pending.pop(date_str, None)
+        if self._records.pop(ordinal, None) is not None:
+            del self._ordinals[bisect_left(self._ordinals, ordinal)]
+
+    def put(self, date_str, entry):
+        with self._lock:
+            self._set(date_str, entry)
+            self._rewrite()
+
+    def delete(self, date_str):
+        with self._lock:
+            self._remove(date_str)
+            self._rewrite()
+
+    def apply_batch(self, puts, deletes):
+        """Apply many puts and deletes with a single write"""
+        with self._lock:
+            for date_str, entry in puts.items():
+                self._set(date_str, entry)
+            for date_str in deletes:
+                self._remove(date_str)
+            self._rewrite()
+
+    def save(self, entries):
+        """Replace the whole diary"""
+        with self._lock:
+            self._records = {}
+            self._ordinals = []
+            self._pending = {}
+            for date_str, entry in entries.items():
+                self._set(date_str, entry)
+            self._rewrite()
+
+    def _rewrite(self):
+        self._install(self._write_file(self._snapshot()))
+
+    def _snapshot(self):
+        """What the next file will contain: [(record, pending entry copy or None)].
+
+        Must be called under the lock; the result can be written without it.
+        """
+        snapshot = []
+        for record in self._range(None, None):
+            entry = self._pending.get(record.date_str)
+            snapshot.append((record, dict(entry) if entry is not None else None))
+        return snapshot
+
+    def _write_file(self, snapshot):
+        """Write snapshot to a temporary file; return (path, [(record, offset, length)])"""
+        tmp_path = self.filepath + '.tmp'
+        placed = []
+        old = None
+        try:
+            if any(entry is None for _, entry in snapshot):
+                with open(self.filepath, 'rb') as f:
+                    old = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            with open(tmp_path, 'wb') as out:
+                out.write(b'{')
+                position = 1
+                for i, (record, entry) in enumerate(snapshot):
+                    if entry is None:
+                        data = old[record.offset:record.offset + record.length]
+                    else:
+                        data = _encode_entry(entry)
+                    key = f'{"," if i else ""}\n  "{record.date_str}": '.encode('utf-8')
+                    out.write(key)
+                    out.write(data)
+                    placed.append((record, position + len(key), len(data)))
+                    position += len(key) + len(data)
+                out.write(b'\n}' if snapshot else b'}')
+                position += 2 if snapshot else 1
+                out.flush()
+                os.fsync(out.fileno())
+            metrics.inc('diary_bytes_written_total', position)
+        finally:
+            if old is not None:
+                old.close()
+        return tmp_path, placed
+
+    def _install(self, written):
+        """Swap in a file from _write_file and point records at it"""
+        tmp_path, placed = written
+        with self._lock:
+            replace_file(tmp_path, self.filepath)
+            for record, offset, length in placed:
+                # Records are replaced on every put, so a record that is still
+                # current has not changed since the snapshot was taken
+                if self._records.get(record.ordinal) is record:
+                    record.offset, record.length = offset, length
+                    self._pending.pop(record.date_str, None)
+
+    def query_range(self, start, end):
+        """Entries with start <= date <= end (ISO strings, None = unbounded), by date"""
+        if start is None and end is None:
+            return self.load()
+        with self._lock:
+            return self._read_records(self._range(start, end))
+
+    def iter_range(self, start, end, chunk_size=500):
+        """Yield (date, entry) from start to end, reading chunk_size entries at a time"""
+        cursor = date_ordinal(start) if start is not None else None
+        last = date_ordinal(end) if end is not None else None
+        while True:
+            with self._lock:
+                ordinals = self._ordinals
+                low = bisect_left(ordinals, cursor) if cursor is not None else 0
+                chunk = [ordinal for ordinal in ordinals[low:low + chunk_size]
+                         if last is None or ordinal <= last]
+                if not chunk:
+                    return
+                # Read under the lock, as a rewrite moves entries in the file
+                entries = self._read_records([self._records[ordinal] for ordinal in chunk])
+            yield from entries.items()
+            cursor = chunk[-1] + 1
+
+    def count_tones(self, start, end):
+        counts = {}
+        with self._lock:
+            for record in self._range(start, end):
+                counts[record.tone] = counts.get(record.tone, 0) + 1
+        return counts
+
+    def tones(self, start, end):
+        with self._lock:
+            return {record.date_str: record.tone for record in self._range(start, end)}
+
+    def summaries(self, start, end):
+        """{date: {'tone', 'summary'}} with summaries cut to SUMMARY_PREFIX_LENGTH"""
+        with self._lock:
+            return {record.date_str: record.summary() for record in self._range(start, end)}
+
+    def close(self):
+        pass
+
+
+class JournalStorage(JsonStorage):
+    """Append-only journal on top of a JSON snapshot.
+
+    Every mutation is appended as one NDJSON record to ``<filepath>.journal``.
+    Once the journal grows past ``compact_every`` records it is folded into the
+    snapshot by a background thread. The snapshot keeps the original
+    ``diary_entries.json`` format, so an existing diary is read as-is.
+    Entries changed since the last compaction are held in memory.
+    """
+
+    rewrites = False
+
+    def __init__(self, filepath, compact_every=500):
+        self.journal_path = filepath + '.journal'
+        self.compact_every = compact_every
+        self._journal = None
+        self._journal_records = 0
+        self._compactor = None
+        super().__init__(filepath)
+        self._journal_records = self._replay()
+
+    def _replay(self):
+        """Apply journal records to the snapshot, dropping a torn final record"""
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return 0
+
+        records = 0
+        good_end = 0
+        with f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # Partial write from a crash
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_end += len(line)
+                try:
+                    self._apply(record)
+                except (KeyError, TypeError, ValueError):
+                    # Complete but missing fields; later records are still good
+                    logging.warning(f"Skipping malformed journal record: {line[:80]!r}")
+                    continue
+                records += 1
+            size = f.seek(0, os.SEEK_END)
+
+        if good_end < size:
+            logging.warning(f"Discarding {size - good_end} bytes of incomplete journal data")
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(good_end)
+        return records
+
+    def _apply(self, record):
+        if record['op'] == 'put':
+            self._set(record['date'], record['entry'])
+        elif record['op'] == 'delete':
+            self._remove(record['date'])
+
+    def _append(self, *records):
+        data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        encoded = data.encode('utf-8')
+        metrics.inc('diary_bytes_written_total', len(encoded))
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'ab')
+            self._journal.write(encoded)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal_records += len(records)
+            needs_compaction = self._journal_records >= self.compact_every
+        if needs_compaction:
+            self.compact()
+
+    def put(self, date_str, entry):
+        with self._lock:
+            self._set(date_str, entry)
+            self._append({'op': 'put', 'date': date_str, 'entry': entry})
+
+    def delete(self, date_str):
+        with self._lock:
+            self._remove(date_str)
+            self._append({'op': 'delete', 'date': date_str})
+
+    def apply_batch(self, puts, deletes):
+        records = []
+        with self._lock:
+            for date_str, entry in puts.items():
+                self._set(date_str, entry)
+                records.append({'op': 'put', 'date': date_str, 'entry': entry})
+            for date_str in deletes:
+                self._remove(date_str)
+                records.append({'op': 'delete', 'date': date_str})
+            if records:
+                self._append(*records)
+
+    def save(self, entries):
+        """Write a full snapshot synchronously and reset the journal"""
+        self._wait_for_compactor()
+        with self._lock:
+            self._records = {}
+            self._ordinals = []
+            self._pending = {}
+            for date_str, entry in entries.items():
+                self._set(date_str, entry)
+            snapshot = self._snapshot()
+            offset = self._journal_size()
+        self._write_snapshot(snapshot, offset)
+
+    def compact(self, wait=False):
+        """Fold the journal into the snapshot on a background thread"""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            # Taken under the lock so the snapshot matches the journal offset
+            snapshot = self._snapshot()
+            offset = self._journal_size()
+            self._journal_records = 0
+            self._compactor = threading.Thread(
+                target=self._write_snapshot, args=(snapshot, offset),
+                name="diary-compactor")
+            self._compactor.start()
+        if wait:
+            self._wait_for_compactor()
+
+    def _journal_size(self):
+        if self._journal is not None:
+            return self._journal.tell()
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def _write_snapshot(self, snapshot, offset):
+        try:
+            written = self._write_file(snapshot)
+
+            # Keep only records appended after the snapshot was taken. If we
+            # crash before this point, replaying the old journal over the new
+            # snapshot still converges to the same state.
+            with self._lock:
+                self._install(written)
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                try:
+                    with open(self.journal_path, 'rb') as f:
+                        f.seek(offset)
+                        tail = f.read()
+                except FileNotFoundError:
+                    tail = b''
+                tmp_journal = self.journal_path + '.tmp'
+                with open(tmp_journal, 'wb') as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                replace_file(tmp_journal, self.journal_path)
+                self._journal_records = tail.count(b'\n')
+        except OSError as e:
+            logging.error(f"Journal compaction failed: {e}")
+
+    def _wait_for_compactor(self):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def close(self):
+        self._wait_for_compactor()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+
+class SqliteStorage:
+    """SQLite database with indexes on date and tone.
+
+    Entries are only read when asked for, so startup does not parse the whole
+    history. On first use an existing JSON diary is migrated into the database.
+    """
+
+    lazy = True
+    rewrites = False
+
+    def __init__(self, filepath):
+        self.json_path = filepath
+        self.filepath = os.path.splitext(filepath)[0] + '.db'
+        self._lock = threading.Lock()
+        is_new = not os.path.exists(self.filepath)
+        self.conn = sqlite3.connect(self.filepath, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                date TEXT PRIMARY KEY,
+                content TEXT NOT NULL DEFAULT '',
+                summary TEXT NOT NULL DEFAULT '',
+                tone TEXT NOT NULL DEFAULT '',
+                comment TEXT NOT NULL DEFAULT '',
+                tone_source TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_tone_date ON entries (tone, date);
+        """)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if 'tone_source' not in columns:  # Databases from before tone sources were kept
+            with self.conn:
+                self.conn.execute("ALTER TABLE entries ADD COLUMN tone_source TEXT NOT NULL DEFAULT ''")
+        if is_new and os.path.exists(self.json_path):
+            self.migrate_from_json(self.json_path)
+
+    def migrate_from_json(self, json_path):
+        """One-shot import of a diary_entries.json file"""
+        with open(json_path, 'r') as f:
+            entries = json.load(f)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (self._row(date, entry) for date, entry in entries.items()))
+        logging.info(f"Migrated {len(entries)} entries from {json_path} to {self.filepath}")
+
+    @staticmethod
+    def _row(date_str, entry):
+        return (date_str, entry.get('content', ''), entry.get('summary', ''),
+                entry.get('tone', ''), entry.get('comment', ''), entry.get('tone_source', ''))
+
+    @staticmethod
+    def _count_written(rows):
+        """Pass rows through, counting their text size (SQLite's page overhead is not included)"""
+        for row in rows:
+            metrics.inc('diary_bytes_written_total', sum(len(value.encode('utf-8')) for value in row))
+            yield row
+
+    @staticmethod
+    def _entry(row):
+        entry = {'content': row[1], 'summary': row[2], 'tone': row[3], 'comment': row[4]}
+        if row[5]:
+            entry['tone_source'] = row[5]
+        return entry
+
+    def _range_clause(self, start, end):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("date <= ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def load(self):
+        rows = self._query(
+            "SELECT date, content, summary, tone, comment, tone_source FROM entries ORDER BY date")
+        return {row[0]: self._entry(row) for row in rows}
+
+    def save(self, entries):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                self._count_written(self._row(date, entry) for date, entry in entries.items()))
+
+    def get(self, date_str):
+        rows = self._query(
+            "SELECT date, content, summary, tone, comment, tone_source FROM entries WHERE date = ?",
+            (date_str,))
+        return self._entry(rows[0]) if rows else None
+
+    def put(self, date_str, entry):
+        with self._lock, self.conn:
+            row, = self._count_written([self._row(date_str, entry)])
+            self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", row)
+
+    def delete(self, date_str):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM entries WHERE date = ?", (date_str,))
+
+    def apply_batch(self, puts, deletes):
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                  self._count_written(self._row(date, entry)
+                                                      for date, entry in puts.items()))
+            self.conn.executemany("DELETE FROM entries WHERE date = ?",
+                                  ((date_str,) for date_str in deletes))
+
+    def query_range(self, start, end):
+        where, params = self._range_clause(start, end)
+        rows = self._query(
+            f"SELECT date, content, summary, tone, comment, tone_source FROM entries{where} "
+            "ORDER BY date", params)
+        return {row[0]: self._entry(row) for row in rows}
+
+    def iter_range(self, start, end, chunk_size=500):
+        """Yield (date, entry) from start to end, chunk_size rows per query"""
+        after = None
+        while True:
+            clauses, params = [], []
+            for clause, value in (("date > ?", after), ("date >= ?", start), ("date <= ?", end)):
+                if value is not None:
+                    clauses.append(clause)
+                    params.append(value)
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            rows = self._query(
+                f"SELECT date, content, summary, tone, comment, tone_source FROM entries{where} "
+                f"ORDER BY date LIMIT ?", params + [chunk_size])
+            for row in rows:
+                yield row[0], self._entry(row)
+            if len(rows) < chunk_size:
+                return
+            after = rows[-1][0]
+
+    def count_tones(self, start, end):
+        where, params = self._range_clause(start, end)
+        return dict(self._query(f"SELECT tone, COUNT(*) FROM entries{where} GROUP BY tone", params))
+
+    def tones(self, start, end):
+        where, params = self._range_clause(start, end)
+        return dict(self._query(f"SELECT date, tone FROM entries{where}", params))
+
+    def summaries(self, start, end):
+        where, params = self._range_clause(start, end)
+        rows = self._query(
+            f"SELECT date, tone, substr(summary, 1, {SUMMARY_PREFIX_LENGTH}) FROM entries{where}", params)
+        return {date: {'tone': tone, 'summary': summary} for date, tone, summary in rows}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class PartitionedStorage:
+    """One JSON file per month (or per year) plus a small manifest.
+
+    Partitions live in a directory named after the diary file
+    (``diary_entries/2024-03.json``); each has the same format as
+    diary_entries.json and is handled by a JsonStorage. The manifest keeps
+    the entry and tone counts of every partition, so opening the diary reads
+    the manifest and the current partition only. Other partitions are opened
+    when a query reaches them, and at most ``max_resident`` stay open.
+    An existing diary_entries.json is split into partitions on first use.
+    """
+
+    lazy = True
+    rewrites = False  # Only the partitions a write touches are rewritten
+    KEY_LENGTHS = {'month': 7, 'year': 4}
+
+    def __init__(self, filepath, granularity='month', max_resident=12):
+        self.json_path = filepath
+        self.filepath = os.path.splitext(filepath)[0]
+        self.manifest_path = os.path.join(self.filepath, 'manifest.json')
+        self.max_resident = max_resident
+        self._partitions = OrderedDict()  # key -> JsonStorage, least recently used first
+        self._lock = threading.RLock()
+        manifest = self._read_manifest()
+        # An existing manifest decides the granularity
+        self.granularity = manifest['granularity'] if manifest else granularity
+        self._manifest = manifest['partitions'] if manifest else {}
+        self._key_length = self.KEY_LENGTHS[self.granularity]
+        self._current = self._key(date.today().isoformat())
+        if manifest is None:
+            os.makedirs(self.filepath, exist_ok=True)
+            if os.path.exists(self.json_path) and not self._partition_files():
+                self.migrate_from_json(self.json_path)
+        self._check_manifest()
+        self._partition(self._current)
+
+    def _key(self, date_str):
+        return date_str[:self._key_length]
+
+    def _bounds(self, key):
+        """First and last date string a partition can hold"""
+        if self.granularity == 'month':
+            return key + '-01', key + '-31'
+        return key + '-01-01', key + '-12-31'
+
+    def _path(self, key):
+        return os.path.join(self.filepath, key + '.json')
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if manifest['granularity'] in self.KEY_LENGTHS:
+                return manifest
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps({'granularity': self.granularity,
+                                'partitions': dict(sorted(self._manifest.items()))}))
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(tmp_path, self.manifest_path)
+
+    def _partition_files(self):
+        """{key: size in bytes} of the partition files on disk"""
+        try:
+            scan = os.scandir(self.filepath)
+        except FileNotFoundError:
+            return {}
+        with scan:
+            return {entry.name[:-5]: entry.stat().st_size for entry in scan
+                    if entry.name.endswith('.json') and entry.name != 'manifest.json'}
+
+    def _check_manifest(self):
+        """Re-count partitions whose file does not match the manifest (after a crash)"""
+        files = self._partition_files()
+        stale = {key for key, size in files.items() if self._manifest.get(key, {}).get('size') != size}
+        stale |= set(self._manifest) - set(files)
+        if not stale:
+            return
+        for key in stale:
+            self._manifest.pop(key, None)
+            if key in files:
+                self._update_manifest(key, self._partition(key))
+        logging.info(f"Rebuilt the manifest entries of {len(stale)} partitions")
+        self._write_manifest()
+
+    def migrate_from_json(self, json_path):
+        """One-shot split of a diary_entries.json file into partitions"""
+        with open(json_path, 'r') as f:
+            entries = json.load(f)
+        self._save_all(entries)
+        logging.info(f"Migrated {len(entries)} entries from {json_path} to {self.filepath}")
+
+    def _partition(self, key):
+        """The open partition for key, opening it (and closing the oldest) if needed"""
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is not None:
+                self._partitions.move_to_end(key)
+                return partition
+            partition = JsonStorage(self._path(key))
+            self._partitions[key] = partition
+            while len(self._partitions) > self.max_resident:
+                oldest = next(k for k in self._partitions if k != self._current)
+                self._partitions.pop(oldest).close()
+            return partition
+
+    def _update_manifest(self, key, partition):
+        tones = partition.count_tones(None, None)
+        if not tones:
+            self._manifest.pop(key, None)
+            self._partitions.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            return
+        self._manifest[key] = {'entries': sum(tones.values()), 'tones': tones,
+                               'size': os.path.getsize(self._path(key))}
+
+    def _keys(self, start, end):
+        """Keys of the partitions that can hold dates from start to end, in order"""
+        return [key for key in sorted(self._manifest)
+                if (start is None or self._bounds(key)[1] >= start)
+                and (end is None or self._bounds(key)[0] <= end)]
+
+    def _covers(self, key, start, end):
+        first, last = self._bounds(key)
+        return (start is None or start <= first) and (end is None or last <= end)
+
+    def _merge(self, method, start, end):
+        result = {}
+        with self._lock:
+            for key in self._keys(start, end):
+                result.update(getattr(self._partition(key), method)(start, end))
+        return result
+
+    def load(self):
+        return self._merge('query_range', None, None)
+
+    def query_range(self, start, end):
+        return self._merge('query_range', start, end)
+
+    def iter_range(self, start, end):
+        """Yield (date, entry) from start to end, reading one partition at a time"""
+        with self._lock:
+            keys = self._keys(start, end)
+        for key in keys:
+            with self._lock:
+                if key not in self._manifest:
+                    continue  # Emptied since
+                entries = self._partition(key).query_range(start, end)
+            yield from entries.items()
+
+    def tones(self, start, end):
+        return self._merge('tones', start, end)
+
+    def summaries(self, start, end):
+        return self._merge('summaries', start, end)
+
+    def count_tones(self, start, end):
+        """Whole partitions are counted from the manifest without opening them"""
+        counts = {}
+        with self._lock:
+            for key in self._keys(start, end):
+                if self._covers(key, start, end):
+                    partition_counts = self._manifest[key]['tones']
+                else:
+                    partition_counts = self._partition(key).count_tones(start, end)
+                for tone, count in partition_counts.items():
+                    counts[tone] = counts.get(tone, 0) + count
+        return counts
+
+    def get(self, date_str):
+        key = self._key(date_str)
+        with self._lock:
+            if key not in self._manifest:
+                return None
+            return self._partition(key).get(date_str)
+
+    def put(self, date_str, entry):
+        self.apply_batch({date_str: entry}, ())
+
+    def delete(self, date_str):
+        self.apply_batch({}, (date_str,))
+
+    def apply_batch(self, puts, deletes):
+        """Rewrite each touched partition once, then the manifest"""
+        grouped = {}
+        for date_str, entry in puts.items():
+            grouped.setdefault(self._key(date_str), ({}, []))[0][date_str] = entry
+        for date_str in deletes:
+            grouped.setdefault(self._key(date_str), ({}, []))[1].append(date_str)
+        with self._lock:
+            for key, (partition_puts, partition_deletes) in grouped.items():
+                if not partition_puts and key not in self._manifest:
+                    continue
+                partition = self._partition(key)
+                partition.apply_batch(partition_puts, partition_deletes)
+                self._update_manifest(key, partition)
+            if grouped:
+                self._write_manifest()
+
+    def save(self, entries):
+        """Replace the whole diary"""
+        with self._lock:
+            self._save_all(entries)
+
+    def _save_all(self, entries):
+        grouped = {}
+        for date_str, entry in entries.items():
+            grouped.setdefault(self._key(date_str), {})[date_str] = entry
+        for key in set(self._manifest) - set(grouped):
+            self._manifest[key] = {}  # Emptied below, which removes the file
+            grouped[key] = {}
+        for key, partition_entries in sorted(grouped.items()):
+            partition = self._partition(key)
+            partition.save(partition_entries)
+            self._update_manifest(key, partition)
+        self._write_manifest()
+
+    def close(self):
+        with self._lock:
+            for partition in self._partitions.values():
+                partition.close()
+
+
+class SidecarFile:
+    """JSON file of derived data (aggregates, indexes) kept next to the diary.
+
+    The file is only trusted after a clean shutdown: it is removed as soon
+    as the diary is first modified and written back on close, so a crash
+    leaves no file and the derived data is rebuilt on the next start.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._dirty = False
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def mark_dirty(self):
+        if not self._dirty:
+            self._dirty = True
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def save(self, data):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(tmp_path, self.path)
+        self._dirty = False
+
+
+STORAGE_BACKENDS = {
+    'json': JsonStorage,
+    'journal': JournalStorage,
+    'sqlite': SqliteStorage,
+    'partitioned': PartitionedStorage,
+}
+
+
+def create_storage(kind, filepath):
+    backend = STORAGE_BACKENDS.get(kind)
+    if backend is None:
+        raise ValueError(f"Unknown storage backend: {kind}")
+    return backend(filepath)
@@ -0,0 +1,45 @@
+import sys
+from datetime import date
+
+# Characters of the summary kept in memory, enough for tooltips and lists
+SUMMARY_PREFIX_LENGTH = 60
+
+
+def date_ordinal(date_str):
+    return date.fromisoformat(date_str).toordinal()
+
+
+def ordinal_date_str(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+
+class EntryRecord:
+    """What views need to know about an entry without its text.
+
+    The date is kept as an ordinal, the tone is interned (there are only a
+    handful of distinct tones) and only the start of the summary is kept.
+    ``offset`` and ``length`` locate the full entry in the storage file;
+    an offset of -1 means the entry is not in the file yet.
+    """
+
+    __slots__ = ('ordinal', 'tone', 'summary_prefix', 'offset', 'length')
+
+    def __init__(self, ordinal, tone, summary_prefix, offset=-1, length=0):
+        self.ordinal = ordinal
+        self.tone = tone
+        self.summary_prefix = summary_prefix
+        self.offset = offset
+        self.length = length
+
+    @classmethod
+    def from_entry(cls, ordinal, entry, offset=-1, length=0):
+        return cls(ordinal, sys.intern(entry.get('tone', '')),
+                   entry.get('summary', '')[:SUMMARY_PREFIX_LENGTH], offset, length)
+
+    @property
+    def date_str(self):
+        return ordinal_date_str(self.ordinal)
+
+    def summary(self):
+        """{'tone', 'summary'} view of the record, with the summary shortened"""
+        return {'tone': self.tone, 'summary': self.summary_prefix}
@@ -0,0 +1,92 @@
+import json
+import random
+import threading
+import time
+
+
+class FakeServiceError(Exception):
+    """Transient error shaped like the SDK's: an HTTP status in ``code``"""
+
+    def __init__(self, message, code=503, retry_after=None):
+        super().__init__(message)
+        self.code = code
+        self.retry_after = retry_after
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Local stand-in for a Gemini GenerativeModel.
+
+    Answers with a fixed JSON analysis after ``latency`` seconds. Failures
+    can be scripted with ``failures``, a list of exceptions raised by
+    successive calls (None for a call that succeeds), or injected at random
+    with ``failure_rate``. A call slower than the ``timeout`` in its
+    request_options raises TimeoutError, like a deadline would. Streamed
+    responses are split into ``chunk_size`` character chunks.
+
+    ``prompt_token_latency`` and ``response_token_latency`` add seconds per
+    (estimated) token of the prompt and of the response, so longer requests
+    take longer. A request whose generation_config has no JSON
+    response_mime_type gets plain text back: the end of the prompt, cut to
+    its max_output_tokens (at four characters a token).
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, failures=None, response=None,
+                 chunk_size=16, seed=None, prompt_token_latency=0.0, response_token_latency=0.0):
+        self.latency = latency
+        self.prompt_token_latency = prompt_token_latency
+        self.response_token_latency = response_token_latency
+        self.failure_rate = failure_rate
+        self.failures = list(failures or [])
+        self.response = response or json.dumps({
+            'analysis': "You spent the day on ordinary things and took time to write about them.",
+            'emotion': 'reflective',
+            'observation': "Keeping a steady routine seems to suit you.",
+        })
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build from "latency,failure_rate", e.g. "0.8,0.3" (both optional)"""
+        parts = [float(part) for part in spec.split(',') if part.strip()] if spec else []
+        return cls(*parts[:2])
+
+    def _next_failure(self):
+        with self._lock:
+            self.calls += 1
+            if self.failures:
+                return self.failures.pop(0)
+            if self._random.random() < self.failure_rate:
+                return FakeServiceError("503 The service is currently unavailable")
+            return None
+
+    def _respond(self, prompt, generation_config):
+        if generation_config is None or generation_config.get('response_mime_type') == 'application/json':
+            return self.response
+        size = (generation_config.get('max_output_tokens', 400) - 1) * 4
+        return prompt[-size:].strip()
+
+    def generate_content(self, prompt, generation_config=None, safety_settings=None, stream=False,
+                         request_options=None):
+        failure = self._next_failure()
+        text = self._respond(prompt, generation_config)
+        latency = (self.latency + self.prompt_token_latency * len(prompt) / 4
+                   + self.response_token_latency * len(text) / 4)
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Deadline of {timeout}s exceeded")
+        time.sleep(latency)
+        if failure is not None:
+            raise failure
+        if not stream:
+            return FakeResponse(text)
+        return (FakeResponse(text[i:i + self.chunk_size])
+                for i in range(0, len(text), self.chunk_size))
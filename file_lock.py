@@ -0,0 +1,68 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class DiaryLockedError(RuntimeError):
+    """The diary is already open in another process"""
+
+
+class FileLock:
+    """Exclusive lock on a file, shared with other processes.
+
+    The holder's pid is written into the file for error messages. The
+    operating system drops the lock when the holding process exits, so a
+    crash never leaves it behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        """Take the lock, or raise DiaryLockedError if another process holds it"""
+        f = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            holder = _read_pid(f)
+            f.close()
+            raise DiaryLockedError(
+                f"The diary is open in another process{f' (pid {holder})' if holder else ''}; "
+                f"close it or use it through the diary server") from None
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+def _read_pid(f):
+    try:
+        f.seek(0)
+        return f.read().strip()
+    except OSError:  # Locked region on Windows
+        return ''
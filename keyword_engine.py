@@ -0,0 +1,50 @@
+import re
+
+
+class KeywordMatcher:
+    """Scores text against groups of keywords in one regex pass.
+
+    All keywords are compiled into a single alternation anchored on word
+    boundaries, so "down" matches "feeling down" but not "download".
+    Multi-word keywords match across any run of whitespace. A group's score
+    is the number of its distinct keywords found in the text.
+    """
+
+    def __init__(self, groups):
+        self.labels = list(groups)
+        self._labels_for = {}
+        for label, keywords in groups.items():
+            for keyword in keywords:
+                self._labels_for.setdefault(self._normalize(keyword), []).append(label)
+
+        # Longest first, so a phrase wins over a keyword it starts with
+        alternatives = sorted(self._labels_for, key=len, reverse=True)
+        pattern = '|'.join(r'\s+'.join(map(re.escape, keyword.split())) for keyword in alternatives)
+        self._regex = re.compile(rf'\b(?:{pattern})\b')
+
+    @staticmethod
+    def _normalize(keyword):
+        return ' '.join(keyword.lower().split())
+
+    def found(self, text):
+        """Set of distinct keywords present in text"""
+        return {self._normalize(match) for match in self._regex.findall(text.lower())}
+
+    def scores(self, text):
+        """{label: number of distinct keywords found}, in group order"""
+        scores = dict.fromkeys(self.labels, 0)
+        for keyword in self.found(text):
+            for label in self._labels_for[keyword]:
+                scores[label] += 1
+        return scores
+
+    def best(self, text, default=None):
+        """Label with the highest score (earliest group wins ties), or default if none match"""
+        scores = self.scores(text)
+        label, score = max(scores.items(), key=lambda x: x[1])
+        return label if score else default
+
+    def first(self, text, default=None):
+        """First label, in group order, with any keyword present"""
+        scores = self.scores(text)
+        return next((label for label in self.labels if scores[label]), default)
@@ -1,13 +1,35 @@
 import os
-import tkinter as tk
+import sys
 from dotenv import load_dotenv
 from diary_manager import DiaryManager
 from ai_analyzer import AIAnalyzer
-from app_ui import DiaryApp
-from ttkbootstrap.dialogs import Messagebox  # Changed from tktooltip
+from metrics import MetricsLog, MetricsServer
 import logging
 
 def main():
+    # "python main.py import FILES...", "export OUTPUT", "restore ARCHIVE"
+    # and "serve" run headless, without Tk
+    if sys.argv[1:2] == ['import']:
+        from batch_import import main as import_main
+        import_main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['export']:
+        from diary_archive import export_main
+        export_main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['restore']:
+        from diary_archive import restore_main
+        restore_main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['serve']:
+        from diary_server import serve_main
+        serve_main(sys.argv[2:])
+        return
+
+    import tkinter as tk
+    from app_ui import DiaryApp
+    from ttkbootstrap.dialogs import Messagebox  # Changed from tktooltip
+
     # Load environment variables from .env file
     load_dotenv()
 
@@ -25,10 +47,33 @@ def main():
         )
         return
 
+    # Metrics are snapshotted to a rotating metrics.log; DIARY_METRICS_PORT
+    # also serves them for Prometheus at http://127.0.0.1:<port>/metrics
+    metrics_log = MetricsLog()
+    metrics_log.start()
+    metrics_server = None
+    if os.getenv('DIARY_METRICS_PORT'):
+        metrics_server = MetricsServer(port=int(os.getenv('DIARY_METRICS_PORT')))
+        metrics_server.start()
+
+    diary_manager = None
     try:
         # Initialize components
-        diary_manager = DiaryManager()
-        ai_analyzer = AIAnalyzer(api_key)
+        if os.getenv('DIARY_SERVER_URL'):
+            # Use a diary shared through "python main.py serve" instead of opening it here
+            from diary_client import DiaryClient
+            diary_manager = DiaryClient(os.getenv('DIARY_SERVER_URL'))
+        else:
+            # DIARY_STORAGE selects the storage backend ("json", "journal", "sqlite" or "partitioned")
+            diary_manager = DiaryManager(storage=os.getenv('DIARY_STORAGE', 'json'), lock=True)
+        model = None
+        if os.getenv('DIARY_FAKE_MODEL'):
+            # Local fake instead of Gemini, e.g. DIARY_FAKE_MODEL=0.5,0.3 for
+            # 0.5s latency and 30% failures
+            from fake_model import FakeModel
+            model = FakeModel.from_spec(os.getenv('DIARY_FAKE_MODEL'))
+        # Tones Gemini gives are learned by a local classifier kept in tone_model.npz
+        ai_analyzer = AIAnalyzer.from_env(api_key, model=model, classifier_path='tone_model.npz')
 
         # Create application
         app = DiaryApp(diary_manager, ai_analyzer)
@@ -47,6 +92,12 @@ def main():
             root.destroy()
         except:
             pass  # If even showing error fails, just exit
+    finally:
+        if diary_manager is not None:
+            diary_manager.flush()  # A no-op after a normal close
+        metrics_log.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
 
 if __name__ == "__main__":
     main()
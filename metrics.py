@@ -0,0 +1,221 @@
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds, from sub-millisecond parsing to slow model calls
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Every metric the app records, so all of them show up (at zero) from the start
+COUNTERS = {
+    'analysis_success_total': "Analyses parsed from a JSON model response",
+    'analysis_mock_fallback_total': "Entries given offline analysis because the model failed",
+    'analysis_cache_hits_total': "Analyses served from the analysis cache",
+    'analysis_local_tone_total': "Analyses whose tone came from the local classifier",
+    'gemini_prompt_tokens_total': "Prompt tokens sent to the model",
+    'gemini_response_tokens_total': "Response tokens received from the model",
+    'analysis_condensed_total': "Entries over the token budget, condensed before analysis",
+    'gemini_condense_calls_total': "Requests that condensed one chunk of a long entry",
+    'diary_bytes_written_total': "Bytes written to diary storage",
+}
+HISTOGRAMS = {
+    'gemini_request_seconds': "Model round trip time",
+    'gemini_first_chunk_seconds': "Time to the first chunk of a streamed response",
+    'analysis_parse_seconds': "Time to parse and validate a model response",
+    'diary_load_seconds': "Time to load every diary entry",
+    'diary_save_seconds': "Time to write diary changes to storage",
+}
+
+
+class Counter:
+    def __init__(self, name, help_text=''):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as exposed by Prometheus"""
+
+    def __init__(self, name, help_text='', buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating within its bucket"""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for i, bucket_count in enumerate(self.counts):
+                if seen + bucket_count >= rank and bucket_count:
+                    lower = self.buckets[i - 1] if i else 0.0
+                    upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                    return lower + (upper - lower) * (rank - seen) / bucket_count
+                seen += bucket_count
+            return self.buckets[-1]
+
+    def summary(self):
+        return {'count': self.count, 'sum': self.sum,
+                'mean': self.sum / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95)}
+
+
+class MetricsRegistry:
+    """Named counters and histograms shared by the whole app"""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        for name, help_text in COUNTERS.items():
+            self.counter(name, help_text)
+        for name, help_text in HISTOGRAMS.items():
+            self.histogram(name, help_text)
+
+    def counter(self, name, help_text=''):
+        with self._lock:
+            if name not in self.counters:
+                self.counters[name] = Counter(name, help_text)
+            return self.counters[name]
+
+    def histogram(self, name, help_text=''):
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(name, help_text)
+            return self.histograms[name]
+
+    def snapshot(self):
+        """Plain-dict view of every metric, for logs and the Diagnostics window"""
+        return {
+            'counters': {name: c.value for name, c in self.counters.items()},
+            'histograms': {name: h.summary() for name, h in self.histograms.items()},
+        }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for name, c in self.counters.items():
+            lines += [f"# HELP {name} {c.help}", f"# TYPE {name} counter", f"{name} {c.value}"]
+        for name, h in self.histograms.items():
+            lines += [f"# HELP {name} {h.help}", f"# TYPE {name} histogram"]
+            with h._lock:
+                cumulative = 0
+                for bound, bucket_count in zip(h.buckets + (float('inf'),), h.counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+                lines += [f"{name}_sum {h.sum}", f"{name}_count {h.count}"]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def inc(name, amount=1):
+    registry.counter(name).inc(amount)
+
+
+def observe(name, value):
+    registry.histogram(name).observe(value)
+
+
+@contextmanager
+def timer(name):
+    """Observe the duration of a with-block in seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+class MetricsLog:
+    """Appends a JSON snapshot of the registry to a rotating file every interval"""
+
+    def __init__(self, registry=registry, path='metrics.log', interval=60.0,
+                 max_bytes=1_000_000, backup_count=3):
+        self.registry = registry
+        self.interval = interval
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write(self):
+        record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), **self.registry.snapshot()}
+        self._handler.emit(logging.makeLogRecord({'msg': json.dumps(record)}))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-log", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        """Write a final snapshot and close the file"""
+        self._stop.set()
+        self.write()
+        self._handler.close()
+
+
+class MetricsServer:
+    """Serves /metrics in Prometheus text format on localhost only"""
+
+    def __init__(self, registry=registry, port=9464, host='127.0.0.1'):
+        metrics_registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics_registry.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        name="metrics-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,72 @@
+from bisect import bisect_left, insort
+
+
+class MoodAggregates:
+    """Running per-tone counts and dates, updated as entries change.
+
+    Dates are kept in a sorted list per tone, so the latest day for a tone is
+    the last element and inserting or removing a day is a binary search.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.dates = {}
+
+    @classmethod
+    def from_tones(cls, tones):
+        """Build from a {date: tone} mapping"""
+        aggregates = cls()
+        for tone in set(tones.values()):
+            aggregates.dates[tone] = []
+        for date_str, tone in tones.items():
+            aggregates.dates[tone].append(date_str)
+        for tone, dates in aggregates.dates.items():
+            dates.sort()
+            aggregates.counts[tone] = len(dates)
+        return aggregates
+
+    def add(self, date_str, tone):
+        insort(self.dates.setdefault(tone, []), date_str)
+        self.counts[tone] = self.counts.get(tone, 0) + 1
+
+    def remove(self, date_str, tone):
+        dates = self.dates.get(tone, [])
+        i = bisect_left(dates, date_str)
+        if i < len(dates) and dates[i] == date_str:
+            del dates[i]
+            self.counts[tone] -= 1
+            if not dates:
+                del self.dates[tone]
+                del self.counts[tone]
+
+    def change(self, date_str, old_tone, new_tone):
+        """Record an add (old_tone None), delete (new_tone None) or tone change"""
+        if old_tone == new_tone:
+            return
+        if old_tone is not None:
+            self.remove(date_str, old_tone)
+        if new_tone is not None:
+            self.add(date_str, new_tone)
+
+    def latest(self, *tones):
+        """Most recent date with any of the given tones, or None"""
+        latest = [self.dates[tone][-1] for tone in tones if self.dates.get(tone)]
+        return max(latest) if latest else None
+
+    def significant_days(self):
+        """(toughest, most fun, most romantic) days, as in AIAnalyzer.analyze_all_entries"""
+        return (self.latest('tough', 'sad'),
+                self.latest('fun', 'excited'),
+                self.latest('romantic'))
+
+    def to_dict(self):
+        return {'dates': self.dates}
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        for tone, dates in data['dates'].items():
+            aggregates.dates[tone] = list(dates)
+            aggregates.counts[tone] = len(dates)
+        return aggregates
+
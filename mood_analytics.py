@@ -1,23 +1,73 @@
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import base64
+import tkinter as tk
+from datetime import date, timedelta
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
+from mood_charts import chart_data, renderer
+
+# Range presets as days back from today (None = all entries)
+RANGES = {
+    "Last 3 months": 91,
+    "Last year": 365,
+    "Last 5 years": 5 * 365,
+    "All time": None,
+}
+DEFAULT_RANGE = "Last year"
+POLL_INTERVAL_MS = 30
+RESIZE_DELAY_MS = 200
+
+
+def preset_range(name, today=None):
+    """(start, end) date strings for a RANGES preset; ("", "") for all time"""
+    days = RANGES[name]
+    if not days:
+        return "", ""
+    today = today or date.today()
+    return (today - timedelta(days=days - 1)).isoformat(), today.isoformat()
+
+
+def chart_key(trends, start, end, size):
+    return (trends.version, start, end, size)
+
+
+def prerender(diary_manager):
+    """Draw the dashboard's first view in the background, so it reopens instantly.
+
+    The chart data is gathered on the calling thread; only the drawing is
+    left to the render thread.
+    """
+    trends = diary_manager.mood_trends
+    start, end = (bound or None for bound in preset_range(DEFAULT_RANGE))
+    key = chart_key(trends, start, end, renderer.size)
+    if renderer.cached(key) is None:
+        renderer.submit(key, chart_data(trends, start, end))
+
 
 class AnalyticsDashboard(ttk.Toplevel):
-    def __init__(self, parent, entries):
+    def __init__(self, parent, diary_manager):
         super().__init__(parent)
         self.title("Mood Trends")
-        self.geometry("600x400")
-        
+        self.geometry("900x650")
+
         # Set minimum size
-        self.minsize(400, 300)
-        
+        self.minsize(600, 450)
+
         # Center the window
         self.center_window()
-        
-        self.entries = entries
+
+        self.diary_manager = diary_manager
+        self.trends = diary_manager.mood_trends
+        self._key = None  # What the chart should show
+        self._shown = None  # What it shows
+        self._image = None
+        self._resize_job = None
         self.create_widgets()
 
+    def destroy(self):
+        if self._resize_job is not None:
+            self.after_cancel(self._resize_job)
+        super().destroy()
+
     def center_window(self):
         self.update_idletasks()
         width = self.winfo_width()
@@ -30,38 +80,119 @@ class AnalyticsDashboard(ttk.Toplevel):
         # Create main container with padding
         container = ttk.Frame(self, padding=10)
         container.pack(fill=BOTH, expand=YES)
-        
-        # Create and pack the figure
-        fig, ax = plt.subplots(figsize=(8, 5))
-        self.plot_mood_trends(ax)
-        
-        canvas = FigureCanvasTkAgg(fig, master=container)
-        canvas_widget = canvas.get_tk_widget()
-        canvas_widget.pack(fill=BOTH, expand=YES)
-
-    def plot_mood_trends(self, ax):
-        moods = [entry['tone'] for entry in self.entries.values()]
-        mood_counts = {mood: moods.count(mood) for mood in set(moods)}
-        
-        # Create bar chart
-        bars = ax.bar(mood_counts.keys(), mood_counts.values())
-        
-        # Customize the chart
-        ax.set_title("Mood Distribution", pad=20, fontsize=12, fontweight='bold')
-        ax.set_xlabel("Mood", labelpad=10)
-        ax.set_ylabel("Count", labelpad=10)
-        
-        # Add value labels on top of each bar
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{int(height)}',
-                   ha='center', va='bottom')
-        
-        # Adjust layout
-        plt.tight_layout()
+
+        controls = ttk.Frame(container)
+        controls.pack(fill=X, pady=(0, 5))
+        ttk.Label(controls, text="Range:").pack(side=LEFT)
+        self.range_choice = ttk.Combobox(controls, values=list(RANGES), state="readonly", width=14)
+        self.range_choice.set(DEFAULT_RANGE)
+        self.range_choice.pack(side=LEFT, padx=5)
+        self.range_choice.bind("<<ComboboxSelected>>", lambda e: self.apply_preset())
+
+        ttk.Label(controls, text="From:").pack(side=LEFT, padx=(10, 0))
+        self.start_entry = ttk.Entry(controls, width=11)
+        self.start_entry.pack(side=LEFT, padx=5)
+        ttk.Label(controls, text="To:").pack(side=LEFT)
+        self.end_entry = ttk.Entry(controls, width=11)
+        self.end_entry.pack(side=LEFT, padx=5)
+        for entry in (self.start_entry, self.end_entry):
+            entry.bind("<Return>", lambda e: self.refresh())
+        ttk.Button(controls, text="Apply", command=self.refresh,
+                   bootstyle="info-outline").pack(side=LEFT, padx=5)
+
+        self.streak_label = ttk.Label(container, text="")
+        self.streak_label.pack(fill=X, pady=(0, 5))
+
+        # The charts are drawn off-screen by mood_charts.renderer and shown as an image
+        self.chart = ttk.Label(container, anchor=CENTER)
+        self.chart.pack(fill=BOTH, expand=YES)
+        self.chart.bind("<Configure>", self.on_resize)
+
+        self.apply_preset()
+
+    def apply_preset(self):
+        start, end = preset_range(self.range_choice.get())
+        self._set_entry(self.start_entry, start)
+        self._set_entry(self.end_entry, end)
+        self.refresh()
+
+    @staticmethod
+    def _set_entry(entry, text):
+        entry.delete(0, END)
+        entry.insert(0, text)
+
+    def selected_range(self):
+        """(start, end) date strings from the From/To fields; None where empty"""
+        bounds = []
+        for entry in (self.start_entry, self.end_entry):
+            text = entry.get().strip()
+            if text:
+                date.fromisoformat(text)  # Raises ValueError for a bad date
+            bounds.append(text or None)
+        return tuple(bounds)
+
+    def refresh(self):
+        try:
+            start, end = self.selected_range()
+        except ValueError:
+            self.streak_label.config(text="Dates must be YYYY-MM-DD")
+            return
+        self.show_streaks()
+        size = self.chart_size()
+        self._key = chart_key(self.trends, start, end, size)
+        image = renderer.cached(self._key)
+        if image is not None:
+            self.show_image(self._key, image)
+            return
+        if self._image is None:
+            self.chart.config(text="Drawing charts...")
+        renderer.submit(self._key, chart_data(self.trends, start, end), size, self.show_image)
+        self.poll_renderer()
+
+    def chart_size(self):
+        """Pixel size of the chart area, or the last known one before it is shown"""
+        width, height = self.chart.winfo_width(), self.chart.winfo_height()
+        if width > 1 and height > 1:
+            renderer.size = (width, height)
+        return renderer.size
+
+    def on_resize(self, event):
+        if self._resize_job is not None:
+            self.after_cancel(self._resize_job)
+        self._resize_job = self.after(RESIZE_DELAY_MS, self.on_resized)
+
+    def on_resized(self):
+        self._resize_job = None
+        if self._key is not None and self.chart_size() != self._key[-1]:
+            self.refresh()
+
+    def poll_renderer(self):
+        if not self.winfo_exists():
+            return
+        renderer.poll()
+        if self._shown != self._key:
+            self.after(POLL_INTERVAL_MS, self.poll_renderer)
+
+    def show_image(self, key, image):
+        if key != self._key or not self.winfo_exists():
+            return  # The range changed or the window closed while it was drawn
+        self._shown = key
+        if image is None:
+            self.chart.config(text="Could not draw the charts", image='')
+            self._image = None
+            return
+        self._image = tk.PhotoImage(master=self, data=base64.b64encode(image))
+        self.chart.config(image=self._image, text='')
+
+    def show_streaks(self):
+        longest, current = self.trends.streaks()
+        if longest is None:
+            self.streak_label.config(text="No entries yet")
+            return
+        text = f"Longest writing streak: {longest[0]} days ({longest[1]} to {longest[2]})"
+        text += f"   Current streak: {current[0] if current else 0} days"
+        self.streak_label.config(text=text)
 
 # Ensure the AnalyticsDashboard class is available for import
 if __name__ == "__main__":
     print("AnalyticsDashboard class is defined and ready for use.")
-
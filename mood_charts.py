@@ -0,0 +1,254 @@
+import io
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from mood_timeseries import NEGATIVE_TONES, POSITIVE_TONES, WEEKDAYS
+
+# Grouping for the trend chart, picked from the length of the range
+GROUPING = ((120, 'week'), (5 * 365, 'month'), (None, 'year'))
+ROLLING_WINDOW = 30
+DEFAULT_SIZE = (880, 560)  # Pixels, until a dashboard reports its real size
+DPI = 100
+
+TONE_COLORS = {
+    'fun': '#f0ad4e',
+    'excited': '#e83e8c',
+    'romantic': '#d9534f',
+    'neutral': '#adb5bd',
+    'tough': '#6f42c1',
+    'sad': '#0275d8',
+}
+OTHER_TONE_COLOR = '#5bc0de'
+RATIO_LINES = ((POSITIVE_TONES, "Positive", '#5cb85c'), (NEGATIVE_TONES, "Negative", '#d9534f'))
+
+
+def tone_color(tone):
+    return TONE_COLORS.get(tone, OTHER_TONE_COLOR)
+
+
+def tone_columns(tones):
+    """(code, tone) of the analyzed tones, in a stable order for colors and legends"""
+    known = [tone for tone in TONE_COLORS if tone in tones]
+    other = sorted(tone for tone in tones if tone and tone not in TONE_COLORS)
+    return [(tones.index(tone), tone) for tone in known + other]
+
+
+def chart_data(trends, start=None, end=None):
+    """Everything the charts show for a date range, as plain values and arrays.
+
+    Runs the (cached) MoodTrends queries on the calling thread, so the
+    render thread never touches the diary.
+    """
+    starts, counts = trends.rollup('week', start, end)
+    period = 'week'
+    if len(starts):
+        span = int((starts[-1] - starts[0]).astype(int))
+        period = next(p for limit, p in GROUPING if limit is None or span <= limit)
+        if period != 'week':
+            starts, counts = trends.rollup(period, start, end)
+    return {
+        'period': period,
+        'columns': tone_columns(trends.tones),
+        'starts': starts,
+        'counts': counts,
+        'ratios': [trends.rolling_ratio(tones, ROLLING_WINDOW, start, end)
+                   for tones, _, _ in RATIO_LINES],
+        'weekdays': trends.weekday_profile(start, end),
+        'totals': {tone: n for tone, n in trends.counts(start, end).items() if tone},
+    }
+
+
+class ChartRenderer:
+    """Draws the dashboard charts off-screen on one worker thread.
+
+    One Figure and Agg canvas, created and used only by the worker, serve
+    every render; the ratio lines, bars and bar labels are updated in place
+    and only the stacked trend area is redrawn. matplotlib is imported on
+    the worker too, so the UI never waits for it. Finished PNG images are
+    cached by key (data version, range and size) and handed back to Tk
+    through ``poll``, like AnalysisExecutor.
+    """
+
+    def __init__(self, cache_size=8):
+        self.cache_size = cache_size
+        self.size = DEFAULT_SIZE
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def cached(self, key):
+        """The PNG bytes rendered for key, or None"""
+        with self._lock:
+            image = self._cache.get(key)
+            if image is not None:
+                self._cache.move_to_end(key)
+            return image
+
+    def submit(self, key, data, size=None, on_done=None):
+        """Render data (from chart_data) at size; on_done(key, png or None) runs in poll()"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name="chart-renderer", daemon=True)
+            self._thread.start()
+        self._jobs.put((key, data, size or self.size, on_done))
+
+    def poll(self):
+        """Run the callbacks of finished renders; call from the Tk thread"""
+        while True:
+            try:
+                key, on_done, image = self._results.get_nowait()
+            except queue.Empty:
+                return
+            on_done(key, image)
+
+    def _work(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        figure = Figure(dpi=DPI)
+        canvas = FigureCanvasAgg(figure)
+        charts = _Charts(figure)
+        while True:
+            key, data, size, on_done = self._jobs.get()
+            image = self.cached(key)
+            if image is None:
+                try:
+                    image = charts.draw(data, size, canvas)
+                except Exception:
+                    logging.exception("Could not draw the mood charts")
+                else:
+                    with self._lock:
+                        self._cache[key] = image
+                        while len(self._cache) > self.cache_size:
+                            self._cache.popitem(last=False)
+            if on_done is not None:
+                self._results.put((key, on_done, image))
+
+
+class _Charts:
+    """The four dashboard charts on one Figure, kept between renders"""
+
+    def __init__(self, figure):
+        self.figure = figure
+        axes = figure.subplots(2, 2)
+        (self.trend_ax, self.ratio_ax), (self.weekday_ax, self.count_ax) = axes
+        self.stack = []
+        self.ratio_lines = []
+        self.weekday_bars = []
+        self.weekday_columns = None
+        self.count_bars = None
+        self.count_labels = []
+        self.count_tones = None
+        self.size = None
+
+        self.ratio_ax.set_ylim(0, 1)
+        self.ratio_ax.set_title(f"Share of moods, rolling {ROLLING_WINDOW} days",
+                                fontsize=10, fontweight='bold')
+        self.weekday_ax.set_title("Moods by day of the week", fontsize=10, fontweight='bold')
+        self.weekday_ax.set_xticks(range(7))
+        self.weekday_ax.set_xticklabels(WEEKDAYS, fontsize=8)
+        self.count_ax.set_title("Mood Distribution", fontsize=10, fontweight='bold')
+        self.count_ax.set_ylabel("Count")
+        self.trend_ax.set_ylabel("Entries")
+        for ax in (self.trend_ax, self.ratio_ax):
+            ax.tick_params(axis='x', labelrotation=30, labelsize=7)
+
+    def draw(self, data, size, canvas):
+        """PNG bytes of the charts for data at size (width, height) in pixels"""
+        self.draw_trend(data)
+        self.draw_ratios(data)
+        self.draw_weekdays(data)
+        self.draw_counts(data)
+        if size != self.size:
+            # Laying out measures every label with an extra draw, so the
+            # margins found for a size are kept for later renders at it
+            width, height = size
+            self.figure.set_size_inches(width / DPI, height / DPI)
+            self.figure.tight_layout()
+            self.size = size
+        out = io.BytesIO()
+        canvas.print_png(out, pil_kwargs={'compress_level': 1})  # Speed over size
+        return out.getvalue()
+
+    def draw_trend(self, data):
+        ax = self.trend_ax
+        # The number of periods changes with the range, so the area is redrawn
+        for artist in self.stack:
+            artist.remove()
+        self.stack = []
+        if ax.get_legend():
+            ax.get_legend().remove()
+        # relim() skips collections; the new area alone sets the data limits
+        ax.ignore_existing_data_limits = True
+        columns, starts, counts = data['columns'], data['starts'], data['counts']
+        if len(starts) and columns:
+            self.stack = ax.stackplot(starts, [counts[:, code] for code, _ in columns],
+                                      labels=[tone for _, tone in columns],
+                                      colors=[tone_color(tone) for _, tone in columns],
+                                      step='post')
+            ax.legend(loc='upper left', fontsize=7, ncol=3)
+        ax.set_title(f"Moods per {data['period']}", fontsize=10, fontweight='bold')
+        ax.autoscale_view()
+
+    def draw_ratios(self, data):
+        ax = self.ratio_ax
+        for dates, _ in data['ratios']:
+            if len(dates):
+                ax.xaxis.update_units(dates)  # Date axis before set_data
+                break
+        if not self.ratio_lines:
+            self.ratio_lines = [ax.plot([], [], label=label, color=color, linewidth=1)[0]
+                                for _, label, color in RATIO_LINES]
+            ax.legend(loc='upper left', fontsize=7)
+        for line, (dates, ratio) in zip(self.ratio_lines, data['ratios']):
+            line.set_data(dates, ratio)
+        ax.relim()
+        ax.autoscale_view(scaley=False)
+
+    def draw_weekdays(self, data):
+        ax = self.weekday_ax
+        columns, profile = data['columns'], data['weekdays']
+        if columns != self.weekday_columns:
+            for bars in self.weekday_bars:
+                bars.remove()
+            self.weekday_bars = [ax.bar(range(7), [0] * 7, color=tone_color(tone), label=tone)
+                                 for _, tone in columns]
+            self.weekday_columns = columns
+        bottom = [0] * 7
+        for bars, (code, _) in zip(self.weekday_bars, columns):
+            for rect, base, value in zip(bars, bottom, profile[:, code]):
+                rect.set_y(base)
+                rect.set_height(value)
+            bottom = [b + v for b, v in zip(bottom, profile[:, code])]
+        ax.relim()
+        ax.autoscale_view()
+
+    def draw_counts(self, data):
+        ax = self.count_ax
+        totals = data['totals']
+        tones = list(totals)
+        if tones != self.count_tones:
+            if self.count_bars is not None:
+                self.count_bars.remove()
+            for label in self.count_labels:
+                label.remove()
+            self.count_bars = ax.bar(range(len(tones)), [0] * len(tones),
+                                     color=[tone_color(tone) for tone in tones])
+            self.count_labels = [ax.text(rect.get_x() + rect.get_width() / 2., 0, '',
+                                         ha='center', va='bottom', fontsize=7)
+                                 for rect in self.count_bars]
+            ax.set_xticks(range(len(tones)))
+            ax.set_xticklabels(tones, fontsize=8)
+            self.count_tones = tones
+        # Value labels on top of each bar
+        for rect, label, tone in zip(self.count_bars, self.count_labels, tones):
+            rect.set_height(totals[tone])
+            label.set_y(totals[tone])
+            label.set_text(str(totals[tone]))
+        ax.relim()
+        ax.autoscale_view()
+
+
+# Shared by every dashboard, so reopening the window reuses one figure and its cache
+renderer = ChartRenderer()
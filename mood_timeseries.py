@@ -0,0 +1,254 @@
+from datetime import date
+import numpy as np
+
+POSITIVE_TONES = ('fun', 'excited', 'romantic')
+NEGATIVE_TONES = ('tough', 'sad')
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+PERIODS = ('week', 'month', 'year')
+
+# Days are numbered from 1970-01-01 (NumPy's datetime64[D]); that day was a
+# Thursday, so (day + 3) % 7 is the weekday with Monday as 0
+_MONDAY_OFFSET = 3
+
+
+def to_days(date_strs):
+    """Array of day numbers for an iterable of YYYY-MM-DD strings"""
+    return np.array(list(date_strs), dtype='datetime64[D]').astype(np.int64)
+
+
+def day_to_str(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def _day(date_str, default):
+    return default if date_str is None else int(np.datetime64(date_str, 'D').astype(np.int64))
+
+
+class MoodSeries:
+    """Entry days and tones as two sorted NumPy arrays.
+
+    ``days`` holds day numbers and ``codes`` an index into ``tones`` for
+    each entry. Every query works on slices of these arrays, so its cost
+    depends on the number of days in range rather than on Python loops.
+    """
+
+    def __init__(self, days, codes, tones):
+        self.days = days
+        self.codes = codes
+        self.tones = list(tones)
+
+    @classmethod
+    def from_tones(cls, tones_by_date, tones=()):
+        """Build from a {date string: tone} mapping; tones fixes the first codes"""
+        tones = list(tones)
+        if not tones_by_date:
+            return cls(np.zeros(0, np.int64), np.zeros(0, np.int16), tones)
+        dates, names = zip(*sorted(tones_by_date.items()))
+        unique, inverse = np.unique(np.array(names), return_inverse=True)
+        for name in unique:
+            if name not in tones:
+                tones.append(str(name))
+        remap = np.array([tones.index(name) for name in unique], dtype=np.int16)
+        return cls(to_days(dates), remap[inverse], tones)
+
+    def _slice(self, start=None, end=None):
+        """(days, codes) for start <= day <= end (date strings, None = unbounded)"""
+        return self._slice_days(_day(start, None), _day(end, None))
+
+    def _slice_days(self, first, last):
+        low = 0 if first is None else np.searchsorted(self.days, first, 'left')
+        high = len(self.days) if last is None else np.searchsorted(self.days, last, 'right')
+        return self.days[low:high], self.codes[low:high]
+
+    def _codes_for(self, tones):
+        return [self.tones.index(tone) for tone in tones if tone in self.tones]
+
+    def counts(self, start=None, end=None):
+        """{tone: number of entries}"""
+        _, codes = self._slice(start, end)
+        totals = np.bincount(codes, minlength=len(self.tones))
+        return {tone: int(n) for tone, n in zip(self.tones, totals) if n}
+
+    def rollup(self, period, start=None, end=None):
+        """(period start dates, counts) with counts[i, code] per week, month or year.
+
+        Periods without entries between the first and last entry are included
+        as zero rows, so the result can be plotted as a time series.
+        """
+        days, codes = self._slice(start, end)
+        if period == 'week':
+            keys = (days + _MONDAY_OFFSET) // 7
+        elif period in ('month', 'year'):
+            unit = 'M' if period == 'month' else 'Y'
+            keys = days.astype('datetime64[D]').astype(f'datetime64[{unit}]').astype(np.int64)
+        else:
+            raise ValueError(f"Unknown period: {period}")
+        width = len(self.tones)
+        if not len(keys):
+            return np.zeros(0, 'datetime64[D]'), np.zeros((0, width), np.int64)
+        first = keys[0]
+        periods = int(keys[-1] - first + 1)
+        counts = np.bincount((keys - first) * width + codes,
+                             minlength=periods * width).reshape(periods, width)
+        index = np.arange(first, first + periods)
+        if period == 'week':
+            starts = (index * 7 - _MONDAY_OFFSET).astype('datetime64[D]')
+        else:
+            starts = index.astype(f'datetime64[{unit}]').astype('datetime64[D]')
+        return starts, counts
+
+    def rolling_ratio(self, tones, window=30, start=None, end=None, exclude=('',)):
+        """(dates, ratio) per day: the share of entries in the trailing window
+        whose tone is in tones, counting only entries whose tone is not in
+        exclude (unanalyzed entries by default). NaN where the window is empty.
+        """
+        days, _ = self._slice(start, end)
+        if not len(days):
+            return np.zeros(0, 'datetime64[D]'), np.zeros(0)
+        low = _day(start, int(days[0]))
+        high = _day(end, int(days[-1]))
+        # Entries before start still count towards the first windows
+        days, codes = self._slice_days(low - window + 1, high)
+        length = high - low + window
+        offsets = days - (low - window + 1)
+        hits = np.bincount(offsets, weights=np.isin(codes, self._codes_for(tones)), minlength=length)
+        counted = np.bincount(offsets, weights=~np.isin(codes, self._codes_for(exclude)),
+                              minlength=length)
+        # Window sums as differences of running totals
+        hit_totals = np.concatenate(([0.0], np.cumsum(hits)))
+        counted_totals = np.concatenate(([0.0], np.cumsum(counted)))
+        hit_sums = hit_totals[window:] - hit_totals[:-window]
+        counted_sums = counted_totals[window:] - counted_totals[:-window]
+        ratio = np.full(len(counted_sums), np.nan)
+        np.divide(hit_sums, counted_sums, out=ratio, where=counted_sums > 0)
+        return np.arange(low, high + 1).astype('datetime64[D]'), ratio
+
+    def streaks(self, tones=None, today=None):
+        """(longest, current) runs of consecutive days with an entry (with a
+        tone in tones, if given). Each is (length, first date, last date);
+        current is None unless its last day is today or yesterday.
+        """
+        days = self.days
+        if tones is not None:
+            days = days[np.isin(self.codes, self._codes_for(tones))]
+        if not len(days):
+            return None, None
+        breaks = np.flatnonzero(np.diff(days) != 1)
+        firsts = np.concatenate(([0], breaks + 1))
+        lasts = np.concatenate((breaks, [len(days) - 1]))
+        lengths = lasts - firsts + 1
+        best = int(np.argmax(lengths))
+        longest = (int(lengths[best]), day_to_str(days[firsts[best]]), day_to_str(days[lasts[best]]))
+        today = _day(today or date.today().isoformat(), None)
+        current = None
+        if days[-1] >= today - 1:
+            current = (int(lengths[-1]), day_to_str(days[firsts[-1]]), day_to_str(days[-1]))
+        return longest, current
+
+    def weekday_profile(self, start=None, end=None):
+        """counts[weekday, code], Monday first"""
+        days, codes = self._slice(start, end)
+        width = len(self.tones)
+        weekdays = (days + _MONDAY_OFFSET) % 7
+        return np.bincount(weekdays * width + codes, minlength=7 * width).reshape(7, width)
+
+
+class MoodTrends:
+    """MoodSeries for a diary, with results cached until their period changes.
+
+    Entries are held per month. When an entry changes only its month is
+    re-read (through ``tones_provider(start, end)``, e.g.
+    DiaryManager.get_tones) and only cached results whose date range covers
+    the changed day are dropped.
+    """
+
+    def __init__(self, tones_provider):
+        self.tones_provider = tones_provider
+        self._months = None  # month number -> (days, codes), or None before the first load
+        self._dirty = set()
+        self._tones = []
+        self._series = None
+        self._results = {}  # key -> (first day, last day, value)
+        self.version = 0  # Increases with every change, e.g. to key rendered charts
+
+    def invalidate(self, date_str):
+        """Forget what depends on the month of date_str"""
+        self.version += 1
+        if self._months is None:
+            return
+        day = _day(date_str, None)
+        month = int(np.datetime64(date_str, 'D').astype('datetime64[M]').astype(np.int64))
+        self._dirty.add(month)
+        self._series = None
+        self._results = {key: cached for key, cached in self._results.items()
+                         if not cached[0] <= day <= cached[1]}
+
+    @property
+    def series(self):
+        if self._series is not None:
+            return self._series
+        if self._months is None:
+            self._months = self._split(self.tones_provider(None, None))
+        for month in self._dirty:
+            first = np.datetime64(month, 'M')
+            last = (first + 1).astype('datetime64[D]') - 1
+            self._months.pop(month, None)
+            self._months.update(self._split(self.tones_provider(str(first.astype('datetime64[D]')),
+                                                                str(last))))
+        self._dirty.clear()
+        parts = [self._months[month] for month in sorted(self._months)]
+        if parts:
+            days = np.concatenate([p[0] for p in parts])
+            codes = np.concatenate([p[1] for p in parts])
+        else:
+            days, codes = np.zeros(0, np.int64), np.zeros(0, np.int16)
+        self._series = MoodSeries(days, codes, self._tones)
+        return self._series
+
+    def _split(self, tones_by_date):
+        """{month number: (days, codes)} for a {date: tone} mapping"""
+        series = MoodSeries.from_tones(tones_by_date, self._tones)
+        if len(series.tones) != len(self._tones):
+            self._results = {}  # Per-tone arrays of every cached result are now too narrow
+        self._tones = series.tones  # New tones get new codes; old codes never change
+        months = series.days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        if not len(months):
+            return {}
+        bounds = np.flatnonzero(np.diff(months)) + 1
+        return {int(m[0]): (d, c) for m, d, c in zip(np.split(months, bounds),
+                                                      np.split(series.days, bounds),
+                                                      np.split(series.codes, bounds))}
+
+    def _cached(self, key, start, end, compute):
+        series = self.series
+        cached = self._results.get(key)
+        if cached is None:
+            cached = (_day(start, -2**62), _day(end, 2**62), compute(series))
+            self._results[key] = cached
+        return cached[2]
+
+    @property
+    def tones(self):
+        return self.series.tones
+
+    def counts(self, start=None, end=None):
+        return self._cached(('counts', start, end), start, end,
+                            lambda s: s.counts(start, end))
+
+    def rollup(self, period, start=None, end=None):
+        return self._cached(('rollup', period, start, end), start, end,
+                            lambda s: s.rollup(period, start, end))
+
+    def rolling_ratio(self, tones, window=30, start=None, end=None):
+        # The window reaches back before start
+        reach = None if start is None else day_to_str(_day(start, None) - window + 1)
+        return self._cached(('ratio', tuple(tones), window, start, end), reach, end,
+                            lambda s: s.rolling_ratio(tones, window, start, end))
+
+    def streaks(self, tones=None, today=None):
+        return self._cached(('streaks', tones and tuple(tones), today), None, None,
+                            lambda s: s.streaks(tones, today))
+
+    def weekday_profile(self, start=None, end=None):
+        return self._cached(('weekdays', start, end), start, end,
+                            lambda s: s.weekday_profile(start, end))
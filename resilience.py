@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+# Status codes worth retrying: rate limited, server error, unavailable, deadline
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_NAMES = ('ResourceExhausted', 'ServiceUnavailable', 'DeadlineExceeded',
+                   'InternalServerError', 'TooManyRequests')
+
+# Gemini reports how long to back off in the error text, e.g. "Please retry in
+# 12.5s" or "retry_delay { seconds: 12 }"
+_RETRY_HINT = re.compile(r'retry in ([\d.]+)\s*s|retry_delay\s*\{\s*seconds:\s*(\d+)', re.IGNORECASE)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the circuit breaker is open"""
+
+
+def is_retryable(error):
+    """Whether an error is likely to go away if the call is repeated"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and code in RETRYABLE_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_NAMES
+
+
+def retry_hint(error):
+    """Seconds the server asked us to wait before retrying, or None"""
+    hint = getattr(error, 'retry_after', None)
+    if hint is not None:
+        return float(hint)
+    match = _RETRY_HINT.search(str(error))
+    if match:
+        return float(match.group(1) or match.group(2))
+    return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter.
+
+    The nth retry waits a random time up to base_delay * 2**n, capped at
+    max_delay. A rate-limit hint from the server is used instead when there
+    is one, as long as it is no longer than max_hint.
+    """
+
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=8.0, max_hint=30.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_hint = max_hint
+
+    def delay(self, retry, error=None):
+        hint = retry_hint(error) if error is not None else None
+        if hint is not None:
+            return hint if hint <= self.max_hint else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class CircuitBreaker:
+    """Stops calling a failing service and probes it again after a cool-down.
+
+    After failure_threshold consecutive failures the breaker opens and calls
+    are refused. Once cooldown seconds have passed it is half-open: one call
+    is let through as a probe, and its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold=3, cooldown=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may be made now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logging.info("Circuit breaker closed: model calls are succeeding again")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logging.warning(f"Circuit breaker open for {self.cooldown:g}s after "
+                                    f"{self.failures} failures")
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+            self._probing = False
+
+    def release(self):
+        """End a probe whose outcome says nothing about the service"""
+        with self._lock:
+            self._probing = False
+
+
+class ResilientCaller:
+    """Runs model calls with retries and a shared circuit breaker.
+
+    Only transient errors (see is_retryable) are retried and count towards
+    opening the breaker; other errors, such as a blocked prompt, are raised
+    straight away.
+    """
+
+    def __init__(self, retry_policy=None, breaker=None, sleep=time.sleep):
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+
+    def call(self, func):
+        if not self.breaker.allow():
+            raise CircuitOpenError("Model calls are paused after repeated failures")
+        retry = 0
+        while True:
+            try:
+                result = func()
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                delay = None
+                if retry + 1 < self.retry_policy.attempts:
+                    delay = self.retry_policy.delay(retry, e)
+                if delay is None:
+                    self.breaker.record_failure()
+                    raise
+                logging.warning(f"Model call failed ({e}); retrying in {delay:.1f}s")
+                self.sleep(delay)
+                retry += 1
+            else:
+                self.breaker.record_success()
+                return result
+
+
+class UpgradeQueue:
+    """Dates of entries that got offline analysis and should be re-analyzed.
+
+    Kept in a small JSON file so entries saved while Gemini was unreachable
+    are still upgraded after a restart.
+    """
+
+    def __init__(self, path='upgrade_queue.json'):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r') as f:
+                self._dates = set(json.load(f))
+        except (FileNotFoundError, ValueError):
+            self._dates = set()
+
+    def __len__(self):
+        return len(self._dates)
+
+    def __contains__(self, date_str):
+        return date_str in self._dates
+
+    def dates(self):
+        """Queued dates, oldest first"""
+        return sorted(self._dates)
+
+    def add(self, date_str):
+        with self._lock:
+            if date_str not in self._dates:
+                self._dates.add(date_str)
+                self._save()
+
+    def discard(self, date_str):
+        with self._lock:
+            if date_str in self._dates:
+                self._dates.discard(date_str)
+                self._save()
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(sorted(self._dates), f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,222 @@
+import heapq
+import math
+import re
+import shlex
+from bisect import bisect_left, insort
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+class SearchQuery:
+    """Parsed search query.
+
+    Plain words must all appear, ``"quoted words"`` must appear as a phrase,
+    ``word*`` matches any word starting with ``word`` and ``tone:fun``
+    restricts results to entries with that tone.
+    """
+
+    def __init__(self, text):
+        self.terms = []
+        self.prefixes = []
+        self.phrases = []
+        self.tones = set()
+        try:
+            parts = shlex.split(text)
+        except ValueError:  # Unbalanced quote while the user is still typing
+            parts = text.replace('"', ' ').split()
+        for part in parts:
+            if part.lower().startswith('tone:'):
+                self.tones.add(part[5:].lower())
+                continue
+            tokens = tokenize(part)
+            if len(tokens) > 1:
+                self.phrases.append(tokens)
+            elif tokens:
+                if part.endswith('*'):
+                    self.prefixes.append(tokens[0])
+                else:
+                    self.terms.append(tokens[0])
+
+    def is_empty(self):
+        return not (self.terms or self.prefixes or self.phrases or self.tones)
+
+
+class SearchIndex:
+    """Inverted index of entry text with positional postings.
+
+    Each token maps to ``{date: [positions]}``. Entries are indexed from
+    their content followed by their summary. When saved, positions are
+    written as space-separated strings, which JSON handles far faster than
+    nested lists; after loading, a token's postings are only parsed back the
+    first time a query or update touches that token.
+    """
+
+    def __init__(self):
+        self.tones = {}
+        self.lengths = {}
+        self._postings = {}
+        self._encoded = {}  # Postings loaded from disk and not yet parsed
+        self._terms = []  # Sorted vocabulary for prefix queries
+        self._doc_terms = {}  # date -> tokens in that entry, for removal
+
+    @classmethod
+    def build(cls, entries):
+        index = cls()
+        for date_str, entry in entries.items():
+            index.update(date_str, entry)
+        return index
+
+    @staticmethod
+    def _entry_text(entry):
+        return f"{entry.get('content', '')}\n{entry.get('summary', '')}"
+
+    def postings(self, token):
+        """{date: [positions]} for a token (empty if unknown)"""
+        postings = self._postings.get(token)
+        if postings is None:
+            encoded = self._encoded.pop(token, None)
+            if encoded is None:
+                return {}
+            postings = self._postings[token] = {
+                date_str: [int(p) for p in positions.split()]
+                for date_str, positions in encoded.items()}
+        return postings
+
+    def update(self, date_str, entry):
+        """Index (or re-index) one entry"""
+        if date_str in self.lengths:
+            self.remove(date_str)
+        tokens = tokenize(self._entry_text(entry))
+        positions = {}
+        for position, token in enumerate(tokens):
+            positions.setdefault(token, []).append(position)
+        for token, token_positions in positions.items():
+            postings = self.postings(token)
+            if not postings:
+                postings = self._postings[token] = {}
+                insort(self._terms, token)
+            postings[date_str] = token_positions
+        self.lengths[date_str] = len(tokens)
+        self.tones[date_str] = entry.get('tone', '')
+        self._doc_terms[date_str] = list(positions)
+
+    def remove(self, date_str):
+        if date_str not in self.lengths:
+            return
+        tokens = self._doc_terms.pop(date_str)
+        if isinstance(tokens, str):  # As loaded from disk
+            tokens = tokens.split()
+        for token in tokens:
+            postings = self.postings(token)
+            del postings[date_str]
+            if not postings:
+                del self._postings[token]
+                i = bisect_left(self._terms, token)
+                if i < len(self._terms) and self._terms[i] == token:
+                    del self._terms[i]
+        del self.lengths[date_str]
+        self.tones.pop(date_str, None)
+
+    def expand_prefix(self, prefix):
+        i = bisect_left(self._terms, prefix)
+        terms = []
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            terms.append(self._terms[i])
+            i += 1
+        return terms
+
+    def _phrase_matches(self, tokens):
+        """{date: number of phrase occurrences}"""
+        postings = [self.postings(token) for token in tokens]
+        if not all(postings):
+            return {}
+        candidates = set(min(postings, key=len))
+        for p in postings:
+            candidates.intersection_update(p)
+        matches = {}
+        for date_str in candidates:
+            # Shift each token's positions back to where the phrase would start
+            starts = set(postings[0][date_str])
+            for offset, p in enumerate(postings[1:], start=1):
+                starts.intersection_update([position - offset for position in p[date_str]])
+                if not starts:
+                    break
+            if starts:
+                matches[date_str] = len(starts)
+        return matches
+
+    def search(self, query, limit=20):
+        """Return [(date, score)] for a query string, best matches first"""
+        if isinstance(query, str):
+            query = SearchQuery(query)
+        if query.is_empty():
+            return []
+
+        # Each clause maps date -> term frequency, or for plain terms date ->
+        # positions. A document must match every clause.
+        clauses = []
+        for term in query.terms:
+            clauses.append(self.postings(term))
+        for prefix in query.prefixes:
+            frequencies = {}
+            for term in self.expand_prefix(prefix):
+                for date_str, positions in self.postings(term).items():
+                    frequencies[date_str] = frequencies.get(date_str, 0) + len(positions)
+            clauses.append(frequencies)
+        for phrase in query.phrases:
+            clauses.append(self._phrase_matches(phrase))
+
+        if clauses:
+            candidates = set(min(clauses, key=len))
+            for clause in clauses:
+                candidates.intersection_update(clause)
+        else:
+            candidates = set(self.lengths)
+        if query.tones:
+            tones = self.tones
+            candidates = [d for d in candidates if tones.get(d, '').lower() in query.tones]
+        if not clauses:
+            # Tone filter only: newest first
+            return [(date_str, 0.0) for date_str in heapq.nlargest(limit, candidates)]
+
+        # BM25 ranking
+        doc_count = len(self.lengths)
+        length_scale = 0.75 * 1.2 * doc_count / max(sum(self.lengths.values()), 1)
+        weighted = [(clause, math.log(1 + (doc_count - len(clause) + 0.5) / (len(clause) + 0.5)) * 2.2)
+                    for clause in clauses]
+        lengths = self.lengths
+        scores = []
+        for date_str in candidates:
+            length_norm = 0.3 + length_scale * lengths[date_str]
+            score = 0.0
+            for clause, weight in weighted:
+                frequency = clause[date_str]
+                if type(frequency) is list:
+                    frequency = len(frequency)
+                score += weight * frequency / (frequency + length_norm)
+            scores.append((score, date_str))
+        return [(date_str, score) for score, date_str in heapq.nlargest(limit, scores)]
+
+    def to_dict(self):
+        postings = dict(self._encoded)
+        for token, token_postings in self._postings.items():
+            postings[token] = {date_str: ' '.join(map(str, positions))
+                               for date_str, positions in token_postings.items()}
+        doc_terms = {date_str: tokens if isinstance(tokens, str) else ' '.join(tokens)
+                     for date_str, tokens in self._doc_terms.items()}
+        return {'postings': postings, 'tones': self.tones, 'lengths': self.lengths,
+                'doc_terms': doc_terms}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        index._encoded = data['postings']
+        index.tones = data['tones']
+        index.lengths = data['lengths']
+        index._doc_terms = data['doc_terms']
+        index._terms = sorted(index._encoded)
+        return index
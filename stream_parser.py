@@ -0,0 +1,119 @@
+import json
+
+
+class StreamingJsonFields:
+    """Incrementally extracts string fields from a JSON object being streamed.
+
+    Feed response chunks as they arrive. ``fields`` holds every top-level
+    string value seen so far: complete values once their closing quote has
+    arrived (their keys are also in ``complete``) and the partial text of the
+    value currently being streamed. Text before the opening brace, such as a
+    Markdown code fence, is ignored. Values that are not strings are skipped.
+    """
+
+    # Parser states
+    BEFORE_OBJECT, BEFORE_KEY, KEY, AFTER_KEY, BEFORE_VALUE, STRING, OTHER, AFTER_VALUE, DONE = range(9)
+
+    def __init__(self):
+        self.fields = {}
+        self.complete = set()
+        self._state = self.BEFORE_OBJECT
+        self._buffer = []
+        self._escape = ''
+        self._key = None
+        self._depth = 0
+
+    def feed(self, chunk):
+        """Consume a chunk; return the names of fields that changed"""
+        changed = set()
+        for char in chunk:
+            state = self._state
+            if state == self.STRING:
+                if self._escape:
+                    self._escape += char
+                    decoded = self._decode_escape()
+                    if decoded is not None:
+                        self._buffer.append(decoded)
+                        self._escape = ''
+                        self._publish(changed)
+                elif char == '\\':
+                    self._escape = char
+                elif char == '"':
+                    self._publish(changed)
+                    self.complete.add(self._key)
+                    self._state = self.AFTER_VALUE
+                else:
+                    self._buffer.append(char)
+                    self._publish(changed)
+            elif state == self.KEY:
+                if self._escape:
+                    self._escape += char
+                    decoded = self._decode_escape()
+                    if decoded is not None:
+                        self._buffer.append(decoded)
+                        self._escape = ''
+                elif char == '\\':
+                    self._escape = char
+                elif char == '"':
+                    self._key = ''.join(self._buffer)
+                    self._buffer = []
+                    self._state = self.AFTER_KEY
+                else:
+                    self._buffer.append(char)
+            elif state == self.BEFORE_OBJECT:
+                if char == '{':
+                    self._state = self.BEFORE_KEY
+            elif state == self.BEFORE_KEY:
+                if char == '"':
+                    self._buffer = []
+                    self._state = self.KEY
+                elif char == '}':
+                    self._state = self.DONE
+            elif state == self.AFTER_KEY:
+                if char == ':':
+                    self._state = self.BEFORE_VALUE
+            elif state == self.BEFORE_VALUE:
+                if char == '"':
+                    self._buffer = []
+                    self._state = self.STRING
+                elif not char.isspace():
+                    self._depth = 1 if char in '[{' else 0
+                    self._state = self.OTHER
+            elif state == self.OTHER:
+                # Skip numbers, literals and nested values (strings inside them
+                # containing brackets are not expected in this response format)
+                if char in '[{':
+                    self._depth += 1
+                elif char in ']}':
+                    if self._depth == 0:
+                        self._state = self.DONE
+                    else:
+                        self._depth -= 1
+                elif char == ',' and self._depth == 0:
+                    self._state = self.BEFORE_KEY
+            elif state == self.AFTER_VALUE:
+                if char == ',':
+                    self._state = self.BEFORE_KEY
+                elif char == '}':
+                    self._state = self.DONE
+        return changed
+
+    def _decode_escape(self):
+        """Decoded character for the pending escape, or None if incomplete"""
+        escape = self._escape
+        if escape[1:2] == 'u':
+            if len(escape) < 6:
+                return None
+            try:
+                return json.loads(f'"{escape}"')
+            except ValueError:
+                return ''
+        return json.loads(f'"{escape}"') if escape[1] in '"\\/bfnrt' else escape[1]
+
+    def _publish(self, changed):
+        self.fields[self._key] = ''.join(self._buffer)
+        changed.add(self._key)
+
+    @property
+    def done(self):
+        return self._state == self.DONE
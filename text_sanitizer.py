@@ -0,0 +1,153 @@
+import re
+
+_WORD_CHAR = re.compile(r'\w')
+
+# Potentially triggering words and their neutral alternatives
+DEFAULT_REPLACEMENTS = {
+    "love": "appreciate",
+    "heart": "mind",
+    "romance": "connection",
+    "romantic": "meaningful",
+    "relationship": "friendship"
+}
+
+
+class SanitizedText:
+    """Result of Sanitizer.sanitize, with a map back to the original wording.
+
+    ``spans`` holds one (start, end, original_start, original_end) tuple per
+    replacement, giving its position in the sanitized and original text.
+    """
+
+    def __init__(self, text, original, spans):
+        self.text = text
+        self.original = original
+        self.spans = spans
+
+    def __str__(self):
+        return self.text
+
+    def original_offset(self, pos):
+        """Map an offset in the sanitized text to the original text"""
+        shift = 0
+        for start, end, original_start, original_end in self.spans:
+            if pos < start:
+                break
+            if pos < end:
+                return original_start + min(pos - start, original_end - original_start)
+            shift = original_end - end
+        return pos + shift
+
+    def restore(self):
+        """Rebuild the original text from the sanitized text and the span map"""
+        parts, last = [], 0
+        for start, end, original_start, original_end in self.spans:
+            parts.append(self.text[last:start])
+            parts.append(self.original[original_start:original_end])
+            last = end
+        parts.append(self.text[last:])
+        return ''.join(parts)
+
+    def restore_output(self, output):
+        """Put the writer's own words back into text generated from the sanitized entry.
+
+        Only replacement words introduced by sanitizing are mapped back, and
+        only when the writer did not already use that word themselves.
+        """
+        introduced = {}
+        for start, end, original_start, original_end in self.spans:
+            introduced.setdefault(self.text[start:end].lower(),
+                                  self.original[original_start:original_end].lower())
+        originals_lower = self.original.lower()
+        introduced = {new: old for new, old in introduced.items()
+                      if not re.search(rf'\b{re.escape(new)}\b', originals_lower)}
+        if not introduced:
+            return output
+        pattern = re.compile(
+            r'\b(' + '|'.join(map(re.escape, sorted(introduced, key=len, reverse=True))) + r')\b',
+            re.IGNORECASE)
+        return pattern.sub(lambda m: _match_case(introduced[m.group(1).lower()], m.group(1)), output)
+
+
+class Sanitizer:
+    """Replaces whole words from a table in a single regex pass.
+
+    Matching is case-insensitive and on word boundaries ("heartbeat" is left
+    alone), a trailing plural "s" is carried over ("relationships" becomes
+    "friendships"), and the replacement copies the capitalization of the
+    word it replaces.
+    """
+
+    def __init__(self, replacements=None):
+        if replacements is None:
+            replacements = DEFAULT_REPLACEMENTS
+        self.replacements = {old.lower(): new for old, new in replacements.items()}
+        alternatives = '|'.join(map(re.escape, sorted(self.replacements, key=len, reverse=True)))
+        # The pattern is matched against a lowercased copy and deliberately has
+        # no leading \b: that keeps re's literal prefix scan, which is several
+        # times faster than IGNORECASE. The leading boundary is checked in _matches.
+        self._regex = re.compile(rf'({alternatives})(s?)\b')
+        self._fallback = re.compile(rf'\b({alternatives})(s?)\b', re.IGNORECASE)
+        self._memo = {}
+
+    def _matches(self, text):
+        """Yield (start, end, replacement) for each whole word to replace"""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Some characters change length when lowercased; offsets would drift
+            for match in self._fallback.finditer(text):
+                yield match.start(), match.end(), self._replacement(text, match)
+            return
+        is_word_char = _WORD_CHAR.match
+        replacement_for = self._replacement_for
+        for match in self._regex.finditer(lowered):
+            start, end = match.span()
+            if start and is_word_char(lowered, start - 1):
+                continue
+            yield start, end, replacement_for(text[start:end])
+
+    def _replacement_for(self, word):
+        # Entries repeat the same few spellings, so replacements are memoized
+        replacement = self._memo.get(word)
+        if replacement is None:
+            suffix = 's' if word.lower() not in self.replacements else ''
+            stem = word[:len(word) - len(suffix)]
+            replacement = _match_case(self.replacements[stem.lower()], stem) + word[len(stem):]
+            self._memo[word] = replacement
+        return replacement
+
+    def _replacement(self, text, match):
+        return self._replacement_for(match.group(0))
+
+    def sanitize(self, text):
+        parts, spans = [], []
+        last = 0
+        out_len = 0
+        for start, end, replacement in self._matches(text):
+            before = text[last:start]
+            parts.append(before)
+            parts.append(replacement)
+            out_start = out_len + len(before)
+            out_len = out_start + len(replacement)
+            spans.append((out_start, out_len, start, end))
+            last = end
+        parts.append(text[last:])
+        return SanitizedText(''.join(parts), text, spans)
+
+    def __call__(self, text):
+        """Sanitized text only, without building the offset map"""
+        parts, last = [], 0
+        for start, end, replacement in self._matches(text):
+            parts.append(text[last:start])
+            parts.append(replacement)
+            last = end
+        parts.append(text[last:])
+        return ''.join(parts)
+
+
+def _match_case(replacement, word):
+    if word.isupper() and len(word) > 1:
+        return replacement.upper()
+    if word[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
@@ -6,6 +6,7 @@ from ttkbootstrap.dialogs import Messagebox
 from datetime import datetime, timedelta
 import calendar
 import logging
+import time
 # Remove tooltip import and use idlelib's tooltip instead
 from idlelib.tooltip import Hovertip
 
@@ -14,6 +15,7 @@ class CalendarWidget(ttk.Frame):
         super().__init__(master, **kwargs)
         self.date = datetime.now()
         self.callback = None
+        self.entry_provider = None
         self.create_widgets()
 
     def create_widgets(self):
@@ -35,66 +37,108 @@ class CalendarWidget(ttk.Frame):
         self.calendar = ttk.Frame(self)
         self.calendar.pack(fill=X)
 
-        self.update_calendar()
-
-    def create_date_button(self, day, week_num, day_num):
-        btn = ttk.Button(self.calendar, text=str(day), bootstyle="info-outline",
-                        command=lambda d=day: self.on_date_click(d),
-                        width=4)
-        btn.grid(row=week_num, column=day_num, padx=2, pady=2)
-    
-        if day == datetime.now().day and self.date.month == datetime.now().month:
-            btn.configure(bootstyle="info")
-    
-        return btn
-
-    def update_calendar(self):
-        for widget in self.calendar.winfo_children():
-            widget.destroy()
-
-        cal = calendar.monthcalendar(self.date.year, self.date.month)
-
         days = ['M', 'T', 'W', 'T', 'F', 'S', 'S']
         for i, day in enumerate(days):
             ttk.Label(self.calendar, text=day, font=("Roboto", 10)).grid(
                 row=0, column=i, padx=2, pady=(0, 5))
 
+        # A month spans at most six weeks. The grid of day cells is created
+        # once and reconfigured in place when the month changes.
+        self._cells = []
+        self._cell_days = [0] * 42
+        self._cell_styles = [None] * 42
+        for index in range(42):
+            btn = ttk.Button(self.calendar, text="", bootstyle="info-outline",
+                             command=lambda i=index: self.on_cell_click(i), width=4)
+            btn.grid(row=index // 7 + 1, column=index % 7, padx=2, pady=2)
+            btn.grid_remove()
+            LazyHovertip(btn, lambda i=index: self.tooltip_text(i), hover_delay=500)
+            self._cells.append(btn)
+
+        self._month_entries = None
+        self._tooltip_texts = {}
+        self.update_calendar()
+
+    def update_calendar(self):
+        now = datetime.now()
+        is_current_month = (self.date.year, self.date.month) == (now.year, now.month)
+        cal = calendar.monthcalendar(self.date.year, self.date.month)
+        days = [day for week in cal for day in week]
+        days.extend([0] * (42 - len(days)))
+
         self.date_buttons = {}
-        for week_num, week in enumerate(cal, start=1):
-            for day_num, day in enumerate(week):
-                if day != 0:
-                    btn = self.create_date_button(day, week_num, day_num)
-                    self.date_buttons[day] = btn
+        for index, (btn, day) in enumerate(zip(self._cells, days)):
+            if day == 0:
+                if self._cell_days[index]:
+                    btn.grid_remove()
+            else:
+                style = "info" if is_current_month and day == now.day else "info-outline"
+                if self._cell_days[index] != day:
+                    btn.configure(text=str(day))
+                if self._cell_styles[index] != style:
+                    btn.configure(bootstyle=style)
+                    self._cell_styles[index] = style
+                if not self._cell_days[index]:
+                    btn.grid()
+                self.date_buttons[day] = btn
+            self._cell_days[index] = day
 
         self.header.config(text=self.date.strftime("%B %Y"))
+        self.refresh_tooltips()
+
+    def month_range(self):
+        """First and last date of the displayed month"""
+        first = self.date.date().replace(day=1)
+        last_day = calendar.monthrange(first.year, first.month)[1]
+        return first, first.replace(day=last_day)
+
+    def refresh_tooltips(self):
+        """Forget tooltip data so it is fetched again on the next hover"""
+        self._month_entries = None
+        self._tooltip_texts = {}
 
     def update_tooltips(self, entries):
-        # Clear existing tooltips
-        if hasattr(self, '_tooltips'):
-            for tip in self._tooltips:
-                tip.destroy()
-        
-        self._tooltips = []
-        
-        for day, btn in self.date_buttons.items():
+        """Use entries (keyed by date string) as the displayed month's tooltip data"""
+        self._month_entries = entries
+        self._tooltip_texts = {}
+
+    def month_entries(self):
+        """Tooltip data of the displayed month, fetched from the provider once"""
+        if self._month_entries is None:
+            self._month_entries = (self.entry_provider(*self.month_range())
+                                   if self.entry_provider else {})
+        return self._month_entries
+
+    def tooltip_text(self, index):
+        day = self._cell_days[index]
+        text = self._tooltip_texts.get(day)
+        if text is None:
+            month_entries = self.month_entries()
             date_str = f"{self.date.year}-{self.date.month:02d}-{day:02d}"
-            if date_str in entries:
-                entry = entries[date_str]
-                tooltip_text = f"Mood: {entry['tone']}\n{entry['summary'][:50]}..."
+            if date_str in month_entries:
+                entry = month_entries[date_str]
+                text = f"Mood: {entry['tone']}\n{entry['summary'][:50]}..."
             else:
-                tooltip_text = "No entry"
-            
-            tip = Hovertip(btn, tooltip_text, hover_delay=500)
-            self._tooltips.append(tip)
+                text = "No entry"
+            self._tooltip_texts[day] = text
+        return text
 
     def prev_month(self):
         self.date = self.date.replace(day=1) - timedelta(days=1)
         self.update_calendar()
+        # Partitioned storage opens the month's file here, after the grid is drawn
+        self.after_idle(self.month_entries)
 
     def next_month(self):
         self.date = self.date.replace(day=28) + timedelta(days=5)
         self.date = self.date.replace(day=1)
         self.update_calendar()
+        self.after_idle(self.month_entries)
+
+    def on_cell_click(self, index):
+        day = self._cell_days[index]
+        if day:
+            self.on_date_click(day)
 
     def on_date_click(self, day):
         selected_date = self.date.replace(day=day)
@@ -104,6 +148,22 @@ class CalendarWidget(ttk.Frame):
     def set_callback(self, callback):
         self.callback = callback
 
+    def set_entry_provider(self, provider):
+        """provider(start, end) returns the entries dated within that range"""
+        self.entry_provider = provider
+        self.refresh_tooltips()
+
+class LazyHovertip(Hovertip):
+    """Hovertip whose text is produced by a callable when it is first shown"""
+
+    def __init__(self, anchor_widget, text_func, hover_delay=1000):
+        super().__init__(anchor_widget, "", hover_delay=hover_delay)
+        self.text_func = text_func
+
+    def showcontents(self):
+        self.text = self.text_func()
+        super().showcontents()
+
 class EntryEditor(ttk.Frame):
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
@@ -137,6 +197,7 @@ class EntryEditor(ttk.Frame):
 class EntryDisplay(ttk.Frame):
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
+        self.date = None
         self.create_widgets()
 
     def create_widgets(self):
@@ -165,7 +226,8 @@ class EntryDisplay(ttk.Frame):
                                      font=("Helvetica", 10, "italic"))
         self.comment_label.pack(fill=X, pady=2)
 
-    def display_entry(self, date, content, summary="", tone="", comment=""):
+    def display_entry(self, date, content, summary="", tone="", comment="", pending=False):
+        self.date = date
         self.date_label.config(text=date.strftime("%B %d, %Y"))
         
         self.content_text.config(state="normal")
@@ -173,9 +235,84 @@ class EntryDisplay(ttk.Frame):
         self.content_text.insert(END, content)
         self.content_text.config(state="disabled")
 
-        self.summary_label.config(text=f"Summary: {summary}")
-        self.tone_label.config(text=f"Tone: {tone}")
-        self.comment_label.config(text=f"AI Comment: {comment}")
+        if pending:
+            self.summary_label.config(text="Summary: Analysis pending...")
+            self.tone_label.config(text="Tone: ...")
+            self.comment_label.config(text="AI Comment: ...")
+        else:
+            self.summary_label.config(text=f"Summary: {summary}")
+            self.tone_label.config(text=f"Tone: {tone}")
+            self.comment_label.config(text=f"AI Comment: {comment}")
+
+    def show_partial(self, summary="", tone="", comment=""):
+        """Show analysis text while it is still streaming in"""
+        self.summary_label.config(text=f"Summary: {summary or 'Analysis pending...'}")
+        self.tone_label.config(text=f"Tone: {tone or '...'}")
+        self.comment_label.config(text=f"AI Comment: {comment or '...'}")
+
+    def shows_date(self, date):
+        """Whether the entry for this calendar day is currently displayed"""
+        return self.date is not None and self.date.strftime('%Y-%m-%d') == date.strftime('%Y-%m-%d')
+
+class SearchPanel(ttk.Frame):
+    """Search box with a ranked result list.
+
+    search(query) returns result rows as (date string, tone, snippet) tuples;
+    on_select(date) is called when a result is clicked.
+    """
+
+    def __init__(self, master, search, on_select, **kwargs):
+        super().__init__(master, **kwargs)
+        self.search = search
+        self.on_select = on_select
+        self._pending = None
+        self.create_widgets()
+
+    def create_widgets(self):
+        self.query_entry = ttk.Entry(self)
+        self.query_entry.pack(fill=X, pady=(0, 5))
+        self.query_entry.bind("<KeyRelease>", self.schedule_search)
+        self.query_entry.bind("<Return>", lambda e: self.run_search())
+
+        self.results = ttk.Treeview(self, columns=("date", "tone", "snippet"),
+                                    show="headings", height=5)
+        self.results.heading("date", text="Date")
+        self.results.heading("tone", text="Mood")
+        self.results.heading("snippet", text="Entry")
+        self.results.column("date", width=90, stretch=False)
+        self.results.column("tone", width=70, stretch=False)
+        self.results.pack(fill=X)
+        self.results.bind("<<TreeviewSelect>>", self.on_result_selected)
+
+        self.status_label = ttk.Label(self, text='Words, "phrases", prefix* or tone:fun',
+                                      font=("Helvetica", 9))
+        self.status_label.pack(fill=X, pady=(5, 0))
+
+    def schedule_search(self, event=None):
+        # Wait for a pause in typing before searching
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+        self._pending = self.after(150, self.run_search)
+
+    def run_search(self):
+        self._pending = None
+        query = self.query_entry.get().strip()
+        self.results.delete(*self.results.get_children())
+        if not query:
+            self.status_label.config(text='Words, "phrases", prefix* or tone:fun')
+            return
+
+        start = time.perf_counter()
+        rows = self.search(query)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for date_str, tone, snippet in rows:
+            self.results.insert("", END, iid=date_str, values=(date_str, tone, snippet))
+        self.status_label.config(text=f"{len(rows)} results in {elapsed_ms:.1f} ms")
+
+    def on_result_selected(self, event):
+        selection = self.results.selection()
+        if selection:
+            self.on_select(datetime.strptime(selection[0], '%Y-%m-%d'))
 
 class AnalysisSummary(ttk.Frame):
     def __init__(self, master, **kwargs):
@@ -197,6 +334,42 @@ class AnalysisSummary(ttk.Frame):
         self.most_fun_day_label.config(text=f"Most fun day: {most_fun_day}")
         self.most_romantic_day_label.config(text=f"Most romantic day: {most_romantic_day}")
 
+class DiagnosticsWindow(ttk.Toplevel):
+    """Live view of the metrics registry, refreshed every second"""
+
+    def __init__(self, parent, registry, refresh_ms=1000):
+        super().__init__(parent)
+        self.title("Diagnostics")
+        self.geometry("640x360")
+        self.registry = registry
+        self.refresh_ms = refresh_ms
+
+        self.table = ttk.Treeview(self, columns=("metric", "count", "mean", "p50", "p95"),
+                                  show="headings")
+        for column, heading, width in (("metric", "Metric", 240), ("count", "Count / value", 100),
+                                       ("mean", "Mean", 90), ("p50", "p50", 90), ("p95", "p95", 90)):
+            self.table.heading(column, text=heading)
+            self.table.column(column, width=width, stretch=column == "metric")
+        self.table.pack(fill=BOTH, expand=YES, padx=10, pady=10)
+        self.refresh()
+
+    @staticmethod
+    def _format_seconds(value):
+        return "" if value is None else f"{value * 1000:.1f} ms"
+
+    def refresh(self):
+        if not self.winfo_exists():
+            return
+        snapshot = self.registry.snapshot()
+        self.table.delete(*self.table.get_children())
+        for name, value in snapshot['counters'].items():
+            self.table.insert("", END, values=(name, value, "", "", ""))
+        for name, summary in snapshot['histograms'].items():
+            self.table.insert("", END, values=(
+                name, summary['count'], self._format_seconds(summary['mean']),
+                self._format_seconds(summary['p50']), self._format_seconds(summary['p95'])))
+        self.after(self.refresh_ms, self.refresh)
+
 class LoginWindow(ttk.Toplevel):
     def __init__(self, parent):
         super().__init__(parent)
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+
+
+class WriteBehind:
+    """Buffers diary mutations and hands them to storage in one batch.
+
+    Puts and deletes are kept in memory (a later change to the same date
+    replaces an earlier one) and written with ``apply(puts, deletes)`` once
+    no change has arrived for ``delay`` seconds, or at the latest
+    ``max_delay`` seconds after the first buffered change. With a delay of
+    None changes are only written by ``flush()``, which writes immediately.
+    While a write is in progress its changes stay visible through ``lookup``.
+    """
+
+    def __init__(self, apply, delay=1.0, max_delay=5.0, clock=time.monotonic):
+        self.apply = apply
+        self.delay = delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self._puts = {}
+        self._deletes = set()
+        self._writing = ({}, set())
+        self._first_change = None
+        self._held = 0
+        self._timer = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One write at a time, in order
+
+    def put(self, date_str, entry):
+        with self._lock:
+            self._puts[date_str] = entry
+            self._deletes.discard(date_str)
+            self._schedule()
+
+    def delete(self, date_str):
+        with self._lock:
+            self._puts.pop(date_str, None)
+            self._deletes.add(date_str)
+            self._schedule()
+
+    def lookup(self, date_str):
+        """(True, entry or None for a deletion) for a date with an unwritten change, else (False, None)"""
+        with self._lock:
+            for puts, deletes in ((self._puts, self._deletes), self._writing):
+                if date_str in puts:
+                    return True, puts[date_str]
+                if date_str in deletes:
+                    return True, None
+        return False, None
+
+    @property
+    def held(self):
+        return self._held > 0
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._puts) + len(self._deletes)
+
+    def hold(self):
+        """Stop timed writes until release(); used for explicit batches"""
+        with self._lock:
+            self._held += 1
+            self._cancel_timer()
+
+    def release(self):
+        with self._lock:
+            self._held -= 1
+
+    def _schedule(self):
+        if self._held or self.delay is None:
+            return
+        now = self.clock()
+        if self._first_change is None:
+            self._first_change = now
+        wait = min(self.delay, max(0.0, self._first_change + self.max_delay - now))
+        self._cancel_timer()
+        self._timer = threading.Timer(wait, self._flush_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Writing diary changes failed, will retry: {e}")
+            with self._lock:
+                if not self._held:
+                    self._schedule()
+
+    def flush(self):
+        """Write every buffered change now"""
+        with self._flush_lock:
+            with self._lock:
+                self._cancel_timer()
+                self._first_change = None
+                puts, deletes = self._puts, self._deletes
+                if not puts and not deletes:
+                    return
+                self._puts, self._deletes = {}, set()
+                self._writing = (puts, deletes)
+            try:
+                self.apply(puts, deletes)
+            except Exception:
+                # Put back what has not been changed again since, so nothing is lost
+                with self._lock:
+                    for date_str, entry in puts.items():
+                        if date_str not in self._puts and date_str not in self._deletes:
+                            self._puts[date_str] = entry
+                    self._deletes |= {d for d in deletes if d not in self._puts}
+                raise
+            finally:
+                with self._lock:
+                    self._writing = ({}, set())